@@ -0,0 +1,445 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步区块链客户端
+基于 AsyncWeb3 的 BlockchainClient 异步版本，在 asyncio 中并发发起RPC请求
+"""
+
+import asyncio
+import json
+import time
+from typing import List, Dict, Any, Optional, Tuple
+
+import aiohttp
+from eth_account import Account
+from web3 import AsyncWeb3
+from web3.exceptions import TransactionNotFound
+
+from blockchain_client import is_known_transaction, is_nonce_error
+from settlement_planner import GAS_SAFETY_MARGIN
+
+
+class AsyncNonceManager:
+    """
+    NonceManager 的 asyncio 版本：首次同步后在本地原子递增分配
+
+    与 NonceManager 一样，每次 allocate 以 commit 或 release 结束：没发出的nonce能回退就回退，
+    否则等在途的分配都结束后，下一次 allocate 重新从节点同步。
+    """
+
+    def __init__(self, w3: AsyncWeb3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._lock = asyncio.Lock()
+        self._next_nonce = None
+        self._in_flight = 0
+        self._dirty = False
+
+    async def _sync_locked(self):
+        self._next_nonce = await self.w3.eth.get_transaction_count(self.address, 'pending')
+        self._dirty = False
+
+    async def allocate(self, count: int = 1) -> int:
+        """原子地分配一段连续nonce，返回第一个"""
+        async with self._lock:
+            if self._next_nonce is None or (self._dirty and self._in_flight == 0):
+                await self._sync_locked()
+            nonce = self._next_nonce
+            self._next_nonce += count
+            self._in_flight += 1
+            return nonce
+
+    def commit(self):
+        """一次 allocate 分配的nonce已全部发出"""
+        self._in_flight = max(0, self._in_flight - 1)
+
+    def release(self, nonce: int, count: int = 1):
+        """一次 allocate 分配的 [nonce, nonce + count) 没有发出：是最后一段则回退，否则标记需要同步"""
+        self._in_flight = max(0, self._in_flight - 1)
+        if self._next_nonce is not None and nonce + count == self._next_nonce:
+            self._next_nonce = nonce
+        else:
+            self._dirty = True
+
+    async def resync(self) -> int:
+        """重新从节点同步nonce"""
+        async with self._lock:
+            await self._sync_locked()
+            return self._next_nonce
+
+
+class AsyncBlockchainClient:
+    """
+    异步区块链客户端类
+
+    所有RPC请求共享一个 aiohttp 连接池，并通过信号量限制同时在途的请求数。
+    需要通过 ``await AsyncBlockchainClient.create(...)`` 创建。
+    """
+
+    def __init__(self, ganache_url: str = "http://127.0.0.1:7545", concurrency: int = 32,
+                 gas_price_ttl: float = 5.0):
+        """
+        Args:
+            ganache_url: Ganache本地链的URL
+            concurrency: 同时在途的最大请求数（也是连接池大小）
+            gas_price_ttl: gas价格缓存有效期（秒）
+        """
+        self.ganache_url = ganache_url
+        self.concurrency = concurrency
+        self.provider = AsyncWeb3.AsyncHTTPProvider(ganache_url)
+        self.w3 = AsyncWeb3(self.provider)
+        self.account = None
+        self.contract = None
+        self.contract_address = None
+        self.nonce_manager = None
+        self.session = None
+        self.gas_price_ttl = gas_price_ttl
+        self._gas_price = None
+        self._gas_price_at = 0.0
+        self._chain_id = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    @classmethod
+    async def create(cls, ganache_url: str = "http://127.0.0.1:7545", concurrency: int = 32,
+                     **kwargs) -> "AsyncBlockchainClient":
+        """
+        创建客户端并检查连接
+
+        Args:
+            ganache_url: Ganache本地链的URL
+            concurrency: 同时在途的最大请求数
+
+        Returns:
+            已连接的客户端
+        """
+        client = cls(ganache_url, concurrency, **kwargs)
+        await client.connect()
+        return client
+
+    async def connect(self):
+        """建立共享连接池并检查节点连接"""
+        connector = aiohttp.TCPConnector(limit=self.concurrency, keepalive_timeout=60)
+        self.session = aiohttp.ClientSession(connector=connector)
+        await self.provider.cache_async_session(self.session)
+
+        if not await self.w3.is_connected():
+            await self.close()
+            raise Exception("无法连接到Ganache，请确保Ganache正在运行")
+
+        print(f"✅ 成功连接到Ganache: {self.ganache_url}")
+        print(f"当前区块高度: {await self.w3.eth.block_number}")
+
+    async def close(self):
+        """关闭连接池"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> "AsyncBlockchainClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _limited(self, awaitable):
+        """在并发上限内等待一个RPC请求"""
+        async with self._semaphore:
+            return await awaitable
+
+    async def load_account(self, private_key: str):
+        """
+        加载账户
+
+        Args:
+            private_key: 私钥
+        """
+        self.account = Account.from_key(private_key)
+        self.nonce_manager = AsyncNonceManager(self.w3, self.account.address)
+
+        print(f"账户地址: {self.account.address}")
+        balance = await self._limited(self.w3.eth.get_balance(self.account.address))
+        print(f"账户余额: {self.w3.from_wei(balance, 'ether')} ETH")
+
+    def load_contract(self, contract_address: str, abi_path: str):
+        """
+        加载智能合约
+
+        Args:
+            contract_address: 合约地址
+            abi_path: ABI文件路径
+        """
+        try:
+            with open(abi_path, 'r') as f:
+                abi = json.load(f)
+
+            self.contract = self.w3.eth.contract(address=contract_address, abi=abi)
+            self.contract_address = contract_address
+
+            print(f"✅ 成功加载合约: {contract_address}")
+
+        except FileNotFoundError:
+            print(f"❌ 找不到ABI文件: {abi_path}")
+            raise
+
+    def _require_contract(self):
+        if not self.contract:
+            raise Exception("合约未加载")
+
+    async def get_token_balance(self, address: str = None) -> int:
+        """
+        获取代币余额
+
+        Args:
+            address: 地址，如果为None则使用当前账户
+
+        Returns:
+            代币余额
+        """
+        self._require_contract()
+        if not address:
+            address = self.account.address
+        return await self._limited(self.contract.functions.balanceOf(address).call())
+
+    async def get_balances(self, addresses: List[str]) -> Dict[str, int]:
+        """
+        并发获取多个地址的代币余额
+
+        Args:
+            addresses: 地址列表
+
+        Returns:
+            地址 -> 余额
+        """
+        balances = await asyncio.gather(*(self.get_token_balance(a) for a in addresses))
+        return dict(zip(addresses, balances))
+
+    async def _gas_price_cached(self) -> int:
+        now = time.monotonic()
+        if self._gas_price is None or now - self._gas_price_at >= self.gas_price_ttl:
+            self._gas_price = await self._limited(self.w3.eth.gas_price)
+            self._gas_price_at = now
+        return self._gas_price
+
+    async def _chain_id_cached(self) -> int:
+        if self._chain_id is None:
+            self._chain_id = await self._limited(self.w3.eth.chain_id)
+        return self._chain_id
+
+    async def _send_contract_transaction(self, contract_call, gas: int, max_retries: int = 3) -> str:
+        """
+        签名并发送合约交易，nonce冲突时重新同步后重试
+
+        节点报告交易已存在时直接返回该交易的哈希；其他错误把没发出的nonce交还分配器后原样抛出
+        （不立即同步：gather 中的其他协程可能持有已分配但尚未发送的nonce）。
+        """
+        if not self.account:
+            raise Exception("账户未加载")
+
+        attempt = 0
+        while True:
+            nonce = await self.nonce_manager.allocate()
+            signed_txn = None
+            try:
+                transaction = await contract_call.build_transaction({
+                    'from': self.account.address,
+                    'gas': gas,
+                    'gasPrice': await self._gas_price_cached(),
+                    'nonce': nonce,
+                    'chainId': await self._chain_id_cached()
+                })
+                signed_txn = Account.sign_transaction(transaction, self.account.key)
+                tx_hash = await self._limited(self.w3.eth.send_raw_transaction(signed_txn.rawTransaction))
+            except Exception as e:
+                if signed_txn is not None and is_known_transaction(e):
+                    self.nonce_manager.commit()
+                    return signed_txn.hash.hex()
+                # 这个nonce没有发出：回退或标记需要同步，后面分到nonce的协程不会卡在空洞之后
+                self.nonce_manager.release(nonce)
+                if not is_nonce_error(e):
+                    raise
+                await self.nonce_manager.resync()
+                if attempt < max_retries:
+                    attempt += 1
+                    continue
+                raise
+            self.nonce_manager.commit()
+            return tx_hash.hex()
+
+    async def transfer_tokens(self, to_address: str, amount: int, description: str = "") -> str:
+        """
+        转账代币
+
+        Args:
+            to_address: 接收方地址
+            amount: 转账金额
+            description: 交易描述
+
+        Returns:
+            交易哈希
+        """
+        self._require_contract()
+        return await self._send_contract_transaction(
+            self.contract.functions.transferWithRecord(to_address, amount, description),
+            gas=200000
+        )
+
+    async def transfer_tokens_many(self, transfers: List[Tuple[str, int, str]]) -> List[str]:
+        """
+        并发发送多笔转账（nonce在本地按输入顺序分配）
+
+        Args:
+            transfers: (接收方地址, 转账金额, 交易描述) 列表
+
+        Returns:
+            交易哈希列表，顺序与输入一致
+        """
+        return list(await asyncio.gather(*(self.transfer_tokens(*t) for t in transfers)))
+
+    async def batch_transfer(self, recipients: List[str], amounts: List[int], description: str = "",
+                             gas: Optional[int] = None) -> str:
+        """
+        批量转账
+
+        Args:
+            recipients: 接收方地址列表
+            amounts: 转账金额列表
+            description: 交易描述
+            gas: gas上限，默认按 eth_estimateGas 的估算值乘以 GAS_SAFETY_MARGIN（与 SettlementPlanner 一致）
+
+        Returns:
+            交易哈希
+        """
+        self._require_contract()
+        if not self.account:
+            raise Exception("账户未加载")
+        if len(recipients) != len(amounts):
+            raise ValueError("接收方和金额列表长度必须相同")
+        contract_call = self.contract.functions.batchTransfer(recipients, amounts, description)
+        if gas is None:
+            estimate = await self._limited(contract_call.estimate_gas({'from': self.account.address}))
+            gas = int(estimate * GAS_SAFETY_MARGIN)
+        return await self._send_contract_transaction(contract_call, gas=gas)
+
+    async def get_transaction_record(self, transaction_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取交易记录
+
+        Args:
+            transaction_id: 交易ID
+
+        Returns:
+            交易记录，失败时为None
+        """
+        self._require_contract()
+        try:
+            tx_data = await self._limited(self.contract.functions.getTransaction(transaction_id).call())
+        except Exception as e:
+            print(f"❌ 获取交易记录失败: {e}")
+            return None
+
+        return {
+            'transaction_id': transaction_id,
+            'from': tx_data[0],
+            'to': tx_data[1],
+            'amount': tx_data[2],
+            'timestamp': tx_data[3],
+            'description': tx_data[4]
+        }
+
+    async def get_transaction_records(self, transaction_ids: List[int]) -> List[Optional[Dict[str, Any]]]:
+        """
+        并发获取多条交易记录
+
+        Args:
+            transaction_ids: 交易ID列表
+
+        Returns:
+            交易记录列表，顺序与输入一致
+        """
+        return list(await asyncio.gather(*(self.get_transaction_record(i) for i in transaction_ids)))
+
+    async def get_user_transactions(self, user_address: str = None) -> List[int]:
+        """
+        获取用户的所有交易记录ID
+
+        Args:
+            user_address: 用户地址，如果为None则使用当前账户
+
+        Returns:
+            交易ID列表
+        """
+        self._require_contract()
+        if not user_address:
+            user_address = self.account.address
+        try:
+            return await self._limited(self.contract.functions.getUserTransactions(user_address).call())
+        except Exception as e:
+            print(f"❌ 获取用户交易记录失败: {e}")
+            return []
+
+    async def get_user_history(self, user_address: str = None) -> List[Dict[str, Any]]:
+        """
+        获取用户的完整交易记录（ID查询 + 并发拉取每条记录）
+
+        Args:
+            user_address: 用户地址，如果为None则使用当前账户
+
+        Returns:
+            交易记录列表
+        """
+        transaction_ids = await self.get_user_transactions(user_address)
+        records = await self.get_transaction_records(transaction_ids)
+        return [r for r in records if r]
+
+    async def wait_for_transaction(self, tx_hash: str, timeout: int = 60, poll_interval: float = 0.5) -> Dict[str, Any]:
+        """
+        等待交易确认
+
+        Args:
+            tx_hash: 交易哈希
+            timeout: 超时时间（秒）
+            poll_interval: 轮询间隔（秒）
+
+        Returns:
+            交易收据
+        """
+        start_time = time.monotonic()
+        while time.monotonic() - start_time < timeout:
+            try:
+                receipt = await self._limited(self.w3.eth.get_transaction_receipt(tx_hash))
+            except TransactionNotFound:
+                receipt = None
+            if receipt:
+                return receipt
+            await asyncio.sleep(poll_interval)
+
+        raise Exception("交易确认超时")
+
+    async def get_contract_info(self) -> Optional[Dict[str, Any]]:
+        """
+        获取合约信息（四个只读调用并发发起）
+
+        Returns:
+            合约信息
+        """
+        self._require_contract()
+        functions = self.contract.functions
+        try:
+            name, symbol, total_supply, transaction_count = await asyncio.gather(
+                self._limited(functions.name().call()),
+                self._limited(functions.symbol().call()),
+                self._limited(functions.totalSupply().call()),
+                self._limited(functions.transactionCount().call()),
+            )
+        except Exception as e:
+            print(f"❌ 获取合约信息失败: {e}")
+            return None
+
+        return {
+            'name': name,
+            'symbol': symbol,
+            'total_supply': total_supply,
+            'transaction_count': transaction_count,
+            'address': self.contract_address
+        }
+
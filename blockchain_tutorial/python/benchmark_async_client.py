@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+同步 / 异步客户端对比基准
+在本地模拟节点上准备一批交易记录，分别用 BlockchainClient（逐条请求）和
+AsyncBlockchainClient（并发请求）拉取同一用户的完整交易历史并计时。
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+from web3 import Web3
+
+from async_blockchain_client import AsyncBlockchainClient
+from blockchain_client import BlockchainClient
+from local_node import ABI_PATH, LocalSettlementNode
+
+PROSUMER = Web3.to_checksum_address("0x742d35cc6634c0532925a3b8d4c9db96c4b4d8b6")
+
+
+def run_sync(node: LocalSettlementNode, private_key: str) -> float:
+    """同步客户端：getUserTransactions + 逐条 getTransaction"""
+    client = BlockchainClient(node.url)
+    client.load_account(private_key)
+    client.load_contract(node.contract_address, ABI_PATH)
+
+    start = time.perf_counter()
+    transaction_ids = client.get_user_transactions(PROSUMER)
+    records = [client.get_transaction_record(i) for i in transaction_ids]
+    elapsed = time.perf_counter() - start
+    assert transaction_ids and len(records) == len(transaction_ids)
+    return elapsed
+
+
+async def run_async(node: LocalSettlementNode, private_key: str, concurrency: int) -> float:
+    """异步客户端：getUserTransactions + 并发 getTransaction"""
+    async with await AsyncBlockchainClient.create(node.url, concurrency=concurrency) as client:
+        await client.load_account(private_key)
+        client.load_contract(node.contract_address, ABI_PATH)
+
+        start = time.perf_counter()
+        records = await client.get_user_history(PROSUMER)
+        elapsed = time.perf_counter() - start
+    assert records
+    return elapsed
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="同步/异步客户端交易历史拉取基准")
+    parser.add_argument("--records", type=int, default=288, help="用户交易记录条数（默认一天的5分钟结算）")
+    parser.add_argument("--latency", type=float, default=0.005, help="模拟节点每个请求的延迟（秒）")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    account = LocalSettlementNode.default_account()
+    with LocalSettlementNode(latency=args.latency) as node:
+        node.seed_transactions([(PROSUMER, 10**18, f"P2P settlement #{i}") for i in range(args.records)])
+
+        results = {"records": args.records, "latency": args.latency}
+        results["sync_seconds"] = run_sync(node, account.key.hex())
+        results["async_seconds"] = {}
+        for concurrency in args.concurrency:
+            results["async_seconds"][concurrency] = asyncio.run(
+                run_async(node, account.key.hex(), concurrency)
+            )
+
+    print("\n📊 拉取一个用户的完整交易历史")
+    print(f"记录数: {args.records}，单次请求延迟: {args.latency * 1000:.1f} ms")
+    print(f"  同步客户端          : {results['sync_seconds']:.3f} s")
+    for concurrency, seconds in results["async_seconds"].items():
+        speedup = results["sync_seconds"] / seconds
+        print(f"  异步客户端 (并发{concurrency:>4}) : {seconds:.3f} s  ({speedup:.1f}x)")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ 结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结算客户端基准测试
+在进程内EVM节点（eth-tester + py-evm，部署由 SettlementToken.sol 编译出的合约）或本地模拟节点上，
+测量 BlockchainClient 的：
+- transfer_tokens 的吞吐量与 p50/p99 延迟
+- 不同批量大小下 batch_transfer 的吞吐量、延迟与每笔gas
+- getUserTransactions 随历史记录增长的延迟
+- 交易从提交到确认的时间（按出块间隔打包）
+结果写入JSON（附带提交号与环境信息），可用 --compare 与之前的结果对比，发现性能回退。
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import web3
+from web3 import Web3
+
+from blockchain_client import BlockchainClient
+from client_metrics import ClientMetrics
+from local_node import ABI_PATH, LocalSettlementNode
+
+PROSUMER = Web3.to_checksum_address("0x742d35cc6634c0532925a3b8d4c9db96c4b4d8b6")
+DESCRIPTION = "P2P settlement"
+AMOUNT = 10**15
+
+# --compare 时检查的指标：(路径, 数值越大越好)
+COMPARED_METRICS = {
+    "per_s": True,
+    "p50_ms": False,
+    "p99_ms": False,
+}
+
+
+def summarize(samples: List[float], items: int = None) -> Dict[str, float]:
+    """
+    延迟样本统计
+
+    Args:
+        samples: 每次调用的耗时（秒）
+        items: 处理的条目总数（批量调用时大于调用次数），默认等于调用次数
+
+    Returns:
+        count、total_s、per_s（每秒条目数）、mean_ms、p50_ms、p99_ms、max_ms
+    """
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+
+    def pct(p):
+        return values[min(len(values) - 1, int(round(p * (len(values) - 1))))] * 1000
+
+    total = sum(values)
+    items = len(values) if items is None else items
+    return {
+        "count": len(values),
+        "total_s": total,
+        "per_s": items / total if total else float("inf"),
+        "mean_ms": total / len(values) * 1000,
+        "p50_ms": pct(0.50),
+        "p99_ms": pct(0.99),
+        "max_ms": values[-1] * 1000,
+    }
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽客户端逐笔打印的进度信息"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def start_node(args, block_time: float = 0.0):
+    """按 --backend 启动节点"""
+    if args.backend == "local":
+        return LocalSettlementNode(latency=args.latency, block_time=block_time).start()
+    from contract_build import load_artifact
+    from evm_node import EVMSettlementNode
+
+    artifact = load_artifact(args.artifact) if args.artifact else None
+    return EVMSettlementNode(latency=args.latency, block_time=block_time, artifact=artifact).start()
+
+
+def connect(node, metrics: ClientMetrics = None) -> BlockchainClient:
+    with quiet():
+        client = BlockchainClient(node.url, metrics=metrics)
+        client.load_account(node.default_account().key.hex())
+        client.load_contract(node.contract_address, ABI_PATH)
+    return client
+
+
+def recipients(count: int) -> List[str]:
+    return [Web3.to_checksum_address(f"0x{i + 1:040x}") for i in range(count)]
+
+
+def bench_transfer(client: BlockchainClient, count: int) -> Dict[str, Any]:
+    """逐笔 transfer_tokens（即时出块时每次调用包含执行与打包）"""
+    samples = []
+    with quiet():
+        for to in recipients(count):
+            start = time.perf_counter()
+            tx_hash = client.transfer_tokens(to, AMOUNT, DESCRIPTION)
+            samples.append(time.perf_counter() - start)
+        receipt = client.wait_for_transaction(tx_hash)
+    return {**summarize(samples), "gas_used": receipt["gasUsed"], "status": receipt["status"]}
+
+
+def bench_batch(client: BlockchainClient, sizes: List[int], repeat: int) -> Dict[str, Any]:
+    """不同批量大小的 batch_transfer；gas上限按节点估算（不计入耗时）"""
+    results = {}
+    for size in sizes:
+        to = recipients(size)
+        amounts = [AMOUNT] * size
+        gas = client.contract.functions.batchTransfer(to, amounts, DESCRIPTION).estimate_gas(
+            {"from": client.account.address})
+        samples = []
+        with quiet():
+            for _ in range(repeat):
+                start = time.perf_counter()
+                tx_hash = client.batch_transfer(to, amounts, DESCRIPTION, gas=gas * 6 // 5)
+                samples.append(time.perf_counter() - start)
+            receipt = client.wait_for_transaction(tx_hash)
+        results[str(size)] = {
+            **summarize(samples, items=size * repeat),
+            "gas_used": receipt["gasUsed"],
+            "gas_per_transfer": receipt["gasUsed"] / size,
+            "status": receipt["status"],
+        }
+        print(f"  batch_transfer ×{size:<4} {results[str(size)]['per_s']:>9.1f} 笔/s  "
+              f"p50 {results[str(size)]['p50_ms']:.1f} ms  gas/笔 {results[str(size)]['gas_per_transfer']:,.0f}")
+    return results
+
+
+def bench_history(node, client: BlockchainClient, levels: List[int], repeat: int) -> Dict[str, Any]:
+    """getUserTransactions 随该用户历史记录数增长的延迟"""
+    results = {}
+    seeded = 0
+    for level in sorted(levels):
+        if level > seeded:
+            node.seed_transactions([(PROSUMER, AMOUNT, f"{DESCRIPTION} #{i}") for i in range(seeded, level)])
+            seeded = level
+        samples = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            ids = client.get_user_transactions(PROSUMER)
+            samples.append(time.perf_counter() - start)
+        assert len(ids) == level, (len(ids), level)
+        results[str(level)] = summarize(samples)
+        print(f"  getUserTransactions（{level:>5} 条历史） p50 {results[str(level)]['p50_ms']:.1f} ms  "
+              f"p99 {results[str(level)]['p99_ms']:.1f} ms")
+    return results
+
+
+def bench_confirmation(args) -> Dict[str, Any]:
+    """按出块间隔打包时，交易从提交到确认的时间"""
+    node = start_node(args, block_time=args.block_time)
+    try:
+        client = connect(node)
+        tracker = client.confirmation_tracker
+        futures = []
+        with quiet():
+            for to in recipients(args.confirmations):
+                submitted_at = time.monotonic()
+                tx_hash = client.transfer_tokens(to, AMOUNT, DESCRIPTION)
+                futures.append(tracker.track(tx_hash, submitted_at=submitted_at))
+                # 提交时刻在出块间隔内错开，得到有代表性的等待时间分布
+                time.sleep(args.block_time / 3)
+            receipts = [f.result(timeout=args.block_time * 10 + 30) for f in futures]
+        summary = tracker.latency_summary()
+        tracker.stop()
+    finally:
+        node.stop()
+    return {
+        "block_time_s": args.block_time,
+        "count": summary["count"],
+        "failed": sum(1 for r in receipts if r["status"] == 0),
+        **{f"{k}_ms": v * 1000 for k, v in summary.items() if k != "count"},
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """把嵌套结果展开为 '段落.子项.指标' -> 数值"""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(flatten(value, path))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """
+    与基线结果对比
+
+    Args:
+        current: 本次结果（results 段）
+        baseline: 基线结果（results 段）
+        threshold: 允许的相对退化比例，如 0.2 表示 20%
+
+    Returns:
+        超过阈值的退化项说明列表
+    """
+    now, before = flatten(current), flatten(baseline)
+    regressions = []
+    print(f"\n📈 与基线对比（阈值 {threshold:.0%}）")
+    for path in sorted(now.keys() & before.keys()):
+        metric = path.rsplit(".", 1)[-1]
+        if metric not in COMPARED_METRICS or not before[path]:
+            continue
+        ratio = now[path] / before[path]
+        worse = ratio < 1 - threshold if COMPARED_METRICS[metric] else ratio > 1 + threshold
+        mark = "❌" if worse else "  "
+        print(f"{mark} {path:<45} {before[path]:>12.2f} → {now[path]:>12.2f}  ({ratio:.2f}x)")
+        if worse:
+            regressions.append(f"{path}: {before[path]:.2f} → {now[path]:.2f}")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="BlockchainClient 吞吐量/延迟基准（结果写入JSON）")
+    parser.add_argument("--backend", choices=["evm", "local"], default="evm",
+                        help="evm: 进程内EVM执行编译后的合约；local: Python复现合约逻辑的模拟节点")
+    parser.add_argument("--artifact", help="已编译的合约（{abi, bytecode} JSON 或 .bin/.abi 所在目录），跳过solc编译（仅evm）")
+    parser.add_argument("--latency", type=float, default=0.0, help="节点每个请求的模拟延迟（秒）")
+    parser.add_argument("--transfers", type=int, default=200, help="transfer_tokens 调用次数")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 50, 100])
+    parser.add_argument("--batch-repeat", type=int, default=10, help="每个批量大小的调用次数")
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 100, 500, 1000, 2000],
+                        help="getUserTransactions 测量时的历史记录数")
+    parser.add_argument("--history-repeat", type=int, default=20)
+    parser.add_argument("--block-time", type=float, default=1.0, help="确认时间测量所用的出块间隔（秒）")
+    parser.add_argument("--confirmations", type=int, default=30, help="确认时间测量的交易笔数，0为跳过")
+    parser.add_argument("--metrics", action="store_true",
+                        help="开启客户端指标，把各RPC方法与转账各阶段的耗时一并写入结果")
+    parser.add_argument("--json", default="benchmark_client.json", help="结果JSON文件")
+    parser.add_argument("--compare", help="基线结果JSON，与本次结果对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="判定为性能回退的相对变化")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    node = start_node(args)
+    print(f"🚀 {args.backend} 节点启动耗时 {time.perf_counter() - started:.2f} s，合约 {node.contract_address}")
+    results = {}
+    try:
+        client = connect(node, ClientMetrics() if args.metrics else None)
+        results["transfer_tokens"] = bench_transfer(client, args.transfers)
+        print(f"  transfer_tokens        {results['transfer_tokens']['per_s']:>9.1f} 笔/s  "
+              f"p50 {results['transfer_tokens']['p50_ms']:.1f} ms  p99 {results['transfer_tokens']['p99_ms']:.1f} ms")
+        results["batch_transfer"] = bench_batch(client, args.batch_sizes, args.batch_repeat)
+        results["get_user_transactions"] = bench_history(node, client, args.history, args.history_repeat)
+        if client.metrics is not None:
+            results["client_metrics"] = client.metrics.snapshot()
+    finally:
+        node.stop()
+    if args.confirmations:
+        results["confirmation"] = bench_confirmation(args)
+        print(f"  确认时间（出块间隔 {args.block_time:.1f} s） p50 {results['confirmation']['p50_ms']:.0f} ms  "
+              f"p99 {results['confirmation']['p99_ms']:.0f} ms")
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "backend": args.backend,
+            "python": platform.python_version(),
+            "web3": web3.__version__,
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    with open(args.json, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ 结果已保存到 {args.json}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} 项指标退化超过 {args.threshold:.0%}（基线 {baseline['meta']['commit']}）")
+            return 1
+        print(f"✅ 未发现超过 {args.threshold:.0%} 的退化（基线 {baseline['meta']['commit']}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
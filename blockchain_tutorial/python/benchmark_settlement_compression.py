@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结算压缩基准
+生成与 web/app.js simulate() 同格式的一天账本（按比例撮合、两指针配对），
+比较逐条上链、按付款方批量、交易对轧差、最少转账四种方式的交易笔数与gas。
+gas 使用本地模拟节点的计费模型（与其 eth_estimateGas 的结果一致）。
+"""
+
+import argparse
+import json
+import math
+import random
+import time
+
+from columnar_ledger import ColumnarLedger
+from local_node import TX_BASE_GAS, LocalSettlementNode, record_gas
+from settlement_compressor import SettlementCompressor
+
+STEPS = 288
+
+
+def synthetic_ledger(prosumers: int, steps: int = STEPS, seed: int = 42):
+    """
+    生成一天的P2P账本：光伏为钟形曲线，负荷带随机波动，
+    每个步长按比例撮合后用两指针生成买卖方配对（与 app.js 相同）
+
+    Args:
+        prosumers: 参与者数量
+        steps: 步长数（默认288个5分钟）
+        seed: 随机种子
+
+    Returns:
+        账本条目列表
+    """
+    rng = random.Random(seed)
+    names = [f"P{i + 1}" for i in range(prosumers)]
+    pv_cap = [rng.uniform(0.0, 1.2) for _ in names]
+    base_load = [rng.uniform(0.15, 0.45) for _ in names]
+    ledger = []
+    for t in range(steps):
+        hour = 24.0 * t / steps
+        sun = max(0.0, math.sin(math.pi * (hour - 6.0) / 12.0)) if 6.0 <= hour <= 18.0 else 0.0
+        price = round(0.18 + 0.08 * math.sin(math.pi * hour / 24.0), 4)
+        label = f"{int(hour):02d}:{int(round((hour % 1) * 60)):02d}"
+        net = [pv_cap[i] * sun - base_load[i] * rng.uniform(0.7, 1.3) for i in range(prosumers)]
+        sellers = [[i, e] for i, e in enumerate(net) if e > 0]
+        buyers = [[i, -e] for i, e in enumerate(net) if e < 0]
+        supply = sum(e for _, e in sellers)
+        demand = sum(e for _, e in buyers)
+        matched = min(supply, demand)
+        if matched <= 0:
+            continue
+        for s in sellers:
+            s[1] = s[1] * matched / supply
+        for b in buyers:
+            b[1] = b[1] * matched / demand
+        si = bi = 0
+        while si < len(sellers) and bi < len(buyers):
+            s, b = sellers[si], buyers[bi]
+            m = min(s[1], b[1])
+            if m > 1e-12:
+                ledger.append({'time': t, 'label': label, 'type': 'internal', 'buyer': names[b[0]],
+                               'seller': names[s[0]], 'energy': m, 'price': price, 'amount': m * price})
+                s[1] -= m
+                b[1] -= m
+            if s[1] <= 1e-12:
+                si += 1
+            if b[1] <= 1e-12:
+                bi += 1
+    return ledger
+
+
+def single_gas(count: int, description: str) -> int:
+    """逐笔 transferWithRecord 的总gas"""
+    return count * (TX_BASE_GAS + record_gas(description))
+
+
+def batched_gas(groups, description: str) -> int:
+    """每个付款方一笔 batchTransfer 的总gas"""
+    return sum(LocalSettlementNode.estimate_batch_gas(size, description) for size in groups)
+
+
+def payer_group_sizes(pairs):
+    sizes = {}
+    for payer, _payee in pairs:
+        sizes[payer] = sizes.get(payer, 0) + 1
+    return list(sizes.values())
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="结算压缩前后的交易笔数与gas对比")
+    parser.add_argument("--prosumers", type=int, default=20, help="参与者数量")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    ledger = synthetic_ledger(args.prosumers, seed=args.seed)
+    description = "P2P settlement"
+
+    start = time.perf_counter()
+    pairwise = SettlementCompressor(ledger, mode='pairwise')
+    minimal = SettlementCompressor(ledger, mode='minimal')
+    compress_seconds = time.perf_counter() - start
+    assert pairwise.check_balanced() and minimal.check_balanced()
+    assert minimal.verify(ledger[0], minimal.proof(0))
+    # 同一账本的列式表示给出相同的 Merkle 根与转账
+    columnar = SettlementCompressor(ColumnarLedger.from_records(ledger), mode='minimal')
+    assert columnar.root == minimal.root and columnar.transfers == minimal.transfers
+
+    raw_pairs = [(entry['buyer'], entry['seller']) for entry in minimal.settled]
+    rows = {
+        "逐条上链": (len(raw_pairs), single_gas(len(raw_pairs), description)),
+        "按付款方批量（不轧差）": (len(payer_group_sizes(raw_pairs)),
+                        batched_gas(payer_group_sizes(raw_pairs), description)),
+    }
+    for name, result in (("交易对轧差", pairwise), ("最少转账", minimal)):
+        pairs = [(payer, payee) for payer, payee, _ in result.transfers]
+        rows[name] = (len(pairs), single_gas(len(pairs), result.description(description)))
+        rows[name + " + 批量"] = (len(payer_group_sizes(pairs)),
+                                 batched_gas(payer_group_sizes(pairs), result.description(description)))
+
+    print(f"\n📊 一天账本结算压缩（{args.prosumers} 个参与者，{len(ledger)} 条账本条目）")
+    print(f"压缩与 Merkle 承诺耗时: {compress_seconds * 1000:.1f} ms，根: {minimal.root}")
+    baseline_gas = rows["逐条上链"][1]
+    for name, (tx_count, gas) in rows.items():
+        print(f"  {name:<16} 交易 {tx_count:>6}  gas {gas:>13,}  ({gas / baseline_gas:.2%})")
+
+    if args.json:
+        results = {
+            "prosumers": args.prosumers,
+            "ledger_entries": len(ledger),
+            "merkle_root": minimal.root,
+            "compress_seconds": compress_seconds,
+            "rows": {name: {"transactions": tx, "gas": gas} for name, (tx, gas) in rows.items()},
+        }
+        with open(args.json, "w") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"✅ 结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行签名基准
+在本地模拟节点上比较：
+- 逐笔 build_transaction + 签名 + 发送（transfer_tokens_pipelined）
+- 批量构建 + 签名池并行签名 + 按块批量发送（transfer_tokens_parallel），1/2/4/8 个签名进程
+分别给出纯签名吞吐量和端到端吞吐量。签名进程数超过CPU核数时不会再有提升。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import time
+
+from web3 import Web3
+
+from blockchain_client import BlockchainClient
+from local_node import ABI_PATH, LocalSettlementNode
+
+DESCRIPTION = "P2P settlement"
+
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def transfers(count: int):
+    return [(Web3.to_checksum_address(f"0x{i % 500 + 1:040x}"), 10**15, DESCRIPTION) for i in range(count)]
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="签名池并行签名吞吐量基准")
+    parser.add_argument("--transactions", type=int, default=1000, help="每轮交易笔数")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunk-size", type=int, default=64, help="每个签名任务的交易数")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟节点每个请求的延迟（秒）")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    account = LocalSettlementNode.default_account()
+    results = {"transactions": args.transactions, "cpus": os.cpu_count(), "chunk_size": args.chunk_size}
+    with LocalSettlementNode(latency=args.latency) as node, quiet():
+        client = BlockchainClient(node.url)
+        client.load_account(account.key.hex())
+        client.load_contract(node.contract_address, ABI_PATH)
+
+        start = time.perf_counter()
+        client.transfer_tokens_pipelined(transfers(args.transactions))
+        results["pipelined_seconds"] = time.perf_counter() - start
+
+        results["workers"] = {}
+        for workers in args.workers:
+            with client.signing_pool(workers, chunk_size=args.chunk_size) as pool:
+                start = time.perf_counter()
+                pool.warm_up()
+                startup = time.perf_counter() - start
+
+                # 纯签名：构建好的交易只签名不发送（之后交还nonce）
+                unsigned = client.build_transfer_transactions(transfers(args.transactions))
+                start = time.perf_counter()
+                signed = pool.sign(unsigned)
+                sign_seconds = time.perf_counter() - start
+                client.nonce_manager.release(unsigned[0]["nonce"], len(unsigned))
+                assert len(signed) == args.transactions
+
+                before = len(node._records)
+                start = time.perf_counter()
+                tx_hashes = client.transfer_tokens_parallel(transfers(args.transactions), pool)
+                end_to_end = time.perf_counter() - start
+                assert len(tx_hashes) == args.transactions
+                assert len(node._records) - before == args.transactions
+
+            results["workers"][workers] = {
+                "startup_seconds": startup,
+                "sign_seconds": sign_seconds,
+                "sign_per_s": args.transactions / sign_seconds,
+                "end_to_end_seconds": end_to_end,
+                "end_to_end_per_s": args.transactions / end_to_end,
+            }
+
+    print(f"\n📊 {args.transactions} 笔转账，CPU {results['cpus']} 核，每块 {args.chunk_size} 笔")
+    print(f"  逐笔构建+签名+发送（pipelined） : {args.transactions / results['pipelined_seconds']:>8.0f} 笔/s")
+    print(f"  {'签名进程':>8} {'启动 s':>8} {'纯签名 笔/s':>12} {'端到端 笔/s':>12} {'相对 pipelined':>14}")
+    for workers, row in results["workers"].items():
+        speedup = results["pipelined_seconds"] / row["end_to_end_seconds"]
+        print(f"  {workers:>8} {row['startup_seconds']:>8.2f} {row['sign_per_s']:>12.0f} "
+              f"{row['end_to_end_per_s']:>12.0f} {speedup:>13.1f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ 结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
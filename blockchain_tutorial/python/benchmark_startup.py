@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端启动耗时基准
+每轮在新的Python进程里测量（模块缓存为空，相当于一次冷启动）：
+- import blockchain_client 的耗时
+- 第一个 BlockchainClient 的创建、load_contract 和第一次合约调用
+- 同一进程内再创建客户端并加载合约的耗时（共享连接、ABI和合约对象）
+- 对照：不经缓存，每次新建 HTTPProvider、检查连接、读取ABI、构造合约对象
+节点为本地模拟节点，RPC本身几乎不耗时，测到的主要是客户端开销。
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+@contextlib.contextmanager
+def quiet():
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(url: str, contract_address: str, abi_path: str, repeat: int) -> dict:
+    """在当前（新启动的）进程内测量一轮"""
+    result = {}
+    start = time.perf_counter()
+    from blockchain_client import BlockchainClient
+    result["import_s"] = time.perf_counter() - start
+
+    with quiet():
+        start = time.perf_counter()
+        client = BlockchainClient(url)
+        result["first_client_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.load_contract(contract_address, abi_path)
+        result["first_load_contract_s"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        client.contract.functions.name().call()
+        result["first_call_s"] = time.perf_counter() - start
+
+        cached = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            BlockchainClient(url).load_contract(contract_address, abi_path)
+            cached.append(time.perf_counter() - start)
+
+    from web3 import Web3
+
+    uncached = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        w3 = Web3(Web3.HTTPProvider(url))
+        assert w3.is_connected()
+        w3.eth.block_number
+        with open(abi_path, "r") as f:
+            w3.eth.contract(address=contract_address, abi=json.load(f))
+        uncached.append(time.perf_counter() - start)
+
+    result["repeat_client_ms"] = statistics.median(cached) * 1000
+    result["uncached_client_ms"] = statistics.median(uncached) * 1000
+    return result
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="BlockchainClient 冷启动与重复创建耗时基准")
+    parser.add_argument("--runs", type=int, default=5, help="冷启动进程数")
+    parser.add_argument("--repeat", type=int, default=50, help="每个进程内重复创建客户端的次数")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    parser.add_argument("--child", nargs=3, metavar=("URL", "CONTRACT", "ABI"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(*args.child, args.repeat)))
+        return
+
+    from local_node import ABI_PATH, LocalSettlementNode
+
+    runs = []
+    with LocalSettlementNode() as node:
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--repeat", str(args.repeat),
+                 "--child", node.url, node.contract_address, ABI_PATH],
+                check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    results = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    results.update(runs=args.runs, repeat=args.repeat)
+
+    print(f"\n📊 冷启动 {args.runs} 次取中位数（每次在同一进程内重复创建客户端 {args.repeat} 次）")
+    print(f"  import blockchain_client       : {results['import_s'] * 1000:>8.1f} ms")
+    print(f"  第一个客户端（含导入web3）     : {results['first_client_s'] * 1000:>8.1f} ms")
+    print(f"  第一次 load_contract           : {results['first_load_contract_s'] * 1000:>8.1f} ms")
+    print(f"  第一次合约调用                 : {results['first_call_s'] * 1000:>8.1f} ms")
+    print(f"  再创建客户端+加载合约（缓存）  : {results['repeat_client_ms']:>8.2f} ms")
+    print(f"  对照：不经缓存                 : {results['uncached_client_ms']:>8.2f} ms "
+          f"（{results['uncached_client_ms'] / results['repeat_client_ms']:.0f}x）")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ 结果已保存到 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,36 +3,244 @@
 """
 区块链客户端
 用于与智能合约交互的Python脚本
+web3、eth_account 等依赖在第一次链上调用时才导入，导入本模块本身很快。
 """
 
+from __future__ import annotations
+
 import json
 import time
-from typing import List, Dict, Any
-from web3 import Web3
-from eth_account import Account
+import threading
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 import os
 
+import chain_registry
+from client_metrics import NULL_PHASE, ClientMetrics
+
+if TYPE_CHECKING:
+    from web3 import Web3
+    from confirmation_tracker import ConfirmationTracker
+    from event_indexer import EventIndexer
+    from signing_pool import SigningPool
+
+# 节点返回的nonce冲突/断档错误中常见的关键字（Ganache、Geth等）
+NONCE_ERROR_MARKERS = (
+    "nonce too low",
+    "nonce too high",
+    "correct nonce",
+    "invalid nonce",
+    "invalid transaction nonce",
+)
+
+# 节点已收到同一笔已签名交易时的错误关键字：交易已在交易池中，不是nonce冲突，不能换nonce重签
+KNOWN_TRANSACTION_MARKERS = (
+    "already known",
+    "known transaction",
+)
+
+# 单个JSON-RPC批量请求中最多包含的调用数（过大时节点可能拒绝）
+MAX_RPC_BATCH_SIZE = 500
+# 批量请求的HTTP超时（秒），与 web3 HTTPProvider 的默认值一致
+DEFAULT_RPC_TIMEOUT = 10
+
+# transferWithRecord 的函数选择器与参数类型（批量构建交易时直接编码）
+# keccak("transferWithRecord(address,uint256,string)")[:4]，写成常量以免导入时加载 web3
+TRANSFER_WITH_RECORD_SELECTOR = bytes.fromhex("8289f150")
+TRANSFER_WITH_RECORD_TYPES = ["address", "uint256", "string"]
+
+
+def is_nonce_error(error: Exception) -> bool:
+    """判断节点返回的异常是否由nonce冲突或断档引起"""
+    message = str(error).lower()
+    return any(marker in message for marker in NONCE_ERROR_MARKERS)
+
+
+def is_known_transaction(error: Exception) -> bool:
+    """判断节点返回的异常是否表示这笔已签名交易已经在节点上（视为已发送）"""
+    message = str(error).lower()
+    return any(marker in message for marker in KNOWN_TRANSACTION_MARKERS)
+
+
+def _batch_name(requests: List[Tuple[str, list]]) -> str:
+    """批量请求在指标中的名称，如 batch:eth_call"""
+    methods = {method for method, _ in requests}
+    return f"batch:{methods.pop()}" if len(methods) == 1 else "batch:mixed"
+
+
+class GasPriceCache:
+    """带短期TTL的gas价格缓存，避免每笔交易都调用 eth_gasPrice"""
+
+    def __init__(self, w3: Web3, ttl: float = 5.0):
+        """
+        Args:
+            w3: Web3实例
+            ttl: 缓存有效期（秒），为0时每次都向节点查询
+        """
+        self.w3 = w3
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = None
+        self._fetched_at = 0.0
+
+    def get(self) -> int:
+        """获取gas价格，缓存过期时才重新查询节点"""
+        with self._lock:
+            now = time.monotonic()
+            if self._value is None or now - self._fetched_at >= self.ttl:
+                self._value = self.w3.eth.gas_price
+                self._fetched_at = now
+            return self._value
+
+    def invalidate(self):
+        """使缓存失效，下次调用 get 时重新查询"""
+        with self._lock:
+            self._value = None
+
+
+class NonceManager:
+    """
+    账户级本地nonce分配器
+
+    首次使用时从节点同步一次 pending 交易数，之后在本地原子递增分配，
+    多个线程可以同时发送交易而不会拿到相同的nonce。
+    每次 allocate 都要以 commit（已发出）、release（未发出）或 invalidate（不确定）结束：
+    未发出的nonce若仍是最后分配的一段就直接回退，否则标记为需要同步，
+    等所有在途的分配都结束后，下一次 allocate 从节点重新同步，避免后续交易全部卡在空洞之后。
+    发送失败（nonce过低/断档）时调用 resync 立即重新与节点对齐。
+    """
+
+    def __init__(self, w3: Web3, address: str):
+        """
+        Args:
+            w3: Web3实例
+            address: 发送交易的账户地址
+        """
+        self.w3 = w3
+        self.address = address
+        self._lock = threading.Lock()
+        self._next_nonce = None
+        self._in_flight = 0
+        self._dirty = False
+
+    def _sync_locked(self):
+        self._next_nonce = self.w3.eth.get_transaction_count(self.address, 'pending')
+        self._dirty = False
+
+    def allocate(self, count: int = 1) -> int:
+        """
+        原子地分配一段连续nonce
+
+        Args:
+            count: 需要的nonce个数
+
+        Returns:
+            分配到的第一个nonce，本次占用 [nonce, nonce + count)
+        """
+        with self._lock:
+            if self._next_nonce is None or (self._dirty and self._in_flight == 0):
+                self._sync_locked()
+            nonce = self._next_nonce
+            self._next_nonce += count
+            self._in_flight += 1
+            return nonce
+
+    def commit(self):
+        """一次 allocate 分配的nonce已全部发出"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    def release(self, nonce: int, count: int = 1):
+        """
+        一次 allocate 分配的 [nonce, nonce + count) 没有发出
+
+        仍是最后分配的一段时直接回退计数；否则中间留下了空洞，等在途分配结束后重新同步
+        """
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            if self._next_nonce is not None and nonce + count == self._next_nonce:
+                self._next_nonce = nonce
+            else:
+                self._dirty = True
+
+    def invalidate(self):
+        """一次 allocate 分配的nonce可能只发出了一部分：等在途分配结束后重新同步"""
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+            self._dirty = True
+
+    def resync(self) -> int:
+        """
+        丢弃本地计数并重新从节点同步
+
+        Returns:
+            同步后的下一个可用nonce
+        """
+        with self._lock:
+            self._sync_locked()
+            return self._next_nonce
+
+    def peek(self) -> Optional[int]:
+        """查看下一个将要分配的nonce（尚未同步时返回None）"""
+        with self._lock:
+            return self._next_nonce
+
+
 class BlockchainClient:
     """区块链客户端类"""
     
-    def __init__(self, ganache_url: str = "http://127.0.0.1:7545"):
+    def __init__(self, ganache_url: str = "http://127.0.0.1:7545", metrics: Optional[ClientMetrics] = None):
         """
         初始化区块链客户端
         
         Args:
             ganache_url: Ganache本地链的URL
+            metrics: 运行指标收集器（见 enable_metrics），默认不收集
         """
-        self.w3 = Web3(Web3.HTTPProvider(ganache_url))
+        self.url = ganache_url
+        self.w3 = chain_registry.get_web3(ganache_url)
+        self.metrics = None
         self.account = None
         self.contract = None
         self.contract_address = None
+        self.nonce_manager = None
+        self.gas_price_cache = GasPriceCache(self.w3)
+        self.event_indexer = None
+        self._confirmation_tracker = None
+        self._chain_id = None
+        if metrics is not None:
+            self.enable_metrics(metrics)
+        
+        # 检查连接（同一URL在进程内只检查一次）
+        first, block_number = chain_registry.check_connection(self.w3, ganache_url)
+        if first:
+            print(f"✅ 成功连接到Ganache: {ganache_url}")
+            print(f"当前区块高度: {block_number}")
+    
+    def enable_metrics(self, metrics: Optional[ClientMetrics] = None) -> ClientMetrics:
+        """
+        开启运行指标：每个JSON-RPC调用计数计时，并记录转账各阶段耗时
         
-        # 检查连接
-        if not self.w3.is_connected():
-            raise Exception("无法连接到Ganache，请确保Ganache正在运行")
-        
-        print(f"✅ 成功连接到Ganache: {ganache_url}")
-        print(f"当前区块高度: {self.w3.eth.block_number}")
+        Args:
+            metrics: 指标收集器（可在多个客户端间共享），默认新建
+            
+        Returns:
+            指标收集器（snapshot() 查看快照，serve() 启动 Prometheus 端点）
+        """
+        if self.metrics is None:
+            self.metrics = metrics or ClientMetrics()
+            # 共享的 Web3 实例不能直接加中间件，换成与该指标收集器绑定的实例；
+            # EventIndexer、SettlementPlanner、ConfirmationTracker 每次都从客户端读取 w3，无需另行更新
+            self.w3 = chain_registry.get_web3(self.url, self.metrics)
+            self.gas_price_cache.w3 = self.w3
+            if self.nonce_manager is not None:
+                self.nonce_manager.w3 = self.w3
+            if self.contract is not None:
+                self.contract = chain_registry.get_contract(self.w3, self.contract_address, self.contract.abi)
+        return self.metrics
+    
+    def _phase(self, name: str):
+        """阶段计时上下文，未开启指标时为空操作"""
+        return self.metrics.phase(name) if self.metrics is not None else NULL_PHASE
     
     def load_account(self, private_key: str = None):
         """
@@ -41,6 +249,8 @@ class BlockchainClient:
         Args:
             private_key: 私钥，如果为None则使用默认账户
         """
+        from eth_account import Account
+
         if private_key:
             self.account = Account.from_key(private_key)
         else:
@@ -52,6 +262,8 @@ class BlockchainClient:
             else:
                 raise Exception("没有可用的账户")
         
+        self.nonce_manager = NonceManager(self.w3, self.account.address)
+
         print(f"账户地址: {self.account.address}")
         balance = self.w3.eth.get_balance(self.account.address)
         print(f"账户余额: {self.w3.from_wei(balance, 'ether')} ETH")
@@ -65,13 +277,8 @@ class BlockchainClient:
             abi_path: ABI文件路径
         """
         try:
-            with open(abi_path, 'r') as f:
-                abi = json.load(f)
-            
-            self.contract = self.w3.eth.contract(
-                address=contract_address,
-                abi=abi
-            )
+            abi, digest = chain_registry.load_abi(abi_path)
+            self.contract = chain_registry.get_contract(self.w3, contract_address, abi, digest)
             self.contract_address = contract_address
             
             print(f"✅ 成功加载合约: {contract_address}")
@@ -102,6 +309,85 @@ class BlockchainClient:
         balance = self.contract.functions.balanceOf(address).call()
         return balance
     
+    @property
+    def chain_id(self) -> int:
+        """链ID（只查询一次，构建交易时不再重复请求）"""
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    def sign_contract_transaction(self, contract_call, gas: int, nonce: int):
+        """
+        构建并签名合约交易，但不发送
+        
+        Args:
+            contract_call: 合约函数调用对象
+            gas: gas上限
+            nonce: 交易nonce（通常来自 self.nonce_manager.allocate()）
+            
+        Returns:
+            已签名交易（rawTransaction、hash）
+        """
+        if not self.account:
+            raise Exception("账户未加载")
+        
+        transaction = contract_call.build_transaction({
+            'from': self.account.address,
+            'gas': gas,
+            'gasPrice': self.gas_price_cache.get(),
+            'nonce': nonce,
+            'chainId': self.chain_id
+        })
+        return self.w3.eth.account.sign_transaction(transaction, self.account.key)
+    
+    def _send_contract_transaction(self, contract_call, gas: int, max_retries: int = 3) -> str:
+        """
+        使用本地nonce分配器签名并发送合约交易，不等待确认
+
+        nonce冲突或断档时重新同步nonce后重签重发；节点报告交易已存在时说明同一笔交易已发出，
+        直接返回其哈希（换nonce重发会重复转账）；其他错误原样抛出，并把没发出的nonce交还分配器
+        （回退，或等在途交易都发出后再与节点同步——其他线程可能持有已分配但尚未发送的nonce）。
+
+        Args:
+            contract_call: 合约函数调用对象
+            gas: gas上限
+            max_retries: nonce错误的最大重试次数
+
+        Returns:
+            交易哈希
+        """
+        if not self.account:
+            raise Exception("账户未加载")
+
+        attempt = 0
+        while True:
+            with self._phase('nonce'):
+                nonce = self.nonce_manager.allocate()
+            signed_txn = None
+            try:
+                with self._phase('sign'):
+                    signed_txn = self.sign_contract_transaction(contract_call, gas, nonce)
+                with self._phase('send'):
+                    tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            except Exception as e:
+                if signed_txn is not None and is_known_transaction(e):
+                    self.nonce_manager.commit()
+                    return signed_txn.hash.hex()
+                # 这个nonce没有发出：回退或标记需要同步，后续交易不会卡在空洞之后
+                self.nonce_manager.release(nonce)
+                if not is_nonce_error(e):
+                    raise
+                self.nonce_manager.resync()
+                if attempt < max_retries:
+                    attempt += 1
+                    if self.metrics is not None:
+                        self.metrics.retry('nonce')
+                    print(f"⚠️  nonce {nonce} 冲突，重新同步后重试 ({attempt}/{max_retries})")
+                    continue
+                raise
+            self.nonce_manager.commit()
+            return tx_hash.hex()
+
     def transfer_tokens(self, to_address: str, amount: int, description: str = "") -> str:
         """
         转账代币
@@ -117,28 +403,138 @@ class BlockchainClient:
         if not self.contract:
             raise Exception("合约未加载")
         
-        # 构建交易
-        transaction = self.contract.functions.transferWithRecord(
-            to_address,
-            amount,
-            description
-        ).build_transaction({
-            'from': self.account.address,
-            'gas': 200000,
-            'gasPrice': self.w3.eth.gas_price,
-            'nonce': self.w3.eth.get_transaction_count(self.account.address)
-        })
+        tx_hash = self._send_contract_transaction(
+            self.contract.functions.transferWithRecord(to_address, amount, description),
+            gas=200000
+        )
+        
+        print(f"✅ 交易已发送: {tx_hash}")
+        return tx_hash
+    
+    def transfer_tokens_pipelined(self, transfers: List[Tuple[str, int, str]]) -> List[str]:
+        """
+        流水线批量发送转账：连续签名发送，不逐笔等待确认
+        
+        Args:
+            transfers: (接收方地址, 转账金额, 交易描述) 列表
+            
+        Returns:
+            交易哈希列表，顺序与输入一致
+        """
+        if not self.contract:
+            raise Exception("合约未加载")
+        
+        tx_hashes = []
+        for to_address, amount, description in transfers:
+            tx_hashes.append(self._send_contract_transaction(
+                self.contract.functions.transferWithRecord(to_address, amount, description),
+                gas=200000
+            ))
+        
+        print(f"✅ 已流水线发送 {len(tx_hashes)} 笔交易")
+        return tx_hashes
+    
+    def build_transfer_transactions(self, transfers: List[Tuple[str, int, str]],
+                                    gas: int = 200000) -> List[Dict[str, Any]]:
+        """
+        批量构建未签名的转账交易：一次预分配连续nonce，直接ABI编码调用数据
+        （不逐笔调用 build_transaction，也不逐笔查询gas价格）
+        
+        Args:
+            transfers: (接收方地址, 转账金额, 交易描述) 列表
+            gas: 每笔交易的gas上限
+            
+        Returns:
+            未签名交易列表，nonce按输入顺序连续递增；发出后调用 nonce_manager.commit()，
+            不发送时调用 nonce_manager.release(第一个nonce, 笔数) 交还
+        """
+        if not self.contract:
+            raise Exception("合约未加载")
+        if not self.account:
+            raise Exception("账户未加载")
+        
+        with self._phase('build'):
+            return self._build_transfer_transactions(transfers, gas)
+    
+    def _build_transfer_transactions(self, transfers: List[Tuple[str, int, str]], gas: int) -> List[Dict[str, Any]]:
+        from eth_abi import encode as abi_encode
+
+        gas_price = self.gas_price_cache.get()
+        chain_id = self.chain_id
+        nonce = self.nonce_manager.allocate(len(transfers))
+        return [
+            {
+                'to': self.contract_address,
+                'value': 0,
+                'data': '0x' + (TRANSFER_WITH_RECORD_SELECTOR + abi_encode(
+                    TRANSFER_WITH_RECORD_TYPES, [to_address, amount, description])).hex(),
+                'gas': gas,
+                'gasPrice': gas_price,
+                'nonce': nonce + i,
+                'chainId': chain_id,
+            }
+            for i, (to_address, amount, description) in enumerate(transfers)
+        ]
+    
+    def send_raw_transactions(self, signed_chunks) -> List[str]:
+        """
+        按顺序发送已签名交易，每块用一次JSON-RPC批量请求
+        
+        Args:
+            signed_chunks: 逐块产出 (交易哈希, 原始交易) 列表的可迭代对象（如 SigningPool.sign_iter）
+            
+        Returns:
+            交易哈希列表
+        """
+        tx_hashes = []
+        for chunk in signed_chunks:
+            responses = self.rpc_batch([('eth_sendRawTransaction', ['0x' + raw.hex()]) for _, raw in chunk])
+            for (tx_hash, _), response in zip(chunk, responses):
+                if 'error' in response:
+                    raise Exception(f"发送交易失败（已发送 {len(tx_hashes)} 笔）: "
+                                    f"{response['error'].get('message')}")
+                tx_hashes.append(tx_hash)
+        return tx_hashes
+    
+    def signing_pool(self, workers: int = 4, **kwargs) -> SigningPool:
+        """为当前账户创建签名池（用完需要 close，或用 with 语句）"""
+        if not self.account:
+            raise Exception("账户未加载")
+        from signing_pool import SigningPool
+
+        return SigningPool(self.account.key, workers, **kwargs)
+    
+    def transfer_tokens_parallel(self, transfers: List[Tuple[str, int, str]], pool: SigningPool,
+                                 gas: int = 200000) -> List[str]:
+        """
+        大批量转账：批量构建交易，在签名池中并行签名，并按nonce顺序边签名边发送
         
-        # 签名交易
-        signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
+        Args:
+            transfers: (接收方地址, 转账金额, 交易描述) 列表
+            pool: 当前账户的签名池（见 signing_pool）
+            gas: 每笔交易的gas上限
+            
+        Returns:
+            交易哈希列表，顺序与输入一致
+        """
+        if pool.address != self.account.address:
+            raise ValueError("签名池的账户与客户端账户不一致")
         
-        # 发送交易
-        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        transactions = self.build_transfer_transactions(transfers, gas)
+        try:
+            with self._phase('sign_send'):
+                tx_hashes = self.send_raw_transactions(pool.sign_iter(transactions))
+        except Exception:
+            # 可能只发出了一部分，没发出的nonce会留下空洞：在途交易结束后重新与节点对齐
+            self.nonce_manager.invalidate()
+            raise
+        self.nonce_manager.commit()
         
-        print(f"✅ 交易已发送: {tx_hash.hex()}")
-        return tx_hash.hex()
+        print(f"✅ 已并行签名并发送 {len(tx_hashes)} 笔交易（{pool.workers} 个签名进程）")
+        return tx_hashes
     
-    def batch_transfer(self, recipients: List[str], amounts: List[int], description: str = "") -> str:
+    def batch_transfer(self, recipients: List[str], amounts: List[int], description: str = "",
+                       gas: int = 500000) -> str:
         """
         批量转账
         
@@ -146,6 +542,7 @@ class BlockchainClient:
             recipients: 接收方地址列表
             amounts: 转账金额列表
             description: 交易描述
+            gas: gas上限（每个接收方约需15万gas，批量较大时需要调高）
             
         Returns:
             交易哈希
@@ -156,26 +553,130 @@ class BlockchainClient:
         if len(recipients) != len(amounts):
             raise ValueError("接收方和金额列表长度必须相同")
         
-        # 构建交易
-        transaction = self.contract.functions.batchTransfer(
-            recipients,
-            amounts,
-            description
-        ).build_transaction({
-            'from': self.account.address,
-            'gas': 500000,  # 批量转账需要更多gas
-            'gasPrice': self.w3.eth.gas_price,
-            'nonce': self.w3.eth.get_transaction_count(self.account.address)
-        })
+        tx_hash = self._send_contract_transaction(
+            self.contract.functions.batchTransfer(recipients, amounts, description),
+            gas=gas
+        )
         
-        # 签名交易
-        signed_txn = self.w3.eth.account.sign_transaction(transaction, self.account.key)
+        print(f"✅ 批量转账已发送: {tx_hash}")
+        return tx_hash
+    
+    def rpc_batch(self, requests: List[Tuple[str, list]], max_batch_size: int = MAX_RPC_BATCH_SIZE) -> List[Dict[str, Any]]:
+        """
+        以JSON-RPC批量请求发送多个调用，每 max_batch_size 个调用只需一次HTTP往返
         
-        # 发送交易
-        tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
+        Args:
+            requests: (RPC方法名, 参数列表) 列表
+            max_batch_size: 单个HTTP请求最多包含的调用数
+            
+        Returns:
+            与输入顺序一致的原始响应（含 result 或 error 字段）
+        """
+        responses = []
+        provider = self.w3.provider
+        session = chain_registry.get_session(provider.endpoint_uri)
+        request_kwargs = {'timeout': DEFAULT_RPC_TIMEOUT, **provider.get_request_kwargs()}
+        for start in range(0, len(requests), max_batch_size):
+            chunk = requests[start:start + max_batch_size]
+            payload = [
+                {'jsonrpc': '2.0', 'id': i, 'method': method, 'params': params}
+                for i, (method, params) in enumerate(chunk)
+            ]
+            if self.metrics is not None:
+                self.metrics.begin_request()
+            t0 = time.perf_counter()
+            try:
+                response = session.post(provider.endpoint_uri, data=json.dumps(payload).encode(), **request_kwargs)
+                response.raise_for_status()
+                body = response.json()
+                if isinstance(body, dict):
+                    # 节点拒绝整个批量请求时返回单个错误对象：把错误分配给这一块的每个调用
+                    error = body.get('error') or {'message': f"批量请求的响应不是数组: {body}"}
+                    by_id = {i: {'jsonrpc': '2.0', 'id': i, 'error': error} for i in range(len(chunk))}
+                else:
+                    by_id = {item.get('id'): item for item in body}
+            except Exception:
+                if self.metrics is not None:
+                    self.metrics.observe_rpc(_batch_name(chunk), time.perf_counter() - t0, error=True)
+                raise
+            if self.metrics is not None:
+                self.metrics.observe_rpc(_batch_name(chunk), time.perf_counter() - t0,
+                                         error=any('error' in item for item in by_id.values()))
+            responses.extend(by_id.get(i, {'error': {'message': '缺少响应'}}) for i in range(len(chunk)))
+        return responses
+    
+    def batch_call(self, calls: List[Any], block_identifier: str = 'latest') -> List[Any]:
+        """
+        把多个合约只读调用合并为一次JSON-RPC批量请求
+        
+        Args:
+            calls: 合约函数调用对象列表，如 contract.functions.balanceOf(addr)
+            block_identifier: 查询所基于的区块
+            
+        Returns:
+            解码后的返回值列表，顺序与输入一致；单个调用失败时对应位置为异常对象
+        """
+        if not self.contract:
+            raise Exception("合约未加载")
+        
+        requests = [
+            ('eth_call', [{
+                'to': self.contract_address,
+                'data': self.contract.encodeABI(fn_name=call.fn_name, args=call.args, kwargs=call.kwargs)
+            }, block_identifier])
+            for call in calls
+        ]
+        
+        from eth_abi import decode as abi_decode
+        from web3 import Web3
+        from web3._utils.abi import get_abi_output_types
+
+        results = []
+        for call, response in zip(calls, self.rpc_batch(requests)):
+            if 'error' in response:
+                results.append(Exception(response['error'].get('message', response['error'])))
+                continue
+            output_types = get_abi_output_types(call.abi)
+            values = abi_decode(output_types, bytes.fromhex(response['result'][2:]))
+            values = [
+                Web3.to_checksum_address(v) if t == 'address' else v
+                for t, v in zip(output_types, values)
+            ]
+            results.append(values[0] if len(values) == 1 else values)
+        return results
+    
+    def get_balances(self, addresses: List[str]) -> Dict[str, int]:
+        """
+        批量获取代币余额（一次HTTP往返）
+        
+        Args:
+            addresses: 地址列表
+            
+        Returns:
+            地址 -> 余额，查询失败的地址不出现在结果中
+        """
+        if not self.contract:
+            raise Exception("合约未加载")
         
-        print(f"✅ 批量转账已发送: {tx_hash.hex()}")
-        return tx_hash.hex()
+        calls = [self.contract.functions.balanceOf(a) for a in addresses]
+        balances = {}
+        for address, value in zip(addresses, self.batch_call(calls)):
+            if isinstance(value, Exception):
+                print(f"❌ 获取余额失败 {address}: {value}")
+                continue
+            balances[address] = value
+        return balances
+    
+    @staticmethod
+    def _transaction_record(transaction_id: int, tx_data) -> Dict[str, Any]:
+        return {
+            'transaction_id': transaction_id,
+            'from': tx_data[0],
+            'to': tx_data[1],
+            'amount': tx_data[2],
+            'timestamp': tx_data[3],
+            'description': tx_data[4]
+        }
     
     def get_transaction_record(self, transaction_id: int) -> Dict[str, Any]:
         """
@@ -192,19 +693,69 @@ class BlockchainClient:
         
         try:
             tx_data = self.contract.functions.getTransaction(transaction_id).call()
-            
-            return {
-                'transaction_id': transaction_id,
-                'from': tx_data[0],
-                'to': tx_data[1],
-                'amount': tx_data[2],
-                'timestamp': tx_data[3],
-                'description': tx_data[4]
-            }
+            return self._transaction_record(transaction_id, tx_data)
         except Exception as e:
             print(f"❌ 获取交易记录失败: {e}")
             return None
     
+    def get_transaction_records(self, transaction_ids: List[int]) -> List[Dict[str, Any]]:
+        """
+        批量获取交易记录（一次HTTP往返）
+        
+        Args:
+            transaction_ids: 交易ID列表
+            
+        Returns:
+            交易记录列表，顺序与输入一致；获取失败的记录为None
+        """
+        if not self.contract:
+            raise Exception("合约未加载")
+        
+        calls = [self.contract.functions.getTransaction(i) for i in transaction_ids]
+        records = []
+        for transaction_id, tx_data in zip(transaction_ids, self.batch_call(calls)):
+            if isinstance(tx_data, Exception):
+                print(f"❌ 获取交易记录失败 #{transaction_id}: {tx_data}")
+                records.append(None)
+            else:
+                records.append(self._transaction_record(transaction_id, tx_data))
+        return records
+    
+    def get_transaction_ledger(self, transaction_ids: List[int]) -> 'ColumnarLedger':
+        """
+        批量获取交易记录并转换为列式账本（from 为付款方、to 为收款方，金额保留链上整数）
+
+        Args:
+            transaction_ids: 交易ID列表
+
+        Returns:
+            ColumnarLedger（获取失败的记录被跳过）
+        """
+        # columnar_ledger 依赖 settlement_planner，而后者导入本模块，因此在这里导入
+        from columnar_ledger import ColumnarLedger
+        return ColumnarLedger.from_chain_records(self.get_transaction_records(transaction_ids))
+    
+    def enable_event_index(self, db_path: str = "settlement_index.db", **kwargs) -> EventIndexer:
+        """
+        启用本地事件索引：之后 get_user_transactions 先增量同步新事件，再从本地查询
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            **kwargs: 传给 EventIndexer 的其他参数（chunk_size、confirmations）
+            
+        Returns:
+            事件索引器，可直接用于按时间窗口、分页等查询
+        """
+        if not self.contract:
+            raise Exception("合约未加载")
+        
+        from event_indexer import EventIndexer
+
+        self.event_indexer = EventIndexer(self, db_path, **kwargs)
+        added = self.event_indexer.sync()
+        print(f"✅ 事件索引已同步到区块 {self.event_indexer.last_indexed_block}（新增 {added} 条记录）")
+        return self.event_indexer
+    
     def get_user_transactions(self, user_address: str = None) -> List[int]:
         """
         获取用户的所有交易记录
@@ -221,6 +772,10 @@ class BlockchainClient:
         if not self.contract:
             raise Exception("合约未加载")
         
+        if self.event_indexer:
+            self.event_indexer.sync()
+            return self.event_indexer.get_user_transactions(user_address)
+        
         try:
             transaction_ids = self.contract.functions.getUserTransactions(user_address).call()
             return transaction_ids
@@ -228,35 +783,75 @@ class BlockchainClient:
             print(f"❌ 获取用户交易记录失败: {e}")
             return []
     
-    def wait_for_transaction(self, tx_hash: str, timeout: int = 60) -> Dict[str, Any]:
+    def wait_for_transaction(self, tx_hash: str, timeout: int = 60, poll_interval: float = 0.1,
+                             max_poll_interval: float = 2.0) -> Dict[str, Any]:
         """
         等待交易确认
         
         Args:
             tx_hash: 交易哈希
             timeout: 超时时间（秒）
+            poll_interval: 初始轮询间隔（秒），之后逐步放宽
+            max_poll_interval: 最大轮询间隔（秒）
             
         Returns:
             交易收据
         """
+        from web3.exceptions import TransactionNotFound
+
         print(f"⏳ 等待交易确认: {tx_hash}")
         
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+        with self._phase('confirm'):
+            start_time = time.time()
+            interval = poll_interval
+            while time.time() - start_time < timeout:
+                try:
+                    receipt = self.w3.eth.get_transaction_receipt(tx_hash)
+                except TransactionNotFound:
+                    receipt = None
+            
                 if receipt and receipt['status'] == 1:
                     print(f"✅ 交易已确认，区块号: {receipt['blockNumber']}")
                     return receipt
                 elif receipt and receipt['status'] == 0:
                     print(f"❌ 交易失败")
                     return receipt
-            except:
-                pass
             
-            time.sleep(1)
+                time.sleep(interval)
+                interval = min(max_poll_interval, interval * 1.5)
         
-        raise Exception("交易确认超时")
+            raise Exception("交易确认超时")
+    
+    @property
+    def confirmation_tracker(self) -> ConfirmationTracker:
+        """共享的交易确认跟踪器（首次使用时启动后台线程）"""
+        if self._confirmation_tracker is None:
+            from confirmation_tracker import ConfirmationTracker
+
+            self._confirmation_tracker = ConfirmationTracker(self).start()
+        return self._confirmation_tracker
+    
+    def wait_for_transactions(self, tx_hashes: List[str], timeout: int = 120) -> List[Dict[str, Any]]:
+        """
+        等待一批交易确认（按新区块批量取回收据，而不是逐笔轮询）
+        
+        Args:
+            tx_hashes: 交易哈希列表
+            timeout: 总超时时间（秒）
+            
+        Returns:
+            与输入顺序一致的交易收据列表
+        """
+        print(f"⏳ 等待 {len(tx_hashes)} 笔交易确认")
+        tracker = self.confirmation_tracker
+        with self._phase('confirm_batch'):
+            receipts = tracker.wait(tx_hashes, timeout=timeout)
+        
+        failed = sum(1 for r in receipts if r['status'] == 0)
+        latency = tracker.latency_summary(tx_hashes)
+        print(f"✅ {len(receipts) - failed} 笔已确认，{failed} 笔失败；"
+              f"确认延迟 p50 {latency.get('p50', 0):.2f}s / max {latency.get('max', 0):.2f}s")
+        return receipts
     
     def get_contract_info(self) -> Dict[str, Any]:
         """
@@ -268,22 +863,29 @@ class BlockchainClient:
         if not self.contract:
             raise Exception("合约未加载")
         
+        functions = self.contract.functions
         try:
-            name = self.contract.functions.name().call()
-            symbol = self.contract.functions.symbol().call()
-            total_supply = self.contract.functions.totalSupply().call()
-            transaction_count = self.contract.functions.transactionCount().call()
-            
-            return {
-                'name': name,
-                'symbol': symbol,
-                'total_supply': total_supply,
-                'transaction_count': transaction_count,
-                'address': self.contract_address
-            }
+            values = self.batch_call([
+                functions.name(),
+                functions.symbol(),
+                functions.totalSupply(),
+                functions.transactionCount()
+            ])
+            error = next((v for v in values if isinstance(v, Exception)), None)
+            if error:
+                raise error
+            name, symbol, total_supply, transaction_count = values
         except Exception as e:
             print(f"❌ 获取合约信息失败: {e}")
             return None
+        
+        return {
+            'name': name,
+            'symbol': symbol,
+            'total_supply': total_supply,
+            'transaction_count': transaction_count,
+            'address': self.contract_address
+        }
 
 def main():
     """主函数 - 演示区块链客户端的使用"""
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程级连接与合约缓存
+同一进程里反复创建 BlockchainClient 时，复用：
+- 按URL缓存的 HTTPProvider（带连接池的 requests 会话）和 Web3 实例，连接检查每个URL只做一次
+- 按文件路径缓存的已解析ABI（文件修改后自动重新读取）及其内容哈希
+- 按 (Web3实例, 合约地址, ABI哈希) 缓存的合约对象
+绑定了 ClientMetrics 的 Web3 实例及其合约对象只弱引用缓存，不会让指标对象常驻进程。
+web3 在第一次真正用到时才导入，导入本模块本身几乎没有开销。
+"""
+
+import hashlib
+import json
+import os
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+# 每个URL的连接池大小（并发发送交易、批量查询时同时占用的连接数）
+POOL_SIZE = 32
+
+_lock = threading.RLock()
+_providers: Dict[str, Any] = {}
+_sessions: Dict[str, Any] = {}
+_web3: Dict[str, Any] = {}
+# (URL, id(指标)) -> 绑定该指标的 Web3 实例；实例的中间件引用指标对象，条目存在时 id 不会被复用
+_metered_web3: "weakref.WeakValueDictionary[Tuple[str, int], Any]" = weakref.WeakValueDictionary()
+_connected: Dict[str, int] = {}
+_abis: Dict[str, Tuple[Tuple[int, int], List[Dict[str, Any]], str]] = {}
+# (id(Web3实例), 合约地址, ABI哈希) -> 合约对象；绑定指标的实例的合约对象放在弱引用缓存中
+_contracts: Dict[Tuple[int, str, str], Any] = {}
+_metered_contracts: "weakref.WeakValueDictionary[Tuple[int, str, str], Any]" = weakref.WeakValueDictionary()
+_stats = {"web3_hits": 0, "web3_misses": 0, "abi_hits": 0, "abi_misses": 0,
+          "contract_hits": 0, "contract_misses": 0}
+
+
+def get_provider(url: str):
+    """URL对应的共享 HTTPProvider（连接池大小 POOL_SIZE）"""
+    with _lock:
+        provider = _providers.get(url)
+        if provider is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            from web3 import Web3
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            provider = _providers[url] = Web3.HTTPProvider(url, session=session)
+            _sessions[url] = session
+        return provider
+
+
+def get_session(url: str):
+    """URL对应 HTTPProvider 使用的 requests 会话（自行发送批量请求时复用同一个连接池）"""
+    with _lock:
+        get_provider(url)
+        return _sessions[url]
+
+
+def get_web3(url: str, metrics=None):
+    """
+    URL对应的共享 Web3 实例
+
+    Args:
+        url: 节点地址
+        metrics: ClientMetrics；给出时返回安装了该指标中间件的实例（同一个指标对象共享一个实例，
+                 只在仍有客户端使用时保留）
+
+    Returns:
+        Web3 实例
+    """
+    cache, key = (_web3, url) if metrics is None else (_metered_web3, (url, id(metrics)))
+    with _lock:
+        w3 = cache.get(key)
+        if w3 is not None:
+            _stats["web3_hits"] += 1
+            return w3
+        _stats["web3_misses"] += 1
+        from web3 import Web3
+
+        if metrics is None:
+            w3 = Web3(get_provider(url))
+        else:
+            # HTTPProvider 会缓存最近一次组合的中间件链（其中引用 w3），共用 provider 会让它常驻；
+            # 绑定指标的实例使用自己的 provider，仍共用同一个连接池
+            w3 = Web3(Web3.HTTPProvider(url, session=get_session(url)))
+            w3.middleware_onion.add(metrics.middleware(), name="metrics")
+        cache[key] = w3
+        return w3
+
+
+def check_connection(w3, url: str, refresh: bool = False) -> Tuple[bool, Optional[int]]:
+    """
+    检查节点连接，每个URL只检查一次
+
+    Args:
+        w3: Web3 实例
+        url: 节点地址（缓存键）
+        refresh: 忽略缓存重新检查
+
+    Returns:
+        (是否为本次新检查, 首次检查时的区块高度)；连接失败时抛出异常
+    """
+    with _lock:
+        if not refresh and url in _connected:
+            return False, _connected[url]
+    if not w3.is_connected():
+        raise Exception("无法连接到Ganache，请确保Ganache正在运行")
+    block_number = w3.eth.block_number
+    with _lock:
+        _connected[url] = block_number
+    return True, block_number
+
+
+def abi_digest(abi: List[Dict[str, Any]]) -> str:
+    """ABI内容哈希（与键顺序、空白无关）"""
+    return hashlib.sha256(json.dumps(abi, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def load_abi(path: str) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    读取ABI文件（按路径缓存，文件修改时间或大小变化后重新读取）
+
+    Returns:
+        (ABI列表, ABI哈希)
+    """
+    real = os.path.realpath(path)
+    stat = os.stat(real)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        cached = _abis.get(real)
+        if cached is not None and cached[0] == version:
+            _stats["abi_hits"] += 1
+            return cached[1], cached[2]
+    with open(real, "r") as f:
+        abi = json.load(f)
+    digest = abi_digest(abi)
+    with _lock:
+        _stats["abi_misses"] += 1
+        _abis[real] = (version, abi, digest)
+    return abi, digest
+
+
+def get_contract(w3, address: str, abi: List[Dict[str, Any]], digest: Optional[str] = None):
+    """
+    共享的合约对象（构造合约对象要解析整个ABI，比一次本地RPC还慢）
+
+    Args:
+        w3: Web3 实例
+        address: 合约地址
+        abi: ABI列表
+        digest: ABI哈希，默认现算
+
+    Returns:
+        web3 合约对象
+    """
+    from web3 import Web3
+
+    address = Web3.to_checksum_address(address)
+    key = (id(w3), address, digest or abi_digest(abi))
+    with _lock:
+        # 合约对象引用 w3：只有进程级共享的实例可以强引用缓存
+        cache = _contracts if any(shared is w3 for shared in _web3.values()) else _metered_contracts
+        contract = cache.get(key)
+        if contract is None:
+            _stats["contract_misses"] += 1
+            contract = cache[key] = w3.eth.contract(address=address, abi=abi)
+        else:
+            _stats["contract_hits"] += 1
+        return contract
+
+
+def stats() -> Dict[str, int]:
+    """缓存命中统计"""
+    with _lock:
+        return dict(_stats)
+
+
+def clear():
+    """清空所有缓存（测试或切换节点时使用）"""
+    with _lock:
+        _providers.clear()
+        _sessions.clear()
+        _web3.clear()
+        _metered_web3.clear()
+        _connected.clear()
+        _abis.clear()
+        _contracts.clear()
+        _metered_contracts.clear()
+        for key in _stats:
+            _stats[key] = 0
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+客户端运行指标
+统计 BlockchainClient 每个JSON-RPC方法的调用次数、错误数和延迟直方图，正在进行的请求数，
+重试次数，以及转账各阶段（分配nonce、签名、发送、等待确认）的耗时。
+提供进程内快照（snapshot）和可选的 Prometheus 文本格式HTTP端点；
+未启用时客户端不安装中间件，各阶段计时退化为共享的空上下文，几乎没有开销。
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+from typing import Any, Dict
+
+# 直方图桶上界（秒）：低端覆盖微秒级的nonce分配与毫秒级的签名，高端覆盖按出块间隔等待的确认
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = "settlement_client"
+
+# 未启用指标时各阶段计时使用的空上下文
+NULL_PHASE = contextlib.nullcontext()
+
+
+class Histogram:
+    """固定桶直方图（累计计数在导出时计算）"""
+
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        """按桶估计分位数（桶内线性插值，最后一个桶取观测到的最大值）"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = BUCKETS[i - 1] if i > 0 else 0.0
+                upper = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / count, self.max)
+            seen += count
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total_s": self.sum,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _Phase:
+    """阶段计时上下文"""
+
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics: "ClientMetrics", name: str):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe_phase(self.name, time.perf_counter() - self.start)
+
+
+class ClientMetrics:
+    """
+    客户端指标汇总（线程安全）
+
+    一个实例可以被多个客户端共享，得到进程级的汇总。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rpc: Dict[str, Histogram] = {}
+        self.rpc_errors: Dict[str, int] = {}
+        self.phases: Dict[str, Histogram] = {}
+        self.retries: Dict[str, int] = {}
+        self.in_flight = 0
+        self.started_at = time.time()
+        self._server = None
+
+    # ------------------------------------------------------------------
+    # 记录
+    # ------------------------------------------------------------------
+
+    def begin_request(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def observe_rpc(self, method: str, seconds: float, error: bool = False):
+        """
+        记录一次RPC调用（同时结束一个 begin_request 开始的请求）
+
+        Args:
+            method: JSON-RPC方法名
+            seconds: 耗时（秒）
+            error: 是否返回错误或抛出异常
+        """
+        with self._lock:
+            histogram = self.rpc.get(method)
+            if histogram is None:
+                histogram = self.rpc[method] = Histogram()
+            histogram.observe(seconds)
+            if error:
+                self.rpc_errors[method] = self.rpc_errors.get(method, 0) + 1
+            self.in_flight -= 1
+
+    def observe_phase(self, phase: str, seconds: float):
+        """记录转账某个阶段的耗时"""
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def phase(self, name: str) -> _Phase:
+        """阶段计时上下文：with metrics.phase('sign'): ..."""
+        return _Phase(self, name)
+
+    def retry(self, reason: str):
+        """记录一次重试"""
+        with self._lock:
+            self.retries[reason] = self.retries.get(reason, 0) + 1
+
+    def middleware(self):
+        """返回记录每个RPC调用的 web3 中间件"""
+        metrics = self
+
+        def metrics_middleware(make_request, w3):
+            def middleware(method, params):
+                metrics.begin_request()
+                start = time.perf_counter()
+                error = True
+                try:
+                    response = make_request(method, params)
+                    error = "error" in response
+                    return response
+                finally:
+                    metrics.observe_rpc(method, time.perf_counter() - start, error)
+
+            return middleware
+
+        return metrics_middleware
+
+    def reset(self):
+        """清空所有统计"""
+        with self._lock:
+            self.rpc.clear()
+            self.rpc_errors.clear()
+            self.phases.clear()
+            self.retries.clear()
+            self.started_at = time.time()
+
+    # ------------------------------------------------------------------
+    # 导出
+    # ------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        当前指标快照
+
+        Returns:
+            {'rpc': {方法: {count, errors, total_s, mean_ms, p50_ms, p99_ms, max_ms}},
+             'phases': {阶段: {...}}, 'retries': {原因: 次数}, 'in_flight': 正在进行的请求数,
+             'uptime_s': 统计时长}
+        """
+        with self._lock:
+            return {
+                "rpc": {method: {**h.summary(), "errors": self.rpc_errors.get(method, 0)}
+                        for method, h in sorted(self.rpc.items())},
+                "phases": {phase: h.summary() for phase, h in sorted(self.phases.items())},
+                "retries": dict(self.retries),
+                "in_flight": self.in_flight,
+                "uptime_s": time.time() - self.started_at,
+            }
+
+    def prometheus_text(self) -> str:
+        """Prometheus 文本格式（0.0.4）"""
+        lines = []
+
+        def histogram(name, help_text, label, items):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for value, h in items:
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), h.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{name}_bucket{{{label}="{value}",le="{le}"}} {cumulative}')
+                lines.append(f'{name}_sum{{{label}="{value}"}} {h.sum}')
+                lines.append(f'{name}_count{{{label}="{value}"}} {h.count}')
+
+        def counter(name, help_text, label, items):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for value, count in items:
+                lines.append(f'{name}{{{label}="{value}"}} {count}')
+
+        with self._lock:
+            histogram(f"{PREFIX}_rpc_duration_seconds", "JSON-RPC request latency.", "method",
+                      sorted(self.rpc.items()))
+            counter(f"{PREFIX}_rpc_errors_total", "JSON-RPC requests that returned an error.", "method",
+                    sorted(self.rpc_errors.items()))
+            lines.append(f"# HELP {PREFIX}_rpc_in_flight JSON-RPC requests currently in flight.")
+            lines.append(f"# TYPE {PREFIX}_rpc_in_flight gauge")
+            lines.append(f"{PREFIX}_rpc_in_flight {self.in_flight}")
+            counter(f"{PREFIX}_retries_total", "Transaction send retries.", "reason", sorted(self.retries.items()))
+            histogram(f"{PREFIX}_phase_duration_seconds", "Time spent in each transfer phase.", "phase",
+                      sorted(self.phases.items()))
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9100, host: str = "127.0.0.1") -> str:
+        """
+        在后台线程启动 /metrics HTTP端点（Prometheus 文本格式）
+
+        Args:
+            port: 端口，0表示自动分配
+            host: 监听地址
+
+        Returns:
+            端点URL
+        """
+        if self._server is None:
+            # 只有启动端点时才需要 http.server，导入客户端不为此付出开销
+            from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+            metrics = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.split("?")[0] != "/metrics":
+                        self.send_error(404)
+                        return
+                    data = metrics.prometheus_text().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+                def log_message(self, format, *args):
+                    pass
+
+            self._server = ThreadingHTTPServer((host, port), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def stop_server(self):
+        """停止 /metrics 端点"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,496 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+列式账本
+P2P 仿真、结算压缩与链上记录共用的紧凑账本表示：
+- 参与者、交易类型、时间标签都存为整数编码，名称只在驻留表中保存一份
+- energy / price / amount 为 float64 列；链上金额另存为 uint256 安全的整数列
+  （每行 8 个 32 位分量，按需由 amount 换算，链上记录则直接保存原值）
+- 只允许按时间顺序追加，按时间窗口切片不复制数据
+- 可保存为 Arrow IPC 文件（需要 pyarrow，字典编码）或 .npz，并与原有的字典条目互相转换
+"""
+
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from settlement_planner import TOKEN_DECIMALS, to_token_units
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # 没有 pyarrow 时只能保存为 .npz
+    pa = None
+
+# 与 web/app.js 的账本类型一致，chain 为从合约读回的转账记录
+TYPE_NAMES = ('internal', 'import', 'export', 'chain')
+RECORD_FIELDS = ('time', 'label', 'type', 'buyer', 'seller', 'energy', 'price', 'amount')
+COLUMNS = {
+    'time': np.int64,
+    'label': np.int32,
+    'type': np.int8,
+    'buyer': np.int32,
+    'seller': np.int32,
+    'energy': np.float64,
+    'price': np.float64,
+    'amount': np.float64,
+}
+# uint256 拆成 8 个 32 位分量（低位在前）；按参与者求和时在 uint64 中累加，2^32 行以内不会溢出
+UNIT_LIMBS = 8
+LIMB_BITS = 32
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+
+def int_to_limbs(value: int) -> List[int]:
+    """非负整数（< 2^256）拆成 8 个 32 位分量"""
+    if value < 0 or value >> (UNIT_LIMBS * LIMB_BITS):
+        raise ValueError(f"金额超出 uint256 范围: {value}")
+    return [(value >> (LIMB_BITS * k)) & LIMB_MASK for k in range(UNIT_LIMBS)]
+
+
+def limbs_to_int(limbs: Iterable[int]) -> int:
+    """分量（可以是未进位的累加值）合成整数"""
+    return sum(int(limb) << (LIMB_BITS * k) for k, limb in enumerate(limbs))
+
+
+class InternTable:
+    """字符串驻留表：值 <-> 整数编码"""
+
+    def __init__(self, values: Iterable[str] = ()):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+        for value in values:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        """取得编码，新值追加到表尾"""
+        code = self.index.get(value)
+        if code is None:
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def codes(self, values: Sequence[str]) -> np.ndarray:
+        """批量编码（先对不同的值编码，再映射回去）"""
+        unique, inverse = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+        table = np.array([self.code(v) for v in unique], dtype=np.int32)
+        return table[inverse.reshape(-1)]
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """批量解码为字符串数组"""
+        return np.asarray(self.values, dtype=object)[codes]
+
+    def __getitem__(self, code: int) -> str:
+        return self.values[code]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class _Buffers:
+    """按倍增扩容的列缓冲区，由一个账本及其所有切片共享"""
+
+    def __init__(self, capacity: int):
+        self.size = 0
+        self.columns = {name: np.empty(capacity, dtype) for name, dtype in COLUMNS.items()}
+        self.units = np.zeros((capacity, UNIT_LIMBS), dtype=np.uint32)
+        self.has_units = np.zeros(capacity, dtype=bool)
+
+    def reserve(self, extra: int):
+        needed = self.size + extra
+        capacity = len(self.has_units)
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2)
+        for name, column in self.columns.items():
+            grown = np.empty(capacity, column.dtype)
+            grown[:self.size] = column[:self.size]
+            self.columns[name] = grown
+        units = np.zeros((capacity, UNIT_LIMBS), dtype=np.uint32)
+        units[:self.size] = self.units[:self.size]
+        has_units = np.zeros(capacity, dtype=bool)
+        has_units[:self.size] = self.has_units[:self.size]
+        self.units, self.has_units = units, has_units
+
+
+class ColumnarLedger:
+    """
+    列式账本
+
+    行按时间非递减排列；window() 返回共享缓冲区的切片（不复制），
+    切片只读，追加只能在完整账本上进行。
+    """
+
+    def __init__(self, participants: Iterable[str] = (), types: Iterable[str] = TYPE_NAMES,
+                 labels: Iterable[str] = (), decimals: int = TOKEN_DECIMALS, capacity: int = 1024):
+        """
+        Args:
+            participants: 预先登记的参与者名称（编码按顺序分配）
+            types: 交易类型表
+            labels: 预先登记的时间标签
+            decimals: 代币精度（amount 换算成链上整数时使用）
+            capacity: 初始容量（行）
+        """
+        self.participants = InternTable(participants)
+        self.types = InternTable(types)
+        self.labels = InternTable(labels)
+        self.decimals = decimals
+        self._buffers = _Buffers(capacity)
+        self._start = 0
+        self._stop = None  # None 表示完整账本（随追加增长）
+
+    # ------------------------------------------------------------------
+    # 基本访问
+    # ------------------------------------------------------------------
+
+    @property
+    def _bounds(self) -> Tuple[int, int]:
+        return self._start, self._buffers.size if self._stop is None else self._stop
+
+    def __len__(self) -> int:
+        start, stop = self._bounds
+        return stop - start
+
+    def column(self, name: str) -> np.ndarray:
+        """某一列（共享内存的 numpy 视图）"""
+        start, stop = self._bounds
+        return self._buffers.columns[name][start:stop]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.column(name)
+
+    @property
+    def is_view(self) -> bool:
+        return self._stop is not None
+
+    def nbytes(self) -> int:
+        """列数据占用的字节数（不含驻留表）"""
+        n = len(self)
+        return n * (sum(np.dtype(d).itemsize for d in COLUMNS.values()) + UNIT_LIMBS * 4 + 1)
+
+    # ------------------------------------------------------------------
+    # 追加
+    # ------------------------------------------------------------------
+
+    def _check_append(self, first_time: int):
+        if self.is_view:
+            raise ValueError("账本切片是只读的，只能在完整账本上追加")
+        size = self._buffers.size
+        if size and first_time < self._buffers.columns['time'][size - 1]:
+            raise ValueError("账本只能按时间顺序追加")
+
+    def append(self, record: Dict[str, Any]):
+        """追加一条字典形式的账本条目（app.js 格式）"""
+        self.extend([record])
+
+    def extend(self, records: Sequence[Dict[str, Any]]):
+        """
+        追加多条字典形式的账本条目
+
+        Args:
+            records: {time, label, type, buyer, seller, energy, price, amount} 列表，
+                     可带 amount_units（链上整数金额，优先于 amount 换算）
+        """
+        if not records:
+            return
+        times = np.array([r['time'] for r in records], dtype=np.int64)
+        units = None
+        if all('amount_units' in r for r in records):
+            units = [int(r['amount_units']) for r in records]
+        self.append_arrays(
+            time=times,
+            label=self.labels.codes([r.get('label', '') for r in records]),
+            type=self.types.codes([r['type'] for r in records]),
+            buyer=self.participants.codes([r['buyer'] for r in records]),
+            seller=self.participants.codes([r['seller'] for r in records]),
+            energy=np.array([r.get('energy', np.nan) for r in records], dtype=np.float64),
+            price=np.array([r.get('price', np.nan) for r in records], dtype=np.float64),
+            amount=np.array([r['amount'] for r in records], dtype=np.float64),
+            units=units,
+        )
+
+    def append_arrays(self, time, label, type, buyer, seller, energy, price, amount, units=None):
+        """
+        按列批量追加（已编码的整数列）
+
+        Args:
+            time/label/type/buyer/seller: 整数编码数组（编码对应本账本的驻留表）
+            energy/price/amount: 浮点数组
+            units: 可选的链上整数金额列表（Python int）；不给出时按需由 amount 换算
+        """
+        time = np.asarray(time, dtype=np.int64)
+        n = len(time)
+        if n == 0:
+            return
+        if np.any(np.diff(time) < 0):
+            raise ValueError("账本只能按时间顺序追加")
+        self._check_append(int(time[0]))
+        buffers = self._buffers
+        buffers.reserve(n)
+        start, stop = buffers.size, buffers.size + n
+        values = dict(time=time, label=label, type=type, buyer=buyer, seller=seller,
+                      energy=energy, price=price, amount=amount)
+        for name, column in buffers.columns.items():
+            column[start:stop] = values[name]
+        if units is not None:
+            buffers.units[start:stop] = [int_to_limbs(v) for v in units]
+            buffers.has_units[start:stop] = True
+        else:
+            buffers.has_units[start:stop] = False
+        buffers.size = stop
+
+    # ------------------------------------------------------------------
+    # 切片与整数金额
+    # ------------------------------------------------------------------
+
+    def window(self, start_time: Optional[int] = None, end_time: Optional[int] = None) -> 'ColumnarLedger':
+        """
+        时间窗口 [start_time, end_time) 内的切片（不复制数据）
+
+        Returns:
+            共享缓冲区与驻留表的只读账本
+        """
+        times = self.column('time')
+        lo = 0 if start_time is None else int(np.searchsorted(times, start_time, side='left'))
+        hi = len(times) if end_time is None else int(np.searchsorted(times, end_time, side='left'))
+        return self._slice(lo, hi)
+
+    def rows(self, start: int, stop: int) -> 'ColumnarLedger':
+        """按行号切片（不复制数据）"""
+        n = len(self)
+        return self._slice(max(0, min(start, n)), max(0, min(stop, n)))
+
+    def _slice(self, lo: int, hi: int) -> 'ColumnarLedger':
+        view = object.__new__(ColumnarLedger)
+        view.participants, view.types, view.labels = self.participants, self.types, self.labels
+        view.decimals = self.decimals
+        view._buffers = self._buffers
+        view._start = self._start + lo
+        view._stop = self._start + max(lo, hi)
+        return view
+
+    def units(self) -> np.ndarray:
+        """
+        链上整数金额（n × 8 的 32 位分量，低位在前）
+
+        缺少的行按 settlement_planner.to_token_units 由 amount 换算并缓存（与逐条结算的金额一致）
+        """
+        start, stop = self._bounds
+        buffers = self._buffers
+        missing = np.flatnonzero(~buffers.has_units[start:stop]) + start
+        if len(missing):
+            amounts = buffers.columns['amount'][missing].tolist()
+            buffers.units[missing] = [int_to_limbs(to_token_units(a, self.decimals)) for a in amounts]
+            buffers.has_units[missing] = True
+        return buffers.units[start:stop]
+
+    def amount_units(self, index: int) -> int:
+        """第 index 行的链上整数金额"""
+        return limbs_to_int(self.rows(index, index + 1).units()[0])
+
+    def type_mask(self, types: Iterable[str]) -> np.ndarray:
+        """属于给定类型的行"""
+        codes = [self.types.index[t] for t in types if t in self.types.index]
+        return np.isin(self.column('type'), codes)
+
+    # ------------------------------------------------------------------
+    # 结算用的向量化汇总
+    # ------------------------------------------------------------------
+
+    def _sum_units(self, keys: np.ndarray, units: np.ndarray, size: int) -> np.ndarray:
+        totals = np.zeros((size, UNIT_LIMBS), dtype=np.uint64)
+        np.add.at(totals, keys, units.astype(np.uint64))
+        return totals
+
+    def net_positions(self, types: Optional[Iterable[str]] = None) -> Dict[str, int]:
+        """
+        每个参与者的净头寸（链上整数金额，买方付款给卖方；与 settlement_compressor.net_positions 一致）
+
+        Args:
+            types: 只统计这些类型，None 表示全部
+        """
+        mask = self.type_mask(types) if types is not None else slice(None)
+        buyer, seller = self.column('buyer')[mask], self.column('seller')[mask]
+        units = self.units()[mask]
+        size = len(self.participants)
+        paid = self._sum_units(buyer, units, size)
+        received = self._sum_units(seller, units, size)
+        involved = np.union1d(buyer, seller)
+        return {self.participants[p]: limbs_to_int(received[p]) - limbs_to_int(paid[p]) for p in involved}
+
+    def net_by_pair(self, types: Optional[Iterable[str]] = None) -> List[Tuple[str, str, int]]:
+        """按交易对轧差（与 settlement_compressor.net_by_pair 一致）"""
+        mask = self.type_mask(types) if types is not None else np.ones(len(self), dtype=bool)
+        buyer, seller = self.column('buyer'), self.column('seller')
+        mask &= buyer != seller
+        payer, payee = buyer[mask], seller[mask]
+        units = self.units()[mask]
+        names = self.participants.decode(np.arange(len(self.participants))).astype(str)
+        # 以名称字典序较小者为正方向
+        forward = names[payer] < names[payee]
+        a = np.where(forward, payer, payee)
+        b = np.where(forward, payee, payer)
+        pairs, key = np.unique(np.stack([a, b], axis=1), axis=0, return_inverse=True)
+        key = key.reshape(-1)
+        plus = self._sum_units(key[forward], units[forward], len(pairs))
+        minus = self._sum_units(key[~forward], units[~forward], len(pairs))
+        transfers = []
+        for i, (pa_, pb) in enumerate(pairs):
+            amount = limbs_to_int(plus[i]) - limbs_to_int(minus[i])
+            name_a, name_b = names[pa_], names[pb]
+            if amount > 0:
+                transfers.append((name_a, name_b, amount))
+            elif amount < 0:
+                transfers.append((name_b, name_a, -amount))
+        return sorted(transfers, key=lambda t: tuple(sorted(t[:2])))
+
+    # ------------------------------------------------------------------
+    # 与字典条目互相转换
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict[str, Any]], **kwargs) -> 'ColumnarLedger':
+        """由 app.js 格式的账本条目列表构建"""
+        ledger = cls(capacity=max(len(records), 1), **kwargs)
+        ledger.extend(records)
+        return ledger
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """转换回 app.js 格式的账本条目列表"""
+        labels = self.labels.decode(self.column('label'))
+        types = self.types.decode(self.column('type'))
+        buyers = self.participants.decode(self.column('buyer'))
+        sellers = self.participants.decode(self.column('seller'))
+        return [
+            {'time': int(t), 'label': l, 'type': k, 'buyer': b, 'seller': s,
+             'energy': float(e), 'price': float(p), 'amount': float(a)}
+            for t, l, k, b, s, e, p, a in zip(self.column('time').tolist(), labels, types, buyers, sellers,
+                                              self.column('energy').tolist(), self.column('price').tolist(),
+                                              self.column('amount').tolist())
+        ]
+
+    @classmethod
+    def from_p2p(cls, ledger: Dict[str, np.ndarray], names: Sequence[str], labels: Sequence[str],
+                 **kwargs) -> 'ColumnarLedger':
+        """
+        由 pythonProject/p2p.py match_proportional() 返回的列式账本构建（不经过字典）
+
+        Args:
+            ledger: time/type/buyer/seller/energy/price/amount 数组；type 0 为内部交易、1 为外购，
+                    seller 为 -1 表示电网
+            names: 参与者名称（下标即 p2p.py 中的编号）
+            labels: 各步长的时间标签
+        """
+        out = cls(participants=list(names) + ['GRID'], labels=labels, capacity=max(len(ledger['time']), 1),
+                  **kwargs)
+        seller = np.asarray(ledger['seller'])
+        out.append_arrays(
+            time=ledger['time'],
+            label=np.asarray(ledger['time'], dtype=np.int32),
+            type=np.asarray(ledger['type'], dtype=np.int8),  # internal=0、import=1 与 TYPE_NAMES 一致
+            buyer=ledger['buyer'],
+            seller=np.where(seller < 0, len(names), seller),
+            energy=ledger['energy'],
+            price=ledger['price'],
+            amount=ledger['amount'],
+        )
+        return out
+
+    @classmethod
+    def from_chain_records(cls, records: Sequence[Dict[str, Any]], decimals: int = TOKEN_DECIMALS,
+                           **kwargs) -> 'ColumnarLedger':
+        """
+        由 BlockchainClient.get_transaction_record(s) 的记录构建：
+        from 记为 buyer（付款方），to 记为 seller，description 驻留为标签，金额为链上整数原值
+
+        Args:
+            records: {transaction_id, from, to, amount, timestamp, description} 列表（None 会被跳过）
+        """
+        records = sorted((r for r in records if r is not None), key=lambda r: r['timestamp'])
+        scale = 10 ** decimals
+        return cls.from_records([
+            {'time': r['timestamp'], 'label': r['description'], 'type': 'chain', 'buyer': r['from'],
+             'seller': r['to'], 'amount': r['amount'] / scale, 'amount_units': r['amount']}
+            for r in records
+        ], decimals=decimals, **kwargs)
+
+    # ------------------------------------------------------------------
+    # 保存与读取
+    # ------------------------------------------------------------------
+
+    def _units_bytes(self) -> bytes:
+        """uint256 金额列，每行 32 字节大端序（与 EVM 的 uint256 编码相同）"""
+        return np.ascontiguousarray(self.units()[:, ::-1]).astype('>u4').tobytes()
+
+    def save(self, path: str):
+        """
+        保存账本（切片只保存窗口内的行）
+
+        .arrow 保存为 Arrow IPC 文件（参与者、类型、标签为字典编码列，金额为 32 字节定长列）；
+        其他后缀保存为 .npz。保存前会补齐所有行的链上整数金额。
+        """
+        units = self._units_bytes()
+        if path.endswith('.arrow'):
+            if pa is None:
+                raise ImportError("保存为 Arrow 文件需要安装 pyarrow")
+            participants = pa.array(self.participants.values, pa.string())
+            columns = {
+                'time': pa.array(self.column('time')),
+                'label': pa.DictionaryArray.from_arrays(self.column('label'), pa.array(self.labels.values, pa.string())),
+                'type': pa.DictionaryArray.from_arrays(self.column('type'), pa.array(self.types.values, pa.string())),
+                'buyer': pa.DictionaryArray.from_arrays(self.column('buyer'), participants),
+                'seller': pa.DictionaryArray.from_arrays(self.column('seller'), participants),
+                'energy': pa.array(self.column('energy')),
+                'price': pa.array(self.column('price')),
+                'amount': pa.array(self.column('amount')),
+                'amount_units': pa.FixedSizeBinaryArray.from_buffers(pa.binary(32), len(self),
+                                                                     [None, pa.py_buffer(units)]),
+            }
+            table = pa.table(columns).replace_schema_metadata({'decimals': str(self.decimals)})
+            with pa_ipc.new_file(path, table.schema) as writer:
+                writer.write_table(table)
+            return
+        np.savez_compressed(
+            path,
+            participants=np.array(self.participants.values, dtype=str),
+            types=np.array(self.types.values, dtype=str),
+            labels=np.array(self.labels.values, dtype=str),
+            decimals=np.array(self.decimals),
+            amount_units=np.frombuffer(units, dtype=np.uint8).reshape(-1, 32),
+            **{name: self.column(name) for name in COLUMNS},
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'ColumnarLedger':
+        """读取 save() 保存的账本"""
+        if path.endswith('.arrow'):
+            if pa is None:
+                raise ImportError("读取 Arrow 文件需要安装 pyarrow")
+            with pa.memory_map(path) as source:
+                table = pa_ipc.open_file(source).read_all()
+            meta = table.schema.metadata or {}
+            label, kind = table.column('label').combine_chunks(), table.column('type').combine_chunks()
+            buyer, seller = table.column('buyer').combine_chunks(), table.column('seller').combine_chunks()
+            ledger = cls(participants=buyer.dictionary.to_pylist(), types=kind.dictionary.to_pylist(),
+                         labels=label.dictionary.to_pylist(), decimals=int(meta.get(b'decimals', TOKEN_DECIMALS)),
+                         capacity=max(table.num_rows, 1))
+            # 同一文件中 buyer/seller 共用参与者表
+            columns = {name: table.column(name).to_numpy() for name in ('time', 'energy', 'price', 'amount')}
+            codes = {'label': label.indices, 'type': kind.indices, 'buyer': buyer.indices, 'seller': seller.indices}
+            columns.update({name: array.to_numpy(zero_copy_only=False) for name, array in codes.items()})
+            units = table.column('amount_units').combine_chunks()
+            limbs = np.frombuffer(units.buffers()[1], dtype='>u4', count=table.num_rows * UNIT_LIMBS,
+                                  offset=units.offset * 32)
+        else:
+            data = np.load(path)
+            ledger = cls(participants=data['participants'].tolist(), types=data['types'].tolist(),
+                         labels=data['labels'].tolist(), decimals=int(data['decimals']),
+                         capacity=max(len(data['time']), 1))
+            columns = {name: data[name] for name in COLUMNS}
+            limbs = data['amount_units'].view('>u4').reshape(-1)
+        ledger.append_arrays(**columns)
+        n = len(ledger)
+        buffers = ledger._buffers
+        buffers.units[:n] = limbs.reshape(n, UNIT_LIMBS)[:, ::-1]
+        buffers.has_units[:n] = True
+        return ledger
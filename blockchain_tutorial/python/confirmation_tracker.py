@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易确认跟踪器
+同时跟踪大量待确认交易：每出一个新区块，用批量请求取回区块交易列表和相关收据，
+把结果写入 Future / 回调，并记录每笔交易从提交到确认的延迟。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional, Any
+
+from web3._utils.method_formatters import receipt_formatter
+from web3.datastructures import AttributeDict
+
+# 最多保留的确认延迟记录数（长时间运行的客户端只保留最近的记录）
+MAX_LATENCY_HISTORY = 10000
+
+
+class ConfirmationTracker:
+    """
+    交易确认跟踪器
+
+    后台线程轮询区块高度：有新区块时立即处理并把轮询间隔重置为最小值，
+    没有新区块时按 backoff 倍数逐步放宽到最大间隔。
+    """
+
+    def __init__(self, client, min_interval: float = 0.1, max_interval: float = 2.0,
+                 backoff: float = 1.5, timeout: float = 120.0, history: int = MAX_LATENCY_HISTORY):
+        """
+        Args:
+            client: BlockchainClient（使用其 w3 与 rpc_batch）
+            min_interval: 最小轮询间隔（秒）
+            max_interval: 最大轮询间隔（秒）
+            backoff: 无新区块时轮询间隔的放大倍数
+            timeout: 单笔交易从开始跟踪起的超时时间（秒）
+            history: 最多保留的确认延迟记录数
+        """
+        self.client = client
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._unchecked: List[str] = []
+        self.history = history
+        self._latencies: "OrderedDict[str, float]" = OrderedDict()
+        self._last_block = None
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def w3(self):
+        """客户端当前的 Web3 实例（enable_metrics 后会替换）"""
+        return self.client.w3
+
+    def start(self) -> "ConfirmationTracker":
+        """启动后台跟踪线程"""
+        if self._thread is None:
+            self._stopped.clear()
+            self._last_block = self.w3.eth.block_number
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """停止后台线程，未完成的交易以异常结束"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for entry in pending.values():
+            entry['future'].set_exception(Exception("确认跟踪器已停止"))
+
+    def __enter__(self) -> "ConfirmationTracker":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def track(self, tx_hash: str, callback: Optional[Callable[[str, Any], None]] = None,
+              submitted_at: Optional[float] = None, deadline: Optional[float] = None) -> Future:
+        """
+        开始跟踪一笔交易
+
+        Args:
+            tx_hash: 交易哈希
+            callback: 确认后调用 callback(tx_hash, receipt)
+            submitted_at: 交易提交时刻（time.monotonic()），默认当前时刻
+            deadline: 超时时刻（time.monotonic()），默认从现在起 self.timeout 秒
+
+        Returns:
+            在交易被打包后得到收据的 Future；同一笔交易已在跟踪时返回同一个 Future
+            （回调追加到已有的跟踪上，超时时刻取两者中较晚的一个）
+        """
+        self.start()
+        now = time.monotonic()
+        deadline = deadline if deadline is not None else now + self.timeout
+        key = tx_hash.lower()
+        with self._lock:
+            entry = self._pending.get(key)
+            if entry is not None:
+                if callback:
+                    entry['callbacks'].append(callback)
+                entry['deadline'] = max(entry['deadline'], deadline)
+                return entry['future']
+            future = Future()
+            self._pending[key] = {
+                'tx_hash': tx_hash,
+                'future': future,
+                'callbacks': [callback] if callback else [],
+                'submitted_at': submitted_at if submitted_at is not None else now,
+                'deadline': deadline,
+            }
+            # 跟踪开始前可能已经出块，第一次轮询时单独查一遍收据
+            self._unchecked.append(key)
+        self._wakeup.set()
+        return future
+
+    def track_many(self, tx_hashes: List[str], callback: Optional[Callable[[str, Any], None]] = None,
+                   deadline: Optional[float] = None) -> List[Future]:
+        """批量开始跟踪，返回与输入顺序一致的 Future 列表（deadline 同 track）"""
+        now = time.monotonic()
+        return [self.track(h, callback, submitted_at=now, deadline=deadline) for h in tx_hashes]
+
+    def wait(self, tx_hashes: List[str], timeout: Optional[float] = None) -> List[Any]:
+        """
+        跟踪并等待一组交易全部确认
+
+        Args:
+            tx_hashes: 交易哈希列表
+            timeout: 总超时时间（秒），默认使用跟踪器的单笔超时
+
+        Returns:
+            与输入顺序一致的交易收据列表
+        """
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        futures = self.track_many(tx_hashes, deadline=deadline)
+        return [f.result(timeout=max(0.0, deadline - time.monotonic())) for f in futures]
+
+    @property
+    def pending_count(self) -> int:
+        """尚未确认的交易数"""
+        with self._lock:
+            return len(self._pending)
+
+    def latency(self, tx_hash: str) -> Optional[float]:
+        """单笔交易从提交到确认的延迟（秒），尚未确认或记录已淘汰时为None"""
+        with self._lock:
+            return self._latencies.get(tx_hash.lower())
+
+    def latency_summary(self, tx_hashes: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """
+        确认延迟统计（秒）
+
+        Args:
+            tx_hashes: 只统计这些交易，默认统计保留的最近 history 笔
+        """
+        with self._lock:
+            if tx_hashes is None:
+                values = list(self._latencies.values())
+            else:
+                values = [self._latencies[k] for k in (h.lower() for h in tx_hashes) if k in self._latencies]
+        values.sort()
+        if not values:
+            return {'count': 0}
+
+        def pct(p):
+            return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+        return {
+            'count': len(values),
+            'mean': sum(values) / len(values),
+            'p50': pct(0.50),
+            'p95': pct(0.95),
+            'p99': pct(0.99),
+            'max': values[-1],
+        }
+
+    def _run(self):
+        interval = self.min_interval
+        while not self._stopped.is_set():
+            try:
+                progressed = self._poll()
+            except Exception as e:
+                print(f"⚠️  确认跟踪轮询失败: {e}")
+                progressed = False
+            interval = self.min_interval if progressed else min(self.max_interval, interval * self.backoff)
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+
+    def _poll(self) -> bool:
+        with self._lock:
+            unchecked, self._unchecked = self._unchecked, []
+            has_pending = bool(self._pending)
+        if not has_pending:
+            return False
+
+        unchecked = set(unchecked)
+        candidates = set(unchecked)
+        latest = self.w3.eth.block_number
+        progressed = False
+        if latest > self._last_block:
+            numbers = list(range(self._last_block + 1, latest + 1))
+            responses = self.client.rpc_batch([('eth_getBlockByNumber', [hex(n), False]) for n in numbers])
+            for number, response in zip(numbers, responses):
+                block = response.get('result')
+                if not block:
+                    raise Exception(f"获取区块 {number} 失败: {response.get('error')}")
+                candidates.update(h.lower() for h in block['transactions'])
+            self._last_block = latest
+            progressed = True
+
+        with self._lock:
+            wanted = [h for h in candidates if h in self._pending]
+        if wanted:
+            responses = self.client.rpc_batch([('eth_getTransactionReceipt', [h]) for h in wanted])
+            retry = []
+            for tx_hash, response in zip(wanted, responses):
+                if response.get('result'):
+                    self._resolve(tx_hash, AttributeDict.recursive(receipt_formatter(response['result'])))
+                elif tx_hash not in unchecked:
+                    retry.append(tx_hash)
+            if retry:
+                # 区块里已出现但收据暂不可读，下一轮再查
+                with self._lock:
+                    self._unchecked.extend(retry)
+
+        self._expire()
+        return progressed
+
+    def _resolve(self, key: str, receipt):
+        with self._lock:
+            entry = self._pending.pop(key, None)
+        if entry is None:
+            return
+        with self._lock:
+            self._latencies[key] = time.monotonic() - entry['submitted_at']
+            while len(self._latencies) > self.history:
+                self._latencies.popitem(last=False)
+        entry['future'].set_result(receipt)
+        for callback in entry['callbacks']:
+            try:
+                callback(entry['tx_hash'], receipt)
+            except Exception as e:
+                print(f"⚠️  确认回调出错 {entry['tx_hash']}: {e}")
+
+    def _expire(self):
+        now = time.monotonic()
+        with self._lock:
+            expired = [k for k, entry in self._pending.items() if entry['deadline'] <= now]
+            entries = [self._pending.pop(k) for k in expired]
+        for entry in entries:
+            entry['future'].set_exception(TimeoutError(f"交易确认超时: {entry['tx_hash']}"))
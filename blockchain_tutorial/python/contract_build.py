@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合约编译缓存
+用 py-solc-x 编译 contracts/SettlementToken.sol，编译产物（.bin / .abi）按内容哈希缓存在 build/cache/<哈希>/ 下。
+哈希覆盖合约源码及其递归导入的全部文件（含 OpenZeppelin）、编译器版本、EVM版本、优化选项和导入重映射，
+任何一项变化都会重新编译；否则直接读取缓存，反复启动测试网络时不再调用 solc。
+"""
+
+import hashlib
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+PYTHON_DIR = os.path.dirname(os.path.abspath(__file__))
+CONTRACTS_DIR = os.path.join(PYTHON_DIR, "..", "contracts")
+CONTRACT_PATH = os.path.join(CONTRACTS_DIR, "SettlementToken.sol")
+CONTRACT_NAME = "SettlementToken"
+# npm install 后 OpenZeppelin 所在目录，可用环境变量 OPENZEPPELIN_PATH 覆盖
+OPENZEPPELIN_PATH = os.environ.get(
+    "OPENZEPPELIN_PATH",
+    os.path.join(PYTHON_DIR, "..", "node_modules", "@openzeppelin"),
+)
+# 编译产物目录（与 npm run compile 的输出目录一致），可用环境变量 SETTLEMENT_BUILD_DIR 覆盖
+BUILD_DIR = os.environ.get("SETTLEMENT_BUILD_DIR", os.path.join(PYTHON_DIR, "build"))
+# 合约使用 Ownable(msg.sender)，需要 OpenZeppelin 5.x，因此至少需要 solc 0.8.20
+SOLC_VERSION = "0.8.20"
+# py-evm 的最新分叉为上海，按 paris 编译即可在任何合并后的分叉上运行
+EVM_VERSION = "paris"
+OPTIMIZE = True
+
+TOKEN_NAME = "Settlement Token"
+TOKEN_SYMBOL = "SETT"
+DEPLOY_GAS = 5000000
+
+IMPORT_PATTERN = re.compile(r'^\s*import\s+(?:[^"\';]*?\s+from\s+)?["\']([^"\']+)["\']', re.MULTILINE)
+
+
+def _resolve_import(path: str, importer: str, remappings: Dict[str, str]) -> str:
+    for prefix, target in remappings.items():
+        if path.startswith(prefix):
+            return os.path.join(target, path[len(prefix):])
+    if path.startswith("."):
+        return os.path.normpath(os.path.join(os.path.dirname(importer), path))
+    return os.path.join(CONTRACTS_DIR, path)
+
+
+def _source_files(contract_path: str, remappings: Dict[str, str]) -> List[Tuple[str, bytes]]:
+    """
+    合约源码及其递归导入的全部文件
+
+    Returns:
+        (逻辑文件名, 文件内容) 列表，逻辑文件名与所在机器的绝对路径无关
+    """
+    roots = [(prefix, os.path.realpath(target)) for prefix, target in remappings.items()]
+    roots.append(("", os.path.realpath(os.path.dirname(contract_path))))
+    seen = {}
+    stack = [os.path.realpath(contract_path)]
+    while stack:
+        path = stack.pop()
+        if path in seen:
+            continue
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"找不到合约源文件: {path}")
+        with open(path, "rb") as f:
+            content = f.read()
+        name = next((prefix + os.path.relpath(path, root) for prefix, root in roots
+                     if path.startswith(root + os.sep)), path)
+        seen[path] = (name, content)
+        for imported in IMPORT_PATTERN.findall(content.decode("utf-8")):
+            stack.append(os.path.realpath(_resolve_import(imported, path, remappings)))
+    return sorted(seen.values())
+
+
+def cache_key(contract_path: str = CONTRACT_PATH, solc_version: str = SOLC_VERSION,
+              remappings: Optional[Dict[str, str]] = None) -> str:
+    """
+    编译缓存键：源码（含全部导入文件）、编译器版本、编译选项和导入重映射的SHA-256
+
+    Args:
+        contract_path: 合约源文件
+        solc_version: 编译器版本
+        remappings: 导入前缀 -> 本地目录，如 {'@openzeppelin/': OPENZEPPELIN_PATH}
+
+    Returns:
+        十六进制哈希
+    """
+    remappings = remappings or {}
+    digest = hashlib.sha256()
+    settings = {"solc": solc_version, "evm": EVM_VERSION, "optimize": OPTIMIZE,
+                "remappings": sorted(remappings), "contract": CONTRACT_NAME}
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    for name, content in _source_files(contract_path, remappings):
+        digest.update(name.encode() + b"\0" + hashlib.sha256(content).digest())
+    return digest.hexdigest()
+
+
+def artifact_dir(key: str, build_dir: str = BUILD_DIR) -> str:
+    """缓存键对应的产物目录"""
+    return os.path.join(build_dir, "cache", key)
+
+
+def load_artifact(path: str) -> Dict[str, Any]:
+    """
+    读取编译产物
+
+    Args:
+        path: 产物目录（含 SettlementToken.bin / .abi，即 solc -o 的输出）或 {abi, bytecode} JSON文件
+
+    Returns:
+        {'abi': ABI列表, 'bytecode': 部署字节码（0x开头）, 'abi_path': ABI文件路径}
+    """
+    if os.path.isdir(path):
+        abi_path = os.path.join(path, f"{CONTRACT_NAME}.abi")
+        with open(abi_path, "r") as f:
+            abi = json.load(f)
+        with open(os.path.join(path, f"{CONTRACT_NAME}.bin"), "r") as f:
+            bytecode = f.read().strip()
+    else:
+        abi_path = path
+        with open(path, "r") as f:
+            artifact = json.load(f)
+        abi, bytecode = artifact["abi"], artifact["bytecode"]
+    if not bytecode.startswith("0x"):
+        bytecode = "0x" + bytecode
+    return {"abi": abi, "bytecode": bytecode, "abi_path": abi_path}
+
+
+def _write_atomic(path: str, data: str):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def save_artifact(key: str, abi: List[Dict[str, Any]], bytecode: str, build_dir: str = BUILD_DIR) -> str:
+    """把编译产物写入缓存目录（先写ABI后写字节码，字节码存在即表示产物完整），返回目录"""
+    directory = artifact_dir(key, build_dir)
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, f"{CONTRACT_NAME}.abi"), json.dumps(abi))
+    _write_atomic(os.path.join(directory, f"{CONTRACT_NAME}.bin"), bytecode[2:] if bytecode.startswith("0x") else bytecode)
+    return directory
+
+
+def compile_settlement_token(solc_version: str = SOLC_VERSION,
+                             openzeppelin_path: str = OPENZEPPELIN_PATH,
+                             build_dir: str = BUILD_DIR,
+                             use_cache: bool = True) -> Dict[str, Any]:
+    """
+    编译 SettlementToken.sol，命中缓存时直接读取产物（缺少对应版本的 solc 时自动下载）
+
+    Args:
+        solc_version: 编译器版本
+        openzeppelin_path: @openzeppelin 包所在目录
+        build_dir: 产物目录
+        use_cache: 为False时忽略缓存强制重新编译（结果仍写入缓存）
+
+    Returns:
+        {'abi': ABI列表, 'bytecode': 部署字节码（0x开头）, 'abi_path': ABI文件路径, 'cache_key': 缓存键}
+    """
+    if not os.path.isdir(openzeppelin_path):
+        raise FileNotFoundError(f"找不到OpenZeppelin合约库: {openzeppelin_path}（请在 blockchain_tutorial 目录执行 npm install）")
+    remappings = {"@openzeppelin/": os.path.abspath(openzeppelin_path) + "/"}
+    key = cache_key(CONTRACT_PATH, solc_version, remappings)
+    directory = artifact_dir(key, build_dir)
+
+    if use_cache and os.path.isfile(os.path.join(directory, f"{CONTRACT_NAME}.bin")):
+        print(f"♻️  使用缓存的编译产物: {directory}")
+        return {**load_artifact(directory), "cache_key": key}
+
+    import solcx
+
+    if solc_version not in {str(v) for v in solcx.get_installed_solc_versions()}:
+        print(f"⬇️  安装 solc {solc_version}...")
+        solcx.install_solc(solc_version)
+
+    print(f"🔨 编译 {os.path.basename(CONTRACT_PATH)}（solc {solc_version}）...")
+    output = solcx.compile_files(
+        [CONTRACT_PATH],
+        output_values=["abi", "bin"],
+        import_remappings=remappings,
+        allow_paths=[os.path.abspath(CONTRACTS_DIR), os.path.abspath(openzeppelin_path)],
+        evm_version=EVM_VERSION,
+        optimize=OPTIMIZE,
+        solc_version=solc_version,
+    )
+    name = next(n for n in output if n.endswith(f":{CONTRACT_NAME}"))
+    directory = save_artifact(key, output[name]["abi"], output[name]["bin"], build_dir)
+    print(f"✅ 编译产物已缓存到 {directory}")
+    return {**load_artifact(directory), "cache_key": key}
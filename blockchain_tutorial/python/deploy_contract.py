@@ -3,139 +3,261 @@
 """
 智能合约部署脚本
 用于部署SettlementToken合约到Ganache本地链
+编译产物按内容哈希缓存（见 contract_build），合约源码未变时不再调用 solc；
+夹具模式（--fixture）只部署一次并保存链快照，之后的测试直接回滚到部署后的状态。
 """
 
+import argparse
+import hashlib
 import json
 import os
-from web3 import Web3
-from eth_account import Account
+from typing import Any, Dict, Optional
+
+import chain_registry
 from blockchain_client import BlockchainClient
+from contract_build import (BUILD_DIR, DEPLOY_GAS, TOKEN_NAME, TOKEN_SYMBOL,
+                            compile_settlement_token)
+
+DEFAULT_URL = "http://127.0.0.1:7545"
+CONTRACT_INFO_PATH = "contract_info.json"
+FIXTURE_PATH = os.path.join(BUILD_DIR, "fixture.json")
+
+
+def default_private_key() -> str:
+    """部署账户私钥：环境变量 DEPLOYER_PRIVATE_KEY，默认 Ganache 确定性助记词的第一个账户"""
+    private_key = os.environ.get("DEPLOYER_PRIVATE_KEY")
+    if private_key:
+        return private_key
+    from local_node import LocalSettlementNode
+
+    return LocalSettlementNode.default_account().key.hex()
+
+
+def deploy_contract(artifact: Dict[str, Any], ganache_url: str = DEFAULT_URL,
+                    private_key: Optional[str] = None,
+                    info_path: Optional[str] = CONTRACT_INFO_PATH) -> Optional[Dict[str, Any]]:
+    """
+    部署智能合约
+
+    Args:
+        artifact: 编译产物 {'abi', 'bytecode'}（compile_contract 的返回值）
+        ganache_url: 节点URL
+        private_key: 部署账户私钥，默认见 default_private_key
+        info_path: 合约信息保存路径，为None时不保存
+
+    Returns:
+        合约信息 {'address', 'abi', 'deployer', 'transaction_hash', 'block_number'}，失败时返回None
+    """
+    from eth_account import Account
 
-def deploy_contract():
-    """部署智能合约"""
-    
     # 连接到Ganache
-    ganache_url = "http://127.0.0.1:7545"
-    w3 = Web3(Web3.HTTPProvider(ganache_url))
-    
+    w3 = chain_registry.get_web3(ganache_url)
     if not w3.is_connected():
         print("❌ 无法连接到Ganache，请确保Ganache正在运行")
         return None
-    
+
     print("✅ 成功连接到Ganache")
-    
-    # 获取部署账户
-    accounts = w3.eth.accounts
-    if not accounts:
-        print("❌ 没有可用的账户")
-        return None
-    
-    deployer_account = accounts[0]
-    print(f"部署账户: {deployer_account}")
-    
-    # 读取合约字节码和ABI
-    # 注意：这里需要先编译合约
-    contract_path = "../contracts/SettlementToken.sol"
-    
-    # 这里应该使用编译后的字节码和ABI
-    # 为了演示，我们使用一个简化的示例
-    print("⚠️  注意：这里需要先编译Solidity合约")
-    print("请使用以下命令编译合约：")
-    print("solc --bin --abi contracts/SettlementToken.sol -o build/")
-    
-    # 示例合约信息（实际使用时需要替换为编译后的数据）
-    contract_bytecode = "0x..."  # 编译后的字节码
-    contract_abi = []  # 编译后的ABI
-    
-    # 构建部署交易
-    contract = w3.eth.contract(abi=contract_abi, bytecode=contract_bytecode)
-    
-    # 合约构造函数参数
-    constructor_args = ["Settlement Token", "SETT"]
-    
-    # 构建交易
-    transaction = contract.constructor(*constructor_args).build_transaction({
-        'from': deployer_account,
-        'gas': 2000000,
+
+    deployer = Account.from_key(private_key or default_private_key())
+    print(f"部署账户: {deployer.address}")
+
+    # 构建部署交易（合约构造函数参数：代币名称、代币符号）
+    contract = w3.eth.contract(abi=artifact["abi"], bytecode=artifact["bytecode"])
+    transaction = contract.constructor(TOKEN_NAME, TOKEN_SYMBOL).build_transaction({
+        'from': deployer.address,
+        'gas': DEPLOY_GAS,
         'gasPrice': w3.eth.gas_price,
-        'nonce': w3.eth.get_transaction_count(deployer_account)
+        'nonce': w3.eth.get_transaction_count(deployer.address),
+        'chainId': w3.eth.chain_id,
     })
-    
-    # 签名交易
-    signed_txn = w3.eth.account.sign_transaction(transaction, private_key="0x" + "0" * 64)
-    
-    # 发送交易
+
+    # 签名并发送交易
+    signed_txn = deployer.sign_transaction(transaction)
     tx_hash = w3.eth.send_raw_transaction(signed_txn.rawTransaction)
     print(f"✅ 部署交易已发送: {tx_hash.hex()}")
-    
+
     # 等待交易确认
     tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
-    
-    if tx_receipt.status == 1:
-        contract_address = tx_receipt.contractAddress
-        print(f"✅ 合约部署成功！地址: {contract_address}")
-        
-        # 保存合约信息
-        contract_info = {
-            'address': contract_address,
-            'abi': contract_abi,
-            'deployer': deployer_account,
-            'transaction_hash': tx_hash.hex(),
-            'block_number': tx_receipt.blockNumber
-        }
-        
-        with open('contract_info.json', 'w') as f:
-            json.dump(contract_info, f, indent=2)
-        
-        print("✅ 合约信息已保存到 contract_info.json")
-        return contract_address
-    else:
+
+    if tx_receipt.status != 1:
         print("❌ 合约部署失败")
         return None
 
-def compile_contract():
-    """编译智能合约（需要安装solc编译器）"""
-    
+    contract_info = {
+        'address': tx_receipt.contractAddress,
+        'abi': artifact["abi"],
+        'deployer': deployer.address,
+        'transaction_hash': tx_hash.hex(),
+        'block_number': tx_receipt.blockNumber,
+    }
+    print(f"✅ 合约部署成功！地址: {contract_info['address']}")
+
+    if info_path:
+        with open(info_path, 'w') as f:
+            json.dump(contract_info, f, indent=2)
+        print(f"✅ 合约信息已保存到 {info_path}")
+    return contract_info
+
+
+def compile_contract(force: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    编译智能合约（源码、编译器版本和OpenZeppelin都未变时直接使用缓存的产物）
+
+    Args:
+        force: 忽略缓存强制重新编译
+
+    Returns:
+        编译产物 {'abi', 'bytecode', 'abi_path', 'cache_key'}，失败时返回None
+    """
     print("编译智能合约...")
-    
-    # 检查solc是否安装
-    if os.system("solc --version") != 0:
-        print("❌ 未找到solc编译器")
-        print("请安装Solidity编译器：")
-        print("Ubuntu/Debian: sudo apt-get install solc")
-        print("macOS: brew install solidity")
-        print("Windows: 下载并安装solc-windows.exe")
-        return False
-    
-    # 创建build目录
-    os.makedirs("build", exist_ok=True)
-    
-    # 编译合约
-    contract_path = "../contracts/SettlementToken.sol"
-    output_dir = "build"
-    
-    cmd = f"solc --bin --abi {contract_path} -o {output_dir} --overwrite"
-    
-    if os.system(cmd) == 0:
-        print("✅ 合约编译成功")
+    try:
+        return compile_settlement_token(use_cache=not force)
+    except ImportError:
+        print("❌ 未安装 py-solc-x，请执行: pip install -r requirements.txt")
+    except FileNotFoundError as e:
+        print(f"❌ {e}")
+    except Exception as e:
+        print(f"❌ 合约编译失败: {e}")
+    return None
+
+
+class DeploymentFixture:
+    """
+    测试夹具：合约只部署一次，之后每个测试回滚到刚部署完的链状态
+
+    部署信息和快照ID保存在 state_path 中，节点不重启时下一次测试运行（新的进程）直接回滚复用，不再部署；
+    节点重启（创世区块变化）或合约源码变化（缓存键变化）时重新部署。
+    节点需要支持 evm_snapshot / evm_revert（Ganache、EVMSettlementNode）。
+    """
+
+    def __init__(self, ganache_url: str = DEFAULT_URL, artifact: Optional[Dict[str, Any]] = None,
+                 private_key: Optional[str] = None, state_path: str = FIXTURE_PATH):
+        """
+        Args:
+            ganache_url: 节点URL
+            artifact: 编译产物，默认调用 compile_settlement_token()（命中缓存时不编译）
+            private_key: 部署账户私钥，默认见 default_private_key
+            state_path: 夹具状态文件
+        """
+        self.url = ganache_url
+        self.artifact = artifact or compile_settlement_token()
+        self.private_key = private_key or default_private_key()
+        self.state_path = state_path
+        self.w3 = chain_registry.get_web3(ganache_url)
+        self.state: Optional[Dict[str, Any]] = None
+        self.reused = False
+
+    @property
+    def contract_address(self) -> str:
+        return self.state["address"]
+
+    def _rpc(self, method: str, params: list) -> Any:
+        response = self.w3.provider.make_request(method, params)
+        if "error" in response:
+            raise Exception(f"{method} 失败: {response['error']}")
+        return response["result"]
+
+    def _identity(self) -> Dict[str, Any]:
+        """用于判断保存的夹具是否仍然有效：节点URL、创世区块哈希和合约产物"""
+        return {
+            "url": self.url,
+            "genesis": self.w3.eth.get_block(0)["hash"].hex(),
+            "bytecode": hashlib.sha256(self.artifact["bytecode"].encode()).hexdigest(),
+        }
+
+    def _save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        with open(self.state_path, "w") as f:
+            json.dump(self.state, f, indent=2)
+
+    def _restore(self, identity: Dict[str, Any]) -> bool:
+        """尝试回滚到保存的快照"""
+        if not os.path.isfile(self.state_path):
+            return False
+        with open(self.state_path, "r") as f:
+            state = json.load(f)
+        if state.get("identity") != identity or not self._rpc("evm_revert", [state["snapshot"]]):
+            return False
+        if self.w3.eth.get_code(state["address"]) in (b"", None):
+            return False
+        self.state = state
         return True
-    else:
-        print("❌ 合约编译失败")
-        return False
+
+    def setup(self) -> str:
+        """
+        准备夹具：能回滚到已保存的快照则复用，否则部署合约，然后保存新的快照
+
+        Returns:
+            合约地址
+        """
+        identity = self._identity()
+        self.reused = self._restore(identity)
+        if self.reused:
+            print(f"♻️  复用已部署的合约: {self.contract_address}")
+        else:
+            info = deploy_contract(self.artifact, self.url, self.private_key, info_path=None)
+            if info is None:
+                raise Exception("合约部署失败")
+            self.state = {"identity": identity, "address": info["address"], "block_number": info["block_number"]}
+        # evm_revert 会消耗快照，每次回滚后都重新保存
+        self.state["snapshot"] = self._rpc("evm_snapshot", [])
+        self._save()
+        return self.contract_address
+
+    def reset(self):
+        """回滚到刚部署完的状态（丢弃上一个测试产生的全部交易）"""
+        if self.state is None:
+            raise Exception("夹具未初始化，请先调用 setup()")
+        if not self._rpc("evm_revert", [self.state["snapshot"]]):
+            raise Exception("回滚快照失败（节点可能已重启），请重新调用 setup()")
+        self.state["snapshot"] = self._rpc("evm_snapshot", [])
+        self._save()
+
+    def client(self) -> BlockchainClient:
+        """已加载部署账户和合约的客户端"""
+        from local_node import ABI_PATH
+
+        if self.state is None:
+            self.setup()
+        client = BlockchainClient(self.url)
+        client.load_account(self.private_key)
+        client.load_contract(self.contract_address, self.artifact.get("abi_path") or ABI_PATH)
+        return client
+
+    def __enter__(self) -> "DeploymentFixture":
+        self.setup()
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
 
 def main():
     """主函数"""
-    
+    parser = argparse.ArgumentParser(description="编译并部署 SettlementToken 合约")
+    parser.add_argument("--url", default=DEFAULT_URL, help="节点URL")
+    parser.add_argument("--rebuild", action="store_true", help="忽略编译缓存强制重新编译")
+    parser.add_argument("--fixture", action="store_true",
+                        help="夹具模式：只部署一次并保存链快照，再次运行时回滚到部署后的状态")
+    args = parser.parse_args()
+
     print("🚀 智能合约部署工具")
     print("=" * 50)
-    
+
     # 1. 编译合约
-    if not compile_contract():
+    artifact = compile_contract(force=args.rebuild)
+    if artifact is None:
         return
-    
+
     # 2. 部署合约
-    contract_address = deploy_contract()
-    
+    if args.fixture:
+        fixture = DeploymentFixture(args.url, artifact)
+        contract_address = fixture.setup()
+        print(f"✅ 快照已保存到 {fixture.state_path}（快照ID {fixture.state['snapshot']}）")
+    else:
+        contract_info = deploy_contract(artifact, args.url)
+        contract_address = contract_info and contract_info['address']
+
     if contract_address:
         print("\n🎉 部署完成！")
         print(f"合约地址: {contract_address}")
@@ -144,5 +266,6 @@ def main():
         print("2. 查看 contract_info.json 获取合约信息")
         print("3. 在Ganache中查看交易记录")
 
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
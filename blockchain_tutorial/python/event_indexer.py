@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+交易事件本地索引
+按区块区间分段读取 TransactionRecorded / BatchTransferCompleted 事件并写入本地SQLite，
+之后按用户、时间窗口、分页查询都在本地完成，不再调用链上的 getUserTransactions 全量扫描。
+"""
+
+import sqlite3
+import threading
+from typing import List, Dict, Any, Optional
+
+from web3 import Web3
+
+TRANSACTION_RECORDED_TOPIC = Web3.keccak(text="TransactionRecorded(uint256,address,address,uint256,string)").hex()
+BATCH_TRANSFER_COMPLETED_TOPIC = Web3.keccak(text="BatchTransferCompleted(address[],uint256[],uint256)").hex()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id INTEGER PRIMARY KEY,
+    from_addr TEXT NOT NULL,
+    to_addr TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    description TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_from ON transactions (from_addr, timestamp);
+CREATE INDEX IF NOT EXISTS idx_transactions_to ON transactions (to_addr, timestamp);
+CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp);
+CREATE TABLE IF NOT EXISTS batches (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_number INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    recipient_count INTEGER NOT NULL,
+    total_amount TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+"""
+
+
+class EventIndexer:
+    """
+    SettlementToken 事件索引器
+
+    - 从上次索引到的区块继续同步（断点续传），每段区间的写入与进度更新在同一个SQLite事务中
+    - 节点拒绝过大的区间时自动把分段减半
+    - 金额以十进制字符串存储，保证 uint256 不溢出
+    """
+
+    def __init__(self, client, db_path: str = "settlement_index.db", chunk_size: int = 2000,
+                 confirmations: int = 0):
+        """
+        Args:
+            client: 已加载合约的 BlockchainClient
+            db_path: SQLite数据库文件路径（":memory:" 表示仅内存）
+            chunk_size: 每次 eth_getLogs 查询的区块数
+            confirmations: 只索引至少有这么多确认的区块（防止链重组）
+        """
+        if not client.contract:
+            raise Exception("合约未加载")
+
+        self.client = client
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(db_path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._check_contract()
+
+    @property
+    def w3(self):
+        """客户端当前的 Web3 实例（enable_metrics 后会替换）"""
+        return self.client.w3
+
+    @property
+    def contract(self):
+        """客户端当前的合约对象（随 w3 一起替换）"""
+        return self.client.contract
+
+    def _check_contract(self):
+        address = self.client.contract_address.lower()
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'contract'").fetchone()
+        if row is None:
+            with self.db:
+                self.db.execute("INSERT INTO meta (key, value) VALUES ('contract', ?)", (address,))
+        elif row[0] != address:
+            raise ValueError(f"索引库属于合约 {row[0]}，与当前合约 {address} 不一致")
+
+    @property
+    def last_indexed_block(self) -> int:
+        """已索引到的最高区块号（尚未索引时为 -1）"""
+        row = self.db.execute("SELECT value FROM meta WHERE key = 'last_block'").fetchone()
+        return int(row[0]) if row else -1
+
+    def sync(self, to_block: Optional[int] = None) -> int:
+        """
+        从上次进度继续同步事件到本地
+
+        Args:
+            to_block: 同步到的区块号，默认最新区块减去确认数
+
+        Returns:
+            本次新写入的交易记录数
+        """
+        with self._lock:
+            if to_block is None:
+                to_block = self.w3.eth.block_number - self.confirmations
+            start = self.last_indexed_block + 1
+            added = 0
+            chunk_size = self.chunk_size
+            while start <= to_block:
+                end = min(start + chunk_size - 1, to_block)
+                try:
+                    logs = self.w3.eth.get_logs({
+                        'address': self.client.contract_address,
+                        'fromBlock': start,
+                        'toBlock': end,
+                        'topics': [[TRANSACTION_RECORDED_TOPIC, BATCH_TRANSFER_COMPLETED_TOPIC]],
+                    })
+                except Exception as e:
+                    if chunk_size > 1:
+                        chunk_size = max(1, chunk_size // 2)
+                        print(f"⚠️  事件查询区间过大，缩小到 {chunk_size} 个区块: {e}")
+                        continue
+                    raise
+                added += self._store(logs, end)
+                start = end + 1
+            return added
+
+    def _block_timestamps(self, block_numbers: List[int]) -> Dict[int, int]:
+        responses = self.client.rpc_batch([
+            ('eth_getBlockByNumber', [hex(number), False]) for number in block_numbers
+        ])
+        timestamps = {}
+        for number, response in zip(block_numbers, responses):
+            if 'error' in response or not response.get('result'):
+                raise Exception(f"获取区块 {number} 失败: {response.get('error')}")
+            timestamps[number] = int(response['result']['timestamp'], 16)
+        return timestamps
+
+    def _store(self, logs: List[Dict[str, Any]], end_block: int) -> int:
+        timestamps = self._block_timestamps(sorted({log['blockNumber'] for log in logs}))
+        transactions = []
+        batches = []
+        for log in logs:
+            topic = log['topics'][0].hex() if hasattr(log['topics'][0], 'hex') else log['topics'][0]
+            timestamp = timestamps[log['blockNumber']]
+            tx_hash = log['transactionHash'].hex()
+            if topic == TRANSACTION_RECORDED_TOPIC:
+                args = self.contract.events.TransactionRecorded().process_log(log)['args']
+                transactions.append((
+                    args['transactionId'], args['from'].lower(), args['to'].lower(), str(args['amount']),
+                    args['description'], timestamp, log['blockNumber'], tx_hash, log['logIndex'],
+                ))
+            elif topic == BATCH_TRANSFER_COMPLETED_TOPIC:
+                args = self.contract.events.BatchTransferCompleted().process_log(log)['args']
+                batches.append((
+                    tx_hash, log['logIndex'], log['blockNumber'], timestamp,
+                    len(args['recipients']), str(args['totalAmount']),
+                ))
+
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", transactions)
+            self.db.executemany("INSERT OR REPLACE INTO batches VALUES (?, ?, ?, ?, ?, ?)", batches)
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_block', ?)", (str(end_block),))
+        return len(transactions)
+
+    @staticmethod
+    def _record(row) -> Dict[str, Any]:
+        return {
+            'transaction_id': row[0],
+            'from': Web3.to_checksum_address(row[1]),
+            'to': Web3.to_checksum_address(row[2]),
+            'amount': int(row[3]),
+            'timestamp': row[5],
+            'description': row[4],
+        }
+
+    def _user_query(self, columns: str, user_address: str, start_time: Optional[int],
+                    end_time: Optional[int]):
+        # 用 UNION 让 from/to 两个索引都能用上，自转账只出现一次
+        time_filter = ""
+        params: List[Any] = []
+        if start_time is not None:
+            time_filter += " AND timestamp >= ?"
+            params.append(start_time)
+        if end_time is not None:
+            time_filter += " AND timestamp < ?"
+            params.append(end_time)
+        user = user_address.lower()
+        sql = (f"SELECT {columns} FROM transactions WHERE from_addr = ?{time_filter} "
+               f"UNION SELECT {columns} FROM transactions WHERE to_addr = ?{time_filter}")
+        return sql, [user] + params + [user] + params
+
+    def get_user_transactions(self, user_address: str, start_time: Optional[int] = None,
+                              end_time: Optional[int] = None, limit: Optional[int] = None,
+                              offset: int = 0) -> List[int]:
+        """
+        查询用户参与的交易ID（与合约 getUserTransactions 的顺序一致）
+
+        Args:
+            user_address: 用户地址
+            start_time: 起始时间戳（含）
+            end_time: 结束时间戳（不含）
+            limit: 分页大小，None表示不限
+            offset: 分页偏移
+
+        Returns:
+            交易ID列表
+        """
+        sql, params = self._user_query("transaction_id", user_address, start_time, end_time)
+        sql += " ORDER BY transaction_id LIMIT ? OFFSET ?"
+        rows = self.db.execute(sql, params + [-1 if limit is None else limit, offset]).fetchall()
+        return [row[0] for row in rows]
+
+    def get_user_history(self, user_address: str, start_time: Optional[int] = None,
+                         end_time: Optional[int] = None, limit: Optional[int] = None,
+                         offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        查询用户的交易记录（字段与 BlockchainClient.get_transaction_record 相同）
+
+        Args:
+            user_address: 用户地址
+            start_time: 起始时间戳（含）
+            end_time: 结束时间戳（不含）
+            limit: 分页大小，None表示不限
+            offset: 分页偏移
+
+        Returns:
+            交易记录列表
+        """
+        columns = "transaction_id, from_addr, to_addr, amount, description, timestamp"
+        sql, params = self._user_query(columns, user_address, start_time, end_time)
+        sql += " ORDER BY transaction_id LIMIT ? OFFSET ?"
+        rows = self.db.execute(sql, params + [-1 if limit is None else limit, offset]).fetchall()
+        return [self._record(row) for row in rows]
+
+    def count_user_transactions(self, user_address: str, start_time: Optional[int] = None,
+                                end_time: Optional[int] = None) -> int:
+        """统计用户参与的交易数（用于分页）"""
+        sql, params = self._user_query("transaction_id", user_address, start_time, end_time)
+        return self.db.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+    def get_transactions_between(self, start_time: int, end_time: int, limit: Optional[int] = None,
+                                 offset: int = 0) -> List[Dict[str, Any]]:
+        """
+        查询时间窗口内的全部交易记录
+
+        Args:
+            start_time: 起始时间戳（含）
+            end_time: 结束时间戳（不含）
+            limit: 分页大小，None表示不限
+            offset: 分页偏移
+
+        Returns:
+            交易记录列表
+        """
+        rows = self.db.execute(
+            "SELECT transaction_id, from_addr, to_addr, amount, description, timestamp FROM transactions "
+            "WHERE timestamp >= ? AND timestamp < ? ORDER BY transaction_id LIMIT ? OFFSET ?",
+            (start_time, end_time, -1 if limit is None else limit, offset)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def get_transaction_record(self, transaction_id: int) -> Optional[Dict[str, Any]]:
+        """从本地索引读取单条交易记录"""
+        row = self.db.execute(
+            "SELECT transaction_id, from_addr, to_addr, amount, description, timestamp FROM transactions "
+            "WHERE transaction_id = ?", (transaction_id,)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def close(self):
+        """关闭数据库连接"""
+        self.db.close()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内EVM节点
+用 eth-tester（py-evm）执行真实的合约字节码，对外提供与Ganache相同的JSON-RPC HTTP接口；
+启动时编译 contracts/SettlementToken.sol（见 contract_build，源码未变时直接读取缓存的产物）并部署，用于基准测试。
+接口与 local_node.LocalSettlementNode 一致（url、contract_address、deployer、seed_transactions、mine），两者可以互换。
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from eth_tester import EthereumTester, PyEVMBackend
+from eth_tester.exceptions import (BlockNotFound, SnapshotNotFound, TransactionFailed,
+                                   TransactionNotFound, ValidationError)
+from web3 import Web3
+
+from contract_build import DEPLOY_GAS, TOKEN_NAME, TOKEN_SYMBOL, compile_settlement_token
+from local_node import GAS_PRICE, JSONRPCServer, RPCError, LocalSettlementNode
+
+# 与 Ganache 默认配置一致的确定性助记词，第一个账户即 LocalSettlementNode.default_account()
+MNEMONIC = "test test test test test test test test test test test junk"
+HD_PATH = "m/44'/60'/0'/0"
+SEED_BATCH_SIZE = 50
+
+# eth-tester 的字段名 -> JSON-RPC 字段名（其余字段按下划线转驼峰）
+FIELD_NAMES = {"data": "input", "coinbase": "miner"}
+
+
+def _camel(name: str) -> str:
+    head, *rest = name.split("_")
+    return head + "".join(part.capitalize() for part in rest)
+
+
+def _to_rpc(value: Any, key: Optional[str] = None) -> Any:
+    """把 eth-tester 的返回值转换为JSON-RPC格式（数值为十六进制字符串，字段名为驼峰）"""
+    if isinstance(value, dict):
+        return {FIELD_NAMES.get(k, _camel(k)): _to_rpc(v, k) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_to_rpc(v) for v in value]
+    if isinstance(value, bool):
+        return value
+    if key == "logs_bloom" and isinstance(value, int):
+        return "0x" + value.to_bytes(256, "big").hex()
+    if isinstance(value, int):
+        return hex(value)
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if key in ("to", "contract_address") and value == "":
+        return None
+    return value
+
+
+def _block_id(tag: Any):
+    if tag is None:
+        return "latest"
+    if isinstance(tag, str) and tag.startswith("0x"):
+        return int(tag, 16)
+    return tag
+
+
+class EVMSettlementNode:
+    """
+    进程内EVM节点
+
+    - 每个HTTP请求可附加固定延迟（latency），模拟真实网络往返
+    - block_time 为0时每笔交易立即出块，否则由后台线程按间隔打包
+    - 合约逻辑、gas消耗和事件全部由EVM实际执行得到
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 block_time: float = 0.0, artifact: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            latency: 每个HTTP请求的模拟延迟（秒）
+            block_time: 出块间隔（秒），0表示即时出块
+            artifact: 已编译的 {'abi', 'bytecode'}，默认调用 compile_settlement_token()
+        """
+        self.latency = latency
+        self.block_time = block_time
+        self.request_count = 0
+        self.artifact = artifact or compile_settlement_token()
+
+        self._lock = threading.RLock()
+        # block_time > 0 时收到的原始交易先排队，出块时一起打包：(哈希, 原始交易, 发送方)
+        self._queued: List[tuple] = []
+        self.tester = EthereumTester(PyEVMBackend(mnemonic=MNEMONIC, hd_path=HD_PATH))
+        self.deployer = Web3.to_checksum_address(self.default_account().address)
+        self.contract_address = self._deploy()
+        self._contract = Web3().eth.contract(address=self.contract_address, abi=self.artifact["abi"])
+
+        self._server = JSONRPCServer(host, port, self.handle, latency)
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    default_account = staticmethod(LocalSettlementNode.default_account)
+
+    @property
+    def url(self) -> str:
+        return self._server.url
+
+    @property
+    def http_request_count(self) -> int:
+        return self._server.http_request_count
+
+    def start(self) -> "EVMSettlementNode":
+        """在后台线程中启动HTTP服务（以及定时出块）"""
+        serve = threading.Thread(target=self._server.serve_forever, daemon=True)
+        serve.start()
+        self._threads.append(serve)
+        if self.block_time > 0:
+            miner = threading.Thread(target=self._mine_loop, daemon=True)
+            miner.start()
+            self._threads.append(miner)
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "EVMSettlementNode":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _deploy(self) -> str:
+        factory = Web3().eth.contract(abi=self.artifact["abi"], bytecode=self.artifact["bytecode"])
+        data = factory.constructor(TOKEN_NAME, TOKEN_SYMBOL).data_in_transaction
+        tx_hash = self.tester.send_transaction({"from": self.deployer, "gas": DEPLOY_GAS, "data": data})
+        receipt = self.tester.get_transaction_receipt(tx_hash)
+        if receipt["status"] != 1:
+            raise RuntimeError("SettlementToken 部署失败")
+        return Web3.to_checksum_address(receipt["contract_address"])
+
+    # ------------------------------------------------------------------
+    # 直接操作状态（用于准备基准数据，不经过RPC）
+    # ------------------------------------------------------------------
+
+    def seed_transactions(self, transfers: List[tuple], sender: Optional[str] = None):
+        """
+        通过 batchTransfer 直接写入交易记录（每 SEED_BATCH_SIZE 笔一笔交易），用于快速构造历史数据
+
+        Args:
+            transfers: (接收方地址, 金额, 描述) 列表，同一批内使用第一笔的描述
+            sender: 发送方地址，默认部署者
+        """
+        sender = Web3.to_checksum_address(sender or self.deployer)
+        with self._lock:
+            # 先打包排队中的交易，避免与直接发送的交易争用nonce
+            self.mine()
+            for i in range(0, len(transfers), SEED_BATCH_SIZE):
+                chunk = transfers[i:i + SEED_BATCH_SIZE]
+                data = self._contract.encodeABI(fn_name="batchTransfer", args=[
+                    [Web3.to_checksum_address(to) for to, _, _ in chunk],
+                    [amount for _, amount, _ in chunk],
+                    chunk[0][2],
+                ])
+                tx = {"from": sender, "to": self.contract_address, "data": data}
+                tx["gas"] = self.tester.estimate_gas(tx)
+                self.tester.send_transaction(tx)
+
+    def mine(self) -> int:
+        """把所有待打包交易打成一个区块，返回区块号"""
+        with self._lock:
+            if self._queued:
+                # 直接写入后端的待打包区块（eth-tester 自身的待打包模式不支持 EIP-155 旧式签名）
+                for _, raw, _ in self._queued:
+                    self.tester.backend.send_raw_transaction(raw)
+                self._queued = []
+                self.tester.mine_blocks(1)
+            return self.tester.get_block_by_number("latest")["number"]
+
+    def _mine_loop(self):
+        while not self._stopped.wait(self.block_time):
+            with self._lock:
+                if self._queued:
+                    self.mine()
+
+    def take_snapshot(self) -> int:
+        """保存当前链状态，返回快照ID"""
+        with self._lock:
+            return self.tester.take_snapshot()
+
+    def revert_to_snapshot(self, snapshot_id: int):
+        """恢复到快照时的链状态"""
+        with self._lock:
+            self.tester.revert_to_snapshot(snapshot_id)
+            self._queued = []
+
+    # ------------------------------------------------------------------
+    # JSON-RPC 分发
+    # ------------------------------------------------------------------
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """处理单个JSON-RPC请求"""
+        method = request.get("method")
+        params = request.get("params") or []
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        with self._lock:
+            self.request_count += 1
+            try:
+                response["result"] = self._dispatch(method, params)
+            except RPCError as e:
+                response["error"] = {"code": e.code, "message": str(e)}
+            except TransactionFailed as e:
+                reason = e.args[0] if e.args else ""
+                response["error"] = {"code": 3, "message": f"execution reverted: {reason}"}
+            except ValidationError as e:
+                response["error"] = {"code": -32000, "message": str(e)}
+            except Exception as e:
+                response["error"] = {"code": -32603, "message": f"{type(e).__name__}: {e}"}
+        return response
+
+    def _queued_count(self, address: str) -> int:
+        address = Web3.to_checksum_address(address)
+        return sum(1 for _, _, sender in self._queued if sender == address)
+
+    def _queue_raw_transaction(self, raw_hex: str) -> str:
+        raw = bytes.fromhex(raw_hex[2:] if raw_hex.startswith("0x") else raw_hex)
+        tx_hash = Web3.keccak(raw).hex()
+        if any(queued_hash == tx_hash for queued_hash, _, _ in self._queued):
+            raise RPCError("already known")
+        transaction = self.tester.backend.chain.get_vm().get_transaction_builder().decode(raw)
+        sender, nonce = Web3.to_checksum_address(transaction.sender), transaction.nonce
+        expected = self.tester.get_nonce(sender, "latest") + self._queued_count(sender)
+        # 排队的交易出块时才执行，因此在这里先检查nonce，与节点的 "nonce too low/high" 行为一致
+        if nonce != expected:
+            raise RPCError(f"the tx doesn't have the correct nonce. account has nonce of: {expected} tx has nonce of: {nonce}")
+        self._queued.append((tx_hash, raw, sender))
+        return tx_hash
+
+    def _call_params(self, params: List[Any]) -> Dict[str, Any]:
+        call = params[0]
+        tx = {"from": call.get("from") or self.deployer, "data": call.get("data", call.get("input", "0x"))}
+        if call.get("to"):
+            tx["to"] = call["to"]
+        for field in ("gas", "value"):
+            if field in call:
+                tx[field] = int(call[field], 16)
+        return tx
+
+    def _dispatch(self, method: str, params: List[Any]) -> Any:
+        tester = self.tester
+        if method == "web3_clientVersion":
+            return "EVMSettlementNode/py-evm"
+        if method == "net_version":
+            return str(tester.backend.chain.chain_id)
+        if method == "eth_chainId":
+            return hex(tester.backend.chain.chain_id)
+        if method == "eth_blockNumber":
+            return hex(tester.get_block_by_number("latest")["number"])
+        if method == "eth_gasPrice":
+            return hex(GAS_PRICE)
+        if method == "eth_accounts":
+            return [self.deployer]
+        if method == "evm_snapshot":
+            return hex(self.take_snapshot())
+        if method == "evm_revert":
+            try:
+                self.revert_to_snapshot(int(params[0], 16) if isinstance(params[0], str) else params[0])
+            except SnapshotNotFound:
+                return False
+            return True
+        if method == "eth_getBalance":
+            return hex(tester.get_balance(params[0], _block_id(params[1] if params[1:] else None)))
+        if method == "eth_getTransactionCount":
+            nonce = tester.get_nonce(params[0], "latest")
+            if params[1:] and params[1] == "pending":
+                nonce += self._queued_count(params[0])
+            return hex(nonce)
+        if method == "eth_getCode":
+            return tester.get_code(params[0], _block_id(params[1] if params[1:] else None))
+        if method == "eth_call":
+            return tester.call(self._call_params(params), _block_id(params[1] if params[1:] else None))
+        if method == "eth_estimateGas":
+            return hex(tester.estimate_gas(self._call_params(params)))
+        if method == "eth_sendRawTransaction":
+            if self.block_time <= 0:
+                return tester.send_raw_transaction(params[0])
+            return self._queue_raw_transaction(params[0])
+        if method == "eth_getTransactionByHash":
+            try:
+                return _to_rpc(tester.get_transaction_by_hash(params[0]))
+            except TransactionNotFound:
+                return None
+        if method == "eth_getTransactionReceipt":
+            try:
+                receipt = tester.get_transaction_receipt(params[0])
+            except TransactionNotFound:
+                return None
+            if receipt is None or receipt.get("block_number") is None:
+                return None
+            result = _to_rpc(receipt)
+            result.setdefault("logsBloom", "0x" + "00" * 256)
+            for log in result["logs"]:
+                log["removed"] = False
+            return result
+        if method == "eth_getBlockByNumber":
+            try:
+                return _to_rpc(tester.get_block_by_number(_block_id(params[0]), bool(params[1:] and params[1])))
+            except BlockNotFound:
+                return None
+        if method == "eth_getLogs":
+            query = params[0] if params else {}
+            filter_id = tester.create_log_filter(
+                from_block=_block_id(query.get("fromBlock", "earliest")),
+                to_block=_block_id(query.get("toBlock", "latest")),
+                address=query.get("address"),
+                topics=query.get("topics"),
+            )
+            try:
+                logs = _to_rpc(tester.get_all_filter_logs(filter_id))
+            finally:
+                tester.delete_filter(filter_id)
+            for log in logs:
+                log["removed"] = False
+            return logs
+        raise RPCError(f"Method {method} not supported", code=-32601)
+
+
+def main():
+    """以独立进程方式运行进程内EVM节点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SettlementToken 进程内EVM节点（eth-tester + py-evm）")
+    parser.add_argument("--port", type=int, default=7545)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    parser.add_argument("--block-time", type=float, default=0.0, help="出块间隔（秒），0为即时出块")
+    args = parser.parse_args()
+
+    node = EVMSettlementNode(port=args.port, latency=args.latency, block_time=args.block_time).start()
+    print(f"✅ EVM节点已启动: {node.url}")
+    print(f"合约地址: {node.contract_address}")
+    print(f"部署账户: {node.deployer}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        node.stop()
+
+
+if __name__ == "__main__":
+    main()
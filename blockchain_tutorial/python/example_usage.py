@@ -139,9 +139,9 @@ def demo_transaction_history():
         print(f"📋 {user_address} 的交易记录:")
         print(f"总交易数: {len(transaction_ids)}")
         
-        # 显示最近的5笔交易
-        for i, tx_id in enumerate(transaction_ids[-5:]):
-            tx_record = client.get_transaction_record(tx_id)
+        # 显示最近的5笔交易（一次批量请求取回）
+        recent_ids = transaction_ids[-5:]
+        for tx_id, tx_record in zip(recent_ids, client.get_transaction_records(recent_ids)):
             if tx_record:
                 print(f"\n交易 #{tx_id}:")
                 print(f"  发送方: {tx_record['from']}")
@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地模拟节点
+在进程内启动一个最小化的JSON-RPC HTTP服务，模拟部署了SettlementToken合约的Ganache，
+用于基准测试和离线演示（不执行EVM字节码，合约逻辑由Python复现）。
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+
+import rlp
+from eth_abi import decode, encode
+from eth_account import Account
+from web3 import Web3
+
+ABI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "contracts", "SettlementToken.abi.json")
+
+# 与 ganache-config.json 保持一致
+CHAIN_ID = 1337
+BLOCK_GAS_LIMIT = 6721975
+GAS_PRICE = 20000000000
+INITIAL_SUPPLY = 1000000 * 10**18
+
+# 近似的gas模型：ERC20转账 + 一条交易记录（5个存储槽）+ 事件
+TX_BASE_GAS = 21000
+TRANSFER_GAS = 30000
+RECORD_SLOT_GAS = 20000
+EVENT_GAS = 2000
+BATCH_BASE_GAS = 5000
+BATCH_EVENT_GAS_PER_ITEM = 800
+
+
+def _selector(signature: str) -> bytes:
+    return bytes(Web3.keccak(text=signature)[:4])
+
+
+def _topic(signature: str) -> str:
+    return Web3.keccak(text=signature).hex()
+
+
+SELECTORS = {
+    _selector("name()"): "name",
+    _selector("symbol()"): "symbol",
+    _selector("decimals()"): "decimals",
+    _selector("totalSupply()"): "totalSupply",
+    _selector("transactionCount()"): "transactionCount",
+    _selector("balanceOf(address)"): "balanceOf",
+    _selector("getTransaction(uint256)"): "getTransaction",
+    _selector("transactions(uint256)"): "getTransaction",
+    _selector("getUserTransactions(address)"): "getUserTransactions",
+    _selector("transferWithRecord(address,uint256,string)"): "transferWithRecord",
+    _selector("batchTransfer(address[],uint256[],string)"): "batchTransfer",
+}
+
+TRANSACTION_RECORDED_TOPIC = _topic("TransactionRecorded(uint256,address,address,uint256,string)")
+BATCH_TRANSFER_COMPLETED_TOPIC = _topic("BatchTransferCompleted(address[],uint256[],uint256)")
+
+
+class RPCError(Exception):
+    """JSON-RPC错误（会以 error 字段返回给客户端）"""
+
+    def __init__(self, message: str, code: int = -32000):
+        super().__init__(message)
+        self.code = code
+
+
+def record_gas(description: str) -> int:
+    """估算写入一条交易记录所需的gas"""
+    desc_slots = 1 if len(description.encode()) < 32 else 1 + (len(description.encode()) + 31) // 32
+    return TRANSFER_GAS + RECORD_SLOT_GAS * (4 + desc_slots) + EVENT_GAS
+
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+
+def _pad_address(address: str) -> str:
+    return "0x" + "0" * 24 + address[2:].lower()
+
+
+class _JSONRPCHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length))
+        server.http_request_count += 1
+        if server.latency:
+            time.sleep(server.latency)
+        if isinstance(payload, list):
+            body = [server.dispatch(item) for item in payload]
+        else:
+            body = server.dispatch(payload)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class JSONRPCServer(ThreadingHTTPServer):
+    """
+    最小化的JSON-RPC HTTP服务（LocalSettlementNode 与 evm_node.EVMSettlementNode 共用）
+
+    支持单个请求和批量请求，每个请求交给 dispatch 处理；http_request_count 统计HTTP请求数。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str, port: int, dispatch: Callable[[Dict[str, Any]], Dict[str, Any]],
+                 latency: float = 0.0):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            dispatch: 处理单个JSON-RPC请求、返回响应字典的函数
+            latency: 每个HTTP请求的模拟延迟（秒）
+        """
+        self.dispatch = dispatch
+        self.latency = latency
+        self.http_request_count = 0
+        super().__init__((host, port), _JSONRPCHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class LocalSettlementNode:
+    """
+    模拟节点
+
+    - 每个HTTP请求可附加固定延迟（latency），模拟真实网络往返
+    - block_time 为0时每笔交易立即出块，否则由后台线程按间隔打包
+    - 支持 SettlementToken 的读写方法、交易收据和事件日志
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 block_time: float = 0.0, deployer: Optional[str] = None):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0表示自动分配
+            latency: 每个HTTP请求的模拟延迟（秒）
+            block_time: 出块间隔（秒），0表示即时出块
+            deployer: 部署者地址（持有全部初始供应），默认使用 Ganache 确定性助记词的第一个账户
+        """
+        self.latency = latency
+        self.block_time = block_time
+        self.contract_address = Web3.to_checksum_address("0x" + "5e" * 20)
+        self.deployer = Web3.to_checksum_address(deployer or self.default_account().address)
+        self.request_count = 0
+
+        self._lock = threading.RLock()
+        self._balances: Dict[str, int] = {self.deployer: INITIAL_SUPPLY}
+        self._records: List[Dict[str, Any]] = []
+        self._nonces: Dict[str, int] = {}
+        self._queued: Dict[str, Dict[int, tuple]] = {}
+        self._known_txs: Dict[str, Dict[str, Any]] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._receipts: Dict[str, Dict[str, Any]] = {}
+        self._blocks: List[Dict[str, Any]] = []
+        self._logs: List[Dict[str, Any]] = []
+        self._seal_block([])
+
+        self._server = JSONRPCServer(host, port, self.handle, latency)
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def default_account():
+        """Ganache 确定性助记词（test test ... junk）的第一个账户"""
+        Account.enable_unaudited_hdwallet_features()
+        return Account.from_mnemonic("test test test test test test test test test test test junk")
+
+    @property
+    def url(self) -> str:
+        return self._server.url
+
+    @property
+    def http_request_count(self) -> int:
+        return self._server.http_request_count
+
+    def start(self) -> "LocalSettlementNode":
+        """在后台线程中启动HTTP服务（以及定时出块）"""
+        serve = threading.Thread(target=self._server.serve_forever, daemon=True)
+        serve.start()
+        self._threads.append(serve)
+        if self.block_time > 0:
+            miner = threading.Thread(target=self._mine_loop, daemon=True)
+            miner.start()
+            self._threads.append(miner)
+        return self
+
+    def stop(self):
+        """停止服务"""
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "LocalSettlementNode":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ------------------------------------------------------------------
+    # 直接操作状态（用于准备基准数据，不经过RPC）
+    # ------------------------------------------------------------------
+
+    def seed_transactions(self, transfers: List[tuple], sender: Optional[str] = None):
+        """
+        直接写入交易记录（按每笔一个区块打包），用于快速构造历史数据
+
+        Args:
+            transfers: (接收方地址, 金额, 描述) 列表
+            sender: 发送方地址，默认部署者
+        """
+        sender = Web3.to_checksum_address(sender or self.deployer)
+        with self._lock:
+            for to, amount, description in transfers:
+                tx_hash = Web3.keccak(text=f"seed-{len(self._records)}-{to}-{amount}").hex()
+                logs = self._apply_transfer(sender, Web3.to_checksum_address(to), amount, description)
+                self._pending.append({"hash": tx_hash, "from": sender, "to": self.contract_address,
+                                      "nonce": 0, "gas": 0, "gas_used": record_gas(description),
+                                      "status": 1, "logs": logs})
+            self._seal_block(self._pending)
+            self._pending = []
+
+    def mine(self) -> int:
+        """把所有待打包交易打成一个区块，返回区块号"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            return self._seal_block(pending)
+
+    def _mine_loop(self):
+        while not self._stopped.wait(self.block_time):
+            with self._lock:
+                if self._pending:
+                    self.mine()
+
+    # ------------------------------------------------------------------
+    # 合约逻辑
+    # ------------------------------------------------------------------
+
+    def _apply_transfer(self, sender: str, to: str, amount: int, description: str) -> List[Dict[str, Any]]:
+        if self._balances.get(sender, 0) < amount:
+            raise RPCError("execution reverted: ERC20InsufficientBalance")
+        self._balances[sender] -= amount
+        self._balances[to] = self._balances.get(to, 0) + amount
+        self._records.append({"from": sender, "to": to, "amount": amount,
+                              "timestamp": int(time.time()), "description": description})
+        transaction_id = len(self._records)
+        return [{
+            "topics": [TRANSACTION_RECORDED_TOPIC, _hex_word(transaction_id), _pad_address(sender), _pad_address(to)],
+            "data": "0x" + encode(["uint256", "string"], [amount, description]).hex(),
+        }]
+
+    def _execute(self, sender: str, data: bytes, gas: int) -> Dict[str, Any]:
+        method = SELECTORS.get(data[:4])
+        args = data[4:]
+        if method == "transferWithRecord":
+            to, amount, description = decode(["address", "uint256", "string"], args)
+            gas_used = TX_BASE_GAS + record_gas(description)
+            if gas_used > gas:
+                return {"status": 0, "gas_used": gas, "logs": []}
+            logs = self._apply_transfer(sender, Web3.to_checksum_address(to), amount, description)
+            return {"status": 1, "gas_used": gas_used, "logs": logs}
+        if method == "batchTransfer":
+            recipients, amounts, description = decode(["address[]", "uint256[]", "string"], args)
+            if len(recipients) != len(amounts):
+                raise RPCError("execution reverted: Recipients and amounts arrays must have the same length")
+            gas_used = self.estimate_batch_gas(len(recipients), description)
+            if gas_used > gas:
+                return {"status": 0, "gas_used": gas, "logs": []}
+            if self._balances.get(sender, 0) < sum(amounts):
+                raise RPCError("execution reverted: Insufficient balance for batch transfer")
+            logs = []
+            for to, amount in zip(recipients, amounts):
+                logs.extend(self._apply_transfer(sender, Web3.to_checksum_address(to), amount, description))
+            logs.append({
+                "topics": [BATCH_TRANSFER_COMPLETED_TOPIC],
+                "data": "0x" + encode(["address[]", "uint256[]", "uint256"],
+                                      [list(recipients), list(amounts), sum(amounts)]).hex(),
+            })
+            return {"status": 1, "gas_used": gas_used, "logs": logs}
+        raise RPCError("execution reverted: unknown method")
+
+    @staticmethod
+    def estimate_batch_gas(count: int, description: str = "") -> int:
+        """估算批量转账给 count 个接收方所需的gas"""
+        return (TX_BASE_GAS + BATCH_BASE_GAS
+                + count * (record_gas(description) + BATCH_EVENT_GAS_PER_ITEM))
+
+    def _call(self, data: bytes) -> bytes:
+        method = SELECTORS.get(data[:4])
+        args = data[4:]
+        if method == "name":
+            return encode(["string"], ["Settlement Token"])
+        if method == "symbol":
+            return encode(["string"], ["SETT"])
+        if method == "decimals":
+            return encode(["uint8"], [18])
+        if method == "totalSupply":
+            return encode(["uint256"], [sum(self._balances.values())])
+        if method == "transactionCount":
+            return encode(["uint256"], [len(self._records)])
+        if method == "balanceOf":
+            (address,) = decode(["address"], args)
+            return encode(["uint256"], [self._balances.get(Web3.to_checksum_address(address), 0)])
+        if method == "getTransaction":
+            (transaction_id,) = decode(["uint256"], args)
+            if not 0 < transaction_id <= len(self._records):
+                raise RPCError("execution reverted: Invalid transaction ID", code=3)
+            r = self._records[transaction_id - 1]
+            return encode(["address", "address", "uint256", "uint256", "string"],
+                          [r["from"], r["to"], r["amount"], r["timestamp"], r["description"]])
+        if method == "getUserTransactions":
+            (user,) = decode(["address"], args)
+            user = Web3.to_checksum_address(user)
+            ids = [i + 1 for i, r in enumerate(self._records) if r["from"] == user or r["to"] == user]
+            return encode(["uint256[]"], [ids])
+        raise RPCError("execution reverted: unknown method")
+
+    # ------------------------------------------------------------------
+    # 区块与收据
+    # ------------------------------------------------------------------
+
+    def _seal_block(self, txs: List[Dict[str, Any]]) -> int:
+        number = len(self._blocks)
+        parent = self._blocks[-1]["hash"] if self._blocks else "0x" + "00" * 32
+        block_hash = Web3.keccak(text=f"block-{number}-{parent}").hex()
+        timestamp = int(time.time())
+        cumulative = 0
+        log_index = 0
+        for index, tx in enumerate(txs):
+            cumulative += tx["gas_used"]
+            logs = []
+            for log in tx["logs"]:
+                logs.append({
+                    "address": self.contract_address, "topics": log["topics"], "data": log["data"],
+                    "blockNumber": _hex(number), "blockHash": block_hash,
+                    "transactionHash": tx["hash"], "transactionIndex": _hex(index),
+                    "logIndex": _hex(log_index), "removed": False,
+                })
+                log_index += 1
+            self._logs.extend(logs)
+            self._receipts[tx["hash"]] = {
+                "transactionHash": tx["hash"], "transactionIndex": _hex(index),
+                "blockHash": block_hash, "blockNumber": _hex(number),
+                "from": tx["from"], "to": tx["to"], "contractAddress": None,
+                "cumulativeGasUsed": _hex(cumulative), "gasUsed": _hex(tx["gas_used"]),
+                "effectiveGasPrice": _hex(GAS_PRICE), "logs": logs,
+                "logsBloom": "0x" + "00" * 256, "status": _hex(tx["status"]), "type": "0x0",
+            }
+        self._blocks.append({
+            "number": _hex(number), "hash": block_hash, "parentHash": parent,
+            "timestamp": _hex(timestamp), "transactions": [tx["hash"] for tx in txs],
+            "gasLimit": _hex(BLOCK_GAS_LIMIT), "gasUsed": _hex(cumulative),
+            "miner": "0x" + "00" * 20, "difficulty": "0x0", "totalDifficulty": "0x0",
+            "extraData": "0x", "size": "0x3e8", "nonce": "0x0000000000000000",
+            "sha3Uncles": "0x" + "00" * 32, "logsBloom": "0x" + "00" * 256,
+            "transactionsRoot": "0x" + "00" * 32, "stateRoot": "0x" + "00" * 32,
+            "receiptsRoot": "0x" + "00" * 32, "mixHash": "0x" + "00" * 32,
+            "uncles": [], "baseFeePerGas": "0x0",
+        })
+        return number
+
+    def _block_number(self, tag) -> int:
+        if tag in (None, "latest", "pending", "safe", "finalized"):
+            return len(self._blocks) - 1
+        if tag == "earliest":
+            return 0
+        return int(tag, 16)
+
+    def _send_raw_transaction(self, raw_hex: str) -> str:
+        raw = bytes.fromhex(raw_hex[2:] if raw_hex.startswith("0x") else raw_hex)
+        nonce, gas_price, gas, to, value, data, v, r, s = rlp.decode(raw)
+        sender = Account.recover_transaction(raw)
+        tx_hash = Web3.keccak(raw).hex()
+        if tx_hash in self._known_txs:
+            raise RPCError("already known")
+        nonce = int.from_bytes(nonce, "big")
+        expected = self._nonces.get(sender, 0)
+        if nonce < expected:
+            raise RPCError(f"the tx doesn't have the correct nonce. account has nonce of: {expected} tx has nonce of: {nonce}")
+        if Web3.to_checksum_address(to) != self.contract_address:
+            raise RPCError("execution reverted: unknown contract")
+        queue = self._queued.setdefault(sender, {})
+        if nonce in queue:
+            raise RPCError("replacement transaction underpriced")
+        self._known_txs[tx_hash] = {"hash": tx_hash, "from": sender, "to": self.contract_address,
+                                    "nonce": _hex(nonce), "gas": _hex(int.from_bytes(gas, "big")),
+                                    "gasPrice": _hex(int.from_bytes(gas_price, "big")), "value": "0x0",
+                                    "input": "0x" + data.hex(), "blockHash": None, "blockNumber": None,
+                                    "transactionIndex": None}
+        # 与Ganache一样，nonce超前的交易先排队，等前序nonce到齐后再执行
+        queue[nonce] = (tx_hash, int.from_bytes(gas, "big"), data)
+        while expected in queue:
+            queued_hash, queued_gas, queued_data = queue.pop(expected)
+            try:
+                result = self._execute(sender, queued_data, queued_gas)
+            except RPCError:
+                # 执行回滚：交易照样打包并消耗nonce，收据 status 为 0
+                result = {"status": 0, "gas_used": queued_gas, "logs": []}
+            self._pending.append({"hash": queued_hash, "from": sender, "to": self.contract_address,
+                                  "nonce": expected, "gas": queued_gas, **result})
+            expected += 1
+            self._nonces[sender] = expected
+        if self.block_time <= 0 and self._pending:
+            self.mine()
+        return tx_hash
+
+    def _get_logs(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        from_block = self._block_number(params.get("fromBlock", "earliest"))
+        to_block = self._block_number(params.get("toBlock", "latest"))
+        address = params.get("address")
+        addresses = {a.lower() for a in (address if isinstance(address, list) else [address])} if address else None
+        topics = params.get("topics") or []
+        out = []
+        for log in self._logs:
+            number = int(log["blockNumber"], 16)
+            if number < from_block or number > to_block:
+                continue
+            if addresses and log["address"].lower() not in addresses:
+                continue
+            if any(want is not None and log["topics"][i] not in (want if isinstance(want, list) else [want])
+                   for i, want in enumerate(topics) if i < len(log["topics"])):
+                continue
+            out.append(log)
+        return out
+
+    # ------------------------------------------------------------------
+    # JSON-RPC 分发
+    # ------------------------------------------------------------------
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """处理单个JSON-RPC请求"""
+        method = request.get("method")
+        params = request.get("params") or []
+        response = {"jsonrpc": "2.0", "id": request.get("id")}
+        with self._lock:
+            self.request_count += 1
+            try:
+                response["result"] = self._dispatch(method, params)
+            except RPCError as e:
+                response["error"] = {"code": e.code, "message": str(e)}
+            except Exception as e:
+                response["error"] = {"code": -32603, "message": f"{type(e).__name__}: {e}"}
+        return response
+
+    def _dispatch(self, method: str, params: List[Any]) -> Any:
+        if method == "web3_clientVersion":
+            return "LocalSettlementNode/v1"
+        if method == "net_version":
+            return str(CHAIN_ID)
+        if method == "eth_chainId":
+            return _hex(CHAIN_ID)
+        if method == "eth_blockNumber":
+            return _hex(len(self._blocks) - 1)
+        if method == "eth_gasPrice":
+            return _hex(GAS_PRICE)
+        if method == "eth_accounts":
+            return [self.deployer]
+        if method == "eth_getBalance":
+            return _hex(1000 * 10**18)
+        if method == "eth_getTransactionCount":
+            sender = Web3.to_checksum_address(params[0])
+            confirmed = self._nonces.get(sender, 0)
+            if params[1:] and params[1] == "pending":
+                return _hex(confirmed)
+            return _hex(confirmed - sum(1 for tx in self._pending if tx["from"] == sender))
+        if method == "eth_call":
+            data = bytes.fromhex(params[0].get("data", params[0].get("input", "0x"))[2:])
+            return "0x" + self._call(data).hex()
+        if method == "eth_estimateGas":
+            data = bytes.fromhex(params[0].get("data", params[0].get("input", "0x"))[2:])
+            name = SELECTORS.get(data[:4])
+            if name == "batchTransfer":
+                recipients, _, description = decode(["address[]", "uint256[]", "string"], data[4:])
+                return _hex(self.estimate_batch_gas(len(recipients), description))
+            if name == "transferWithRecord":
+                _, _, description = decode(["address", "uint256", "string"], data[4:])
+                return _hex(TX_BASE_GAS + record_gas(description))
+            return _hex(TX_BASE_GAS)
+        if method == "eth_sendRawTransaction":
+            return self._send_raw_transaction(params[0])
+        if method == "eth_getTransactionByHash":
+            tx = self._known_txs.get(params[0])
+            receipt = self._receipts.get(params[0])
+            if tx and receipt:
+                return {**tx, "blockHash": receipt["blockHash"], "blockNumber": receipt["blockNumber"],
+                        "transactionIndex": receipt["transactionIndex"]}
+            return tx
+        if method == "eth_getTransactionReceipt":
+            return self._receipts.get(params[0])
+        if method == "eth_getBlockByNumber":
+            number = self._block_number(params[0])
+            if number >= len(self._blocks):
+                return None
+            return self._blocks[number]
+        if method == "eth_getLogs":
+            return self._get_logs(params[0] if params else {})
+        raise RPCError(f"Method {method} not supported", code=-32601)
+
+
+def _hex_word(value: int) -> str:
+    return "0x" + value.to_bytes(32, "big").hex()
+
+
+def main():
+    """以独立进程方式运行模拟节点"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="SettlementToken 本地模拟节点")
+    parser.add_argument("--port", type=int, default=7545)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    parser.add_argument("--block-time", type=float, default=0.0, help="出块间隔（秒），0为即时出块")
+    args = parser.parse_args()
+
+    node = LocalSettlementNode(port=args.port, latency=args.latency, block_time=args.block_time).start()
+    print(f"✅ 模拟节点已启动: {node.url}")
+    print(f"合约地址: {node.contract_address}")
+    print(f"部署账户: {node.deployer}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        node.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+结算压缩
+把一天的P2P账本（每个5分钟步长、每对买卖方一条）轧差成少量链上转账：
+可以按交易对轧差，也可以按每个参与者的净头寸求出最少转账集合。
+原始账本条目另外生成 Merkle 承诺（keccak256，与 OpenZeppelin MerkleProof 兼容），
+上链的只有轧差后的转账，审计时可以证明任意一条原始记录包含在承诺中。
+"""
+
+import heapq
+import json
+import math
+from collections import defaultdict
+from typing import List, Dict, Any, Tuple, Iterable
+
+from web3 import Web3
+
+from columnar_ledger import ColumnarLedger, limbs_to_int
+from settlement_planner import TOKEN_DECIMALS, to_token_units
+
+# 只有社区内部交易在链上结算；外购电费（卖方为 GRID）由零售商另行结算
+SETTLED_TYPES = ('internal',)
+
+
+def _entry_parties(entry: Dict[str, Any]) -> Tuple[str, str]:
+    """返回 (付款方, 收款方)：账本中买方付款给卖方"""
+    return entry['buyer'], entry['seller']
+
+
+def net_positions(ledger: List[Dict[str, Any]], decimals: int = TOKEN_DECIMALS) -> Dict[str, int]:
+    """
+    计算每个参与者的净头寸（最小单位整数，正数为应收，负数为应付）
+
+    Args:
+        ledger: 账本条目，或 ColumnarLedger（按列向量化计算，使用其自身的精度）
+        decimals: 代币精度
+
+    Returns:
+        参与者 -> 净头寸，所有值之和为0
+    """
+    if isinstance(ledger, ColumnarLedger):
+        return ledger.net_positions()
+    positions: Dict[str, int] = defaultdict(int)
+    for entry in ledger:
+        payer, payee = _entry_parties(entry)
+        amount = to_token_units(entry['amount'], decimals)
+        positions[payer] -= amount
+        positions[payee] += amount
+    return dict(positions)
+
+
+def net_by_pair(ledger: List[Dict[str, Any]], decimals: int = TOKEN_DECIMALS) -> List[Tuple[str, str, int]]:
+    """
+    按交易对轧差：同一对参与者之间的所有往来抵消成一笔
+
+    Args:
+        ledger: 账本条目，或 ColumnarLedger
+        decimals: 代币精度
+
+    Returns:
+        (付款方, 收款方, 金额) 列表
+    """
+    if isinstance(ledger, ColumnarLedger):
+        return ledger.net_by_pair()
+    pair_totals: Dict[Tuple[str, str], int] = defaultdict(int)
+    for entry in ledger:
+        payer, payee = _entry_parties(entry)
+        if payer == payee:
+            continue
+        amount = to_token_units(entry['amount'], decimals)
+        # 以字典序较小者为键的正方向，反向交易记为负
+        if payer < payee:
+            pair_totals[(payer, payee)] += amount
+        else:
+            pair_totals[(payee, payer)] -= amount
+
+    transfers = []
+    for (a, b), amount in sorted(pair_totals.items()):
+        if amount > 0:
+            transfers.append((a, b, amount))
+        elif amount < 0:
+            transfers.append((b, a, -amount))
+    return transfers
+
+
+def minimize_transfers(positions: Dict[str, int]) -> List[Tuple[str, str, int]]:
+    """
+    由净头寸求出清零所有头寸的转账集合：每次让最大应付方付给最大应收方，
+    每一步至少清零一方，转账笔数不超过「非零头寸参与者数 - 1」
+
+    Args:
+        positions: 参与者 -> 净头寸（之和必须为0）
+
+    Returns:
+        (付款方, 收款方, 金额) 列表
+    """
+    if sum(positions.values()) != 0:
+        raise ValueError("净头寸之和不为0，账本不平衡")
+
+    debtors = [(amount, name) for name, amount in positions.items() if amount < 0]
+    creditors = [(-amount, name) for name, amount in positions.items() if amount > 0]
+    heapq.heapify(debtors)
+    heapq.heapify(creditors)
+
+    transfers = []
+    while debtors and creditors:
+        debt, payer = heapq.heappop(debtors)
+        credit, payee = heapq.heappop(creditors)
+        amount = min(-debt, -credit)
+        transfers.append((payer, payee, amount))
+        if -debt > amount:
+            heapq.heappush(debtors, (debt + amount, payer))
+        if -credit > amount:
+            heapq.heappush(creditors, (credit + amount, payee))
+    return transfers
+
+
+def group_by_payer(transfers: List[Tuple[str, str, int]], address_book: Dict[str, str]) -> Dict[str, List[Tuple[str, int]]]:
+    """
+    把转账按付款方分组，得到每个付款账户可直接交给 SettlementPlanner 的结算清单
+
+    Args:
+        transfers: (付款方, 收款方, 金额) 列表
+        address_book: 参与者名称 -> 链上地址
+
+    Returns:
+        付款方名称 -> [(收款方地址, 金额)]
+    """
+    grouped: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+    for payer, payee, amount in transfers:
+        grouped[payer].append((address_book[payee], amount))
+    return dict(grouped)
+
+
+# ----------------------------------------------------------------------
+# Merkle 承诺
+# ----------------------------------------------------------------------
+
+def _optional_float(value) -> Any:
+    if value is None:
+        return None
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def canonical_record(entry: Dict[str, Any], decimals: int = TOKEN_DECIMALS) -> Dict[str, Any]:
+    """
+    账本条目的规范形式：只保留账本字段，数值统一类型，金额量化为链上整数（十进制字符串），
+    这样字典条目与 ColumnarLedger.to_records() 转出的条目得到相同的叶子
+
+    Args:
+        entry: 账本条目（可带 amount_units，优先于 amount 换算）
+        decimals: 代币精度
+    """
+    units = entry.get('amount_units')
+    amount = int(units) if units is not None else to_token_units(entry['amount'], decimals)
+    return {
+        'time': int(entry['time']),
+        'label': str(entry.get('label', '')),
+        'type': entry.get('type', 'internal'),
+        'buyer': entry['buyer'],
+        'seller': entry['seller'],
+        'energy': _optional_float(entry.get('energy')),
+        'price': _optional_float(entry.get('price')),
+        'amount': str(amount),
+    }
+
+
+def leaf_hash(entry: Dict[str, Any], decimals: int = TOKEN_DECIMALS) -> bytes:
+    """账本条目的叶子哈希：对规范形式的JSON（键排序、无空白）做 keccak256"""
+    canonical = json.dumps(canonical_record(entry, decimals), sort_keys=True, separators=(',', ':'),
+                           ensure_ascii=False)
+    return bytes(Web3.keccak(text=canonical))
+
+
+def _hash_pair(a: bytes, b: bytes) -> bytes:
+    # 与 OpenZeppelin MerkleProof 一致：两个子节点排序后拼接
+    return bytes(Web3.keccak(a + b if a < b else b + a))
+
+
+def merkle_levels(leaves: List[bytes]) -> List[List[bytes]]:
+    """自底向上构建所有层，奇数个节点时最后一个直接上提"""
+    if not leaves:
+        return [[bytes(32)]]
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        parent = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parent.append(level[-1])
+        levels.append(parent)
+    return levels
+
+
+def merkle_root(leaves: List[bytes]) -> bytes:
+    """Merkle 根"""
+    return merkle_levels(leaves)[-1][0]
+
+
+def merkle_proof(levels: List[List[bytes]], index: int) -> List[bytes]:
+    """
+    第 index 个叶子的包含证明
+
+    Args:
+        levels: merkle_levels 的结果
+        index: 叶子下标
+
+    Returns:
+        自底向上的兄弟节点哈希列表
+    """
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+
+def verify_proof(leaf: bytes, proof: List[bytes], root: bytes) -> bool:
+    """校验包含证明"""
+    node = leaf
+    for sibling in proof:
+        node = _hash_pair(node, sibling)
+    return node == root
+
+
+class SettlementCompressor:
+    """
+    一天账本的结算压缩结果
+
+    - transfers: 上链的轧差转账（付款方, 收款方, 金额）
+    - root: 原始账本的 Merkle 根，可写入链上交易描述或单独存证
+    """
+
+    def __init__(self, ledger: List[Dict[str, Any]], mode: str = 'minimal', decimals: int = TOKEN_DECIMALS,
+                 settled_types: Iterable[str] = SETTLED_TYPES):
+        """
+        Args:
+            ledger: 账本条目（web/app.js simulate() 的 ledger 格式），全部进入 Merkle 承诺；
+                    也可以是 ColumnarLedger（轧差按列计算）；两种输入的 Merkle 叶子都由
+                    canonical_record() 生成，同一账本得到相同的根
+            mode: 'minimal' 按净头寸求最少转账；'pairwise' 按交易对轧差
+            decimals: 代币精度
+            settled_types: 参与链上轧差的条目类型
+        """
+        if mode not in ('minimal', 'pairwise'):
+            raise ValueError(f"未知的压缩模式: {mode}")
+
+        columnar = ledger if isinstance(ledger, ColumnarLedger) else None
+        if columnar is not None:
+            decimals = columnar.decimals
+            # 附带链上整数金额，链上读回的记录不经浮点换算
+            ledger = [dict(entry, amount_units=limbs_to_int(units))
+                      for entry, units in zip(columnar.to_records(), columnar.units())]
+        self.ledger = ledger
+        self.mode = mode
+        self.decimals = decimals
+        settled_types = set(settled_types)
+        self.settled = [entry for entry in ledger if entry.get('type', 'internal') in settled_types]
+        if columnar is not None:
+            self.positions = columnar.net_positions(settled_types)
+        else:
+            self.positions = net_positions(self.settled, decimals)
+        if mode == 'minimal':
+            self.transfers = minimize_transfers(self.positions)
+        elif columnar is not None:
+            self.transfers = columnar.net_by_pair(settled_types)
+        else:
+            self.transfers = net_by_pair(self.settled, decimals)
+        self._levels = merkle_levels([leaf_hash(entry, decimals) for entry in ledger])
+
+    @property
+    def root(self) -> str:
+        """原始账本 Merkle 根（0x开头的十六进制）"""
+        return '0x' + self._levels[-1][0].hex()
+
+    def proof(self, index: int) -> List[str]:
+        """第 index 条原始账本条目的包含证明"""
+        return ['0x' + h.hex() for h in merkle_proof(self._levels, index)]
+
+    def verify(self, entry: Dict[str, Any], proof: List[str]) -> bool:
+        """校验一条原始账本条目是否包含在承诺中"""
+        return verify_proof(leaf_hash(entry, self.decimals), [bytes.fromhex(h[2:]) for h in proof],
+                            self._levels[-1][0])
+
+    def check_balanced(self) -> bool:
+        """校验轧差转账与原始账本的净头寸完全一致"""
+        replay: Dict[str, int] = defaultdict(int)
+        for payer, payee, amount in self.transfers:
+            replay[payer] -= amount
+            replay[payee] += amount
+        return all(replay.get(name, 0) == amount for name, amount in self.positions.items()) \
+            and all(self.positions.get(name, 0) == amount for name, amount in replay.items())
+
+    def description(self, label: str = 'P2P settlement') -> str:
+        """链上交易描述：附带原始账本条数与 Merkle 根，便于对账"""
+        return f"{label} n={len(self.ledger)} root={self.root}"
+
+    def commitment(self) -> Dict[str, Any]:
+        """可保存的审计承诺（包含原始条目，便于日后重算证明）"""
+        return {
+            'root': self.root,
+            'leaf_hash': 'keccak256(canonical_json(canonical_record))',
+            'mode': self.mode,
+            'decimals': self.decimals,
+            'entries': self.ledger,
+            'transfers': [[payer, payee, str(amount)] for payer, payee, amount in self.transfers],
+        }
+
+    def save_commitment(self, path: str):
+        """把审计承诺写入JSON文件"""
+        with open(path, 'w') as f:
+            json.dump(self.commitment(), f, ensure_ascii=False, indent=2)
+
+    def stats(self) -> Dict[str, int]:
+        """压缩前后的转账笔数"""
+        return {
+            'ledger_entries': len(self.ledger),
+            'settled_entries': len(self.settled),
+            'transfers': len(self.transfers),
+            'payers': len({payer for payer, _, _ in self.transfers}),
+        }
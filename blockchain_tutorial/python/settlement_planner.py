@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量结算规划器
+把任意长度的结算清单按gas估算拆分成若干个 batchTransfer 交易（每块不超过区块gas上限），
+流水线提交，并把进度写入本地文件：进程中途崩溃后可以续跑，且不会重复付款。
+"""
+
+import hashlib
+import json
+import math
+import os
+import time
+from decimal import Decimal
+from typing import List, Dict, Any, Optional, Tuple
+
+from web3 import Web3
+
+from blockchain_client import BlockchainClient, is_nonce_error
+
+# ganache-config.json 中的区块gas上限
+DEFAULT_BLOCK_GAS_LIMIT = 6721975
+
+# 批量转账的gas上限相对 eth_estimateGas 估算值的放大倍数
+GAS_SAFETY_MARGIN = 1.15
+
+TOKEN_DECIMALS = 18
+
+PROGRESS_VERSION = 1
+
+
+def to_token_units(amount, decimals: int = TOKEN_DECIMALS) -> int:
+    """把以代币为单位的金额（如 SLR 浮点数）换算成链上最小单位整数"""
+    return int((Decimal(str(amount)) * (10 ** decimals)).to_integral_value())
+
+
+def payouts_from_ledger(ledger: List[Dict[str, Any]], address_book: Dict[str, str],
+                        decimals: int = TOKEN_DECIMALS) -> List[Tuple[str, int]]:
+    """
+    把 web/app.js simulate() 生成的账本中的内部交易转换成付给卖方的结算清单
+
+    Args:
+        ledger: 账本条目（time、type、buyer、seller、energy、price、amount）
+        address_book: prosumer 名称 -> 链上地址
+        decimals: 代币精度
+
+    Returns:
+        (接收方地址, 金额) 列表
+    """
+    return [
+        (address_book[entry['seller']], to_token_units(entry['amount'], decimals))
+        for entry in ledger
+        if entry.get('type') == 'internal'
+    ]
+
+
+def settlement_digest(payouts: List[Tuple[str, int]], description: str) -> str:
+    """结算清单的摘要，用于确认续跑时输入没有变化"""
+    h = hashlib.sha256(description.encode())
+    for address, amount in payouts:
+        h.update(f"{address.lower()}:{amount};".encode())
+    return h.hexdigest()
+
+
+class SettlementPlanner:
+    """
+    批量结算规划器
+
+    1. 用两次 eth_estimateGas 拟合「固定开销 + 每个接收方开销」的gas模型
+    2. 按模型把清单均匀切分成不超过区块gas上限（乘以填充比例）的块，
+       再用一次批量 eth_estimateGas 复核每块，超限的块继续对半拆分
+    3. 先为所有待提交的块分配nonce并签名，把原始交易写入进度文件，再流水线发送
+    4. 续跑时已签名的块只会重播同一笔原始交易（同一nonce），链上最多执行一次
+    """
+
+    def __init__(self, client: BlockchainClient, progress_path: str, description: str = "P2P settlement",
+                 block_gas_limit: Optional[int] = None, fill_ratio: float = 0.9,
+                 safety_margin: float = GAS_SAFETY_MARGIN):
+        """
+        Args:
+            client: 已加载账户和合约的 BlockchainClient
+            progress_path: 进度文件路径（JSON）
+            description: 写入链上交易记录的描述，会附加块序号
+            block_gas_limit: 区块gas上限，默认读取最新区块
+            fill_ratio: 单笔交易最多占用区块gas上限的比例
+            safety_margin: gas上限相对估算值的放大倍数
+        """
+        if not client.contract:
+            raise Exception("合约未加载")
+        if not client.account:
+            raise Exception("账户未加载")
+
+        self.client = client
+        self.progress_path = progress_path
+        self.description = description
+        self.fill_ratio = fill_ratio
+        self.safety_margin = safety_margin
+        if block_gas_limit is None:
+            block_gas_limit = self.w3.eth.get_block('latest')['gasLimit'] or DEFAULT_BLOCK_GAS_LIMIT
+        self.block_gas_limit = block_gas_limit
+
+    @property
+    def w3(self):
+        """客户端当前的 Web3 实例（enable_metrics 后会替换）"""
+        return self.client.w3
+
+    @property
+    def gas_cap(self) -> int:
+        """单笔批量转账允许使用的gas上限"""
+        return int(self.block_gas_limit * self.fill_ratio)
+
+    def _chunk_description(self, index: int, total: int) -> str:
+        return f"{self.description} [{index + 1}/{total}]"
+
+    @staticmethod
+    def _batch_args(payouts: List[Tuple[str, int]], description: str) -> list:
+        return [[Web3.to_checksum_address(a) for a, _ in payouts], [int(v) for _, v in payouts], description]
+
+    def _batch_call(self, payouts: List[Tuple[str, int]], description: str):
+        return self.client.contract.functions.batchTransfer(*self._batch_args(payouts, description))
+
+    def _estimate_many(self, groups: List[List[Tuple[str, int]]], description: str) -> List[Optional[int]]:
+        sender = self.client.account.address
+        requests = []
+        for group in groups:
+            data = self.client.contract.encodeABI(fn_name='batchTransfer', args=self._batch_args(group, description))
+            requests.append(('eth_estimateGas', [{'from': sender, 'to': self.client.contract_address, 'data': data}]))
+        estimates = []
+        for response in self.client.rpc_batch(requests):
+            estimates.append(int(response['result'], 16) if 'result' in response else None)
+        return estimates
+
+    def estimate_gas_model(self, payouts: List[Tuple[str, int]], sample_size: int = 8) -> Tuple[int, float]:
+        """
+        拟合批量转账的gas模型
+
+        Args:
+            payouts: 结算清单
+            sample_size: 用于拟合的接收方数量
+
+        Returns:
+            (固定开销, 每个接收方的开销)
+        """
+        k = max(2, min(sample_size, len(payouts)))
+        sample = (payouts * k)[:k] if len(payouts) < k else payouts[:k]
+        description = self._chunk_description(0, 1)
+        one, many = self._estimate_many([sample[:1], sample], description)
+        if one is None or many is None:
+            raise Exception("gas估算失败，请检查余额和接收方地址")
+        per_recipient = (many - one) / (k - 1)
+        return max(0, int(one - per_recipient)), per_recipient
+
+    def plan(self, payouts: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        """
+        把结算清单切分成批量转账块
+
+        Args:
+            payouts: (接收方地址, 金额) 列表
+
+        Returns:
+            块列表（start/end 为清单下标区间，gas 为该块交易的gas上限）
+        """
+        if not payouts:
+            return []
+
+        base, per_recipient = self.estimate_gas_model(payouts)
+        budget = self.gas_cap / self.safety_margin
+        max_per_chunk = max(1, int((budget - base) // per_recipient)) if per_recipient > 0 else len(payouts)
+        n_chunks = math.ceil(len(payouts) / max_per_chunk)
+        size = math.ceil(len(payouts) / n_chunks)
+        ranges = [(start, min(start + size, len(payouts))) for start in range(0, len(payouts), size)]
+
+        # 用真实的 eth_estimateGas 复核，超过上限的块对半拆分
+        while True:
+            description = self._chunk_description(len(ranges) - 1, len(ranges))
+            estimates = self._estimate_many([payouts[s:e] for s, e in ranges], description)
+            refined = []
+            changed = False
+            for (start, end), estimate in zip(ranges, estimates):
+                if estimate is None:
+                    raise Exception(f"清单第 {start}-{end} 项gas估算失败")
+                if estimate * self.safety_margin > self.gas_cap and end - start > 1:
+                    middle = (start + end) // 2
+                    refined.extend([(start, middle), (middle, end)])
+                    changed = True
+                else:
+                    refined.append((start, end, estimate))
+            if not changed:
+                break
+            ranges = [(r[0], r[1]) for r in refined]
+
+        return [
+            {
+                'index': i,
+                'start': start,
+                'end': end,
+                'recipients': end - start,
+                'total_amount': str(sum(v for _, v in payouts[start:end])),
+                'gas': min(self.gas_cap, int(estimate * self.safety_margin)),
+                'status': 'planned',
+                'nonce': None,
+                'tx_hash': None,
+                'raw_tx': None,
+                'block_number': None,
+            }
+            for i, (start, end, estimate) in enumerate(refined)
+        ]
+
+    # ------------------------------------------------------------------
+    # 进度文件
+    # ------------------------------------------------------------------
+
+    def load_progress(self) -> Optional[Dict[str, Any]]:
+        """读取进度文件，不存在时返回None"""
+        if not os.path.exists(self.progress_path):
+            return None
+        with open(self.progress_path, 'r') as f:
+            return json.load(f)
+
+    def save_progress(self, progress: Dict[str, Any]):
+        """原子地写入进度文件（先写临时文件并落盘，再替换）"""
+        progress['updated_at'] = time.time()
+        tmp_path = self.progress_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.progress_path)
+
+    # ------------------------------------------------------------------
+    # 执行
+    # ------------------------------------------------------------------
+
+    def _reconcile(self, progress: Dict[str, Any], retry_failed: bool):
+        """续跑时核对已签名块的链上状态"""
+        in_flight = [c for c in progress['chunks'] if c['status'] in ('signed', 'sent')]
+        if in_flight:
+            responses = self.client.rpc_batch([('eth_getTransactionReceipt', [c['tx_hash']]) for c in in_flight])
+            for chunk, response in zip(in_flight, responses):
+                receipt = response.get('result')
+                if receipt:
+                    self._apply_receipt(chunk, int(receipt['status'], 16), int(receipt['blockNumber'], 16))
+                    continue
+                # 未上链：原样重播同一笔已签名交易
+                try:
+                    self.w3.eth.send_raw_transaction(chunk['raw_tx'])
+                    chunk['status'] = 'sent'
+                except Exception as e:
+                    message = str(e).lower()
+                    if 'already known' in message or 'known transaction' in message:
+                        chunk['status'] = 'sent'
+                    elif is_nonce_error(e):
+                        self._resolve_nonce_conflict(chunk)
+                    else:
+                        raise
+
+        if retry_failed:
+            for chunk in progress['chunks']:
+                if chunk['status'] == 'failed':
+                    chunk['status'] = 'planned'
+
+    def _resolve_nonce_conflict(self, chunk: Dict[str, Any]):
+        """重播时nonce已被使用：区分「本块已在交易池/已上链」与「nonce被其他交易占用」"""
+        tx_lookup, receipt_lookup = self.client.rpc_batch([
+            ('eth_getTransactionByHash', [chunk['tx_hash']]),
+            ('eth_getTransactionReceipt', [chunk['tx_hash']]),
+        ])
+        receipt = receipt_lookup.get('result')
+        if receipt:
+            self._apply_receipt(chunk, int(receipt['status'], 16), int(receipt['blockNumber'], 16))
+        elif tx_lookup.get('result'):
+            chunk['status'] = 'sent'
+        elif self.w3.eth.get_transaction_count(self.client.account.address, 'latest') > chunk['nonce']:
+            # 该nonce已被其他交易上链占用，本块不可能再执行，重新签名提交是安全的
+            chunk['status'] = 'planned'
+        else:
+            raise Exception(f"第 {chunk['index'] + 1} 块状态无法确定，请稍后重试续跑")
+
+    @staticmethod
+    def _apply_receipt(chunk: Dict[str, Any], status: int, block_number: int):
+        chunk['status'] = 'confirmed' if status == 1 else 'failed'
+        chunk['block_number'] = block_number
+
+    def run(self, payouts: List[Tuple[str, int]], wait: bool = True, retry_failed: bool = False,
+            timeout: int = 300) -> Dict[str, Any]:
+        """
+        执行（或续跑）结算
+
+        Args:
+            payouts: (接收方地址, 金额) 列表
+            wait: 是否等待所有块确认
+            retry_failed: 续跑时是否重新提交链上执行失败的块
+            timeout: 等待确认的超时时间（秒）
+
+        Returns:
+            进度记录
+        """
+        digest = settlement_digest(payouts, self.description)
+        progress = self.load_progress()
+        if progress is not None:
+            if progress['digest'] != digest:
+                raise ValueError(f"进度文件 {self.progress_path} 对应的是另一份结算清单")
+            print(f"🔁 从进度文件续跑: {self.progress_path}")
+            self._reconcile(progress, retry_failed)
+        else:
+            chunks = self.plan(payouts)
+            progress = {
+                'version': PROGRESS_VERSION,
+                'digest': digest,
+                'description': self.description,
+                'contract': self.client.contract_address,
+                'sender': self.client.account.address,
+                'payouts': len(payouts),
+                'block_gas_limit': self.block_gas_limit,
+                'created_at': time.time(),
+                'chunks': chunks,
+            }
+            print(f"📋 {len(payouts)} 笔结算拆分为 {len(chunks)} 个批量转账")
+
+        chunks = progress['chunks']
+        to_sign = [c for c in chunks if c['status'] == 'planned']
+        if to_sign:
+            first_nonce = self.client.nonce_manager.allocate(len(to_sign))
+            for offset, chunk in enumerate(to_sign):
+                call = self._batch_call(payouts[chunk['start']:chunk['end']],
+                                        self._chunk_description(chunk['index'], len(chunks)))
+                signed = self.client.sign_contract_transaction(call, chunk['gas'], first_nonce + offset)
+                chunk.update(status='signed', nonce=first_nonce + offset,
+                             tx_hash=signed.hash.hex(), raw_tx=signed.rawTransaction.hex())
+            # 先落盘再发送：崩溃后续跑只会重播这些原始交易
+            self.save_progress(progress)
+
+        for chunk in to_sign:
+            try:
+                self.w3.eth.send_raw_transaction(chunk['raw_tx'])
+                chunk['status'] = 'sent'
+            except Exception as e:
+                self.save_progress(progress)
+                # 后面的块没有发出：在途交易结束后重新与节点对齐
+                self.client.nonce_manager.invalidate()
+                raise Exception(f"第 {chunk['index'] + 1} 块发送失败（可续跑）: {e}")
+        if to_sign:
+            self.client.nonce_manager.commit()
+        self.save_progress(progress)
+
+        if wait:
+            sent = [c for c in chunks if c['status'] == 'sent']
+            if sent:
+                receipts = self.client.confirmation_tracker.wait([c['tx_hash'] for c in sent], timeout=timeout)
+                for chunk, receipt in zip(sent, receipts):
+                    self._apply_receipt(chunk, receipt['status'], receipt['blockNumber'])
+                self.save_progress(progress)
+
+        summary = self.summary(progress)
+        print(f"✅ 已确认 {summary['confirmed']}/{summary['chunks']} 块，"
+              f"失败 {summary['failed']} 块，待确认 {summary['pending']} 块")
+        return progress
+
+    @staticmethod
+    def summary(progress: Dict[str, Any]) -> Dict[str, int]:
+        """按状态统计块数与已确认的接收方数"""
+        chunks = progress['chunks']
+        return {
+            'chunks': len(chunks),
+            'confirmed': sum(1 for c in chunks if c['status'] == 'confirmed'),
+            'failed': sum(1 for c in chunks if c['status'] == 'failed'),
+            'pending': sum(1 for c in chunks if c['status'] in ('planned', 'signed', 'sent')),
+            'paid_recipients': sum(c['recipients'] for c in chunks if c['status'] == 'confirmed'),
+        }
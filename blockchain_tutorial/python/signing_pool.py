@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行交易签名池
+secp256k1 签名和RLP编码是纯CPU计算，去掉RPC延迟后会成为大批量结算的瓶颈。
+签名池把已分配nonce的未签名交易分块交给进程池签名：私钥只在每个工作进程启动时传入一次，
+任务里只有交易字段；结果按提交顺序返回，发送方可以边签名边发送。
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_CHUNK_SIZE = 64
+
+# 工作进程内的账户（由 _init_worker 设置，只在池的工作进程中使用；进程内签名用各池自己的账户）
+_worker_account = None
+
+
+def _init_worker(private_key: bytes):
+    global _worker_account
+    from eth_account import Account
+
+    _worker_account = Account.from_key(private_key)
+
+
+def _sign_with(account, transactions: List[Dict[str, Any]]) -> List[Tuple[str, bytes]]:
+    signed = (account.sign_transaction(tx) for tx in transactions)
+    return [(s.hash.hex(), bytes(s.rawTransaction)) for s in signed]
+
+
+def _sign_chunk(transactions: List[Dict[str, Any]]) -> List[Tuple[str, bytes]]:
+    """在工作进程内签名一块交易，返回 (交易哈希, 原始交易)"""
+    return _sign_with(_worker_account, transactions)
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class SigningPool:
+    """
+    交易签名池
+
+    workers 为1时在当前进程内签名（不启动子进程），便于与多进程结果对比。
+    """
+
+    def __init__(self, private_key, workers: int = 4, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            private_key: 签名私钥（只在每个工作进程启动时传递一次）
+            workers: 工作进程数
+            chunk_size: 每个任务包含的交易数（越大调度开销越小，但首批结果返回越晚）
+        """
+        from eth_account import Account
+
+        account = Account.from_key(private_key)
+        self.address = account.address
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._account = account
+        self._executor: Optional[ProcessPoolExecutor] = None
+        if workers > 1:
+            self._executor = ProcessPoolExecutor(workers, initializer=_init_worker,
+                                                 initargs=(bytes(account.key),))
+
+    def warm_up(self):
+        """提前启动全部工作进程（否则第一次签名时才启动，计入首批延迟）"""
+        if self._executor is not None:
+            list(self._executor.map(_sign_chunk, [[]] * self.workers))
+
+    def sign_iter(self, transactions: Iterable[Dict[str, Any]]) -> Iterator[List[Tuple[str, bytes]]]:
+        """
+        分块并行签名，按提交顺序逐块产出
+
+        Args:
+            transactions: 未签名交易（已包含 nonce、gas、gasPrice、chainId）
+
+        Yields:
+            每块的 (交易哈希, 原始交易) 列表
+        """
+        chunks = _chunks(transactions, self.chunk_size)
+        if self._executor is None:
+            yield from (_sign_with(self._account, chunk) for chunk in chunks)
+        else:
+            # executor.map 会先提交全部任务，再按顺序返回结果
+            yield from self._executor.map(_sign_chunk, chunks)
+
+    def sign(self, transactions: Iterable[Dict[str, Any]]) -> List[Tuple[str, bytes]]:
+        """签名全部交易，返回与输入顺序一致的 (交易哈希, 原始交易) 列表"""
+        return [signed for chunk in self.sign_iter(transactions) for signed in chunk]
+
+    def close(self):
+        """关闭工作进程"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self) -> "SigningPool":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
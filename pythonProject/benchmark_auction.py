@@ -0,0 +1,47 @@
+# 双边拍卖订单簿基准：每个时段 10^5 级订单时集合竞价（向量化）与连续竞价（堆）的单时段撮合耗时
+import argparse
+import time
+
+import numpy as np
+
+import p2p
+
+
+def make_orders(orders, intervals, seed=0):
+    """随机生成 intervals 个时段、每个时段 orders 张限价单（买卖各半，价格在上网电价与外购电价之间）"""
+    rng = np.random.default_rng(seed)
+    size = orders * intervals
+    return {
+        "time": np.repeat(np.arange(intervals), orders),
+        "side": (rng.random(size) < 0.5).astype(np.int8),
+        "owner": np.tile(np.arange(orders), intervals),
+        "price": np.round(rng.uniform(0.08, 0.30, size), 3),
+        "quantity": rng.uniform(0.01, 0.5, size),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="双边拍卖订单簿基准")
+    parser.add_argument("--orders", type=int, nargs="+", default=[10_000, 100_000, 300_000], help="每个时段的订单数")
+    parser.add_argument("--intervals", type=int, default=3, help="每种规模撮合的时段数")
+    parser.add_argument("--continuous-max", type=int, default=100_000, help="连续竞价只跑到这个规模")
+    args = parser.parse_args()
+
+    prices = p2p.external_prices(args.intervals)
+    print(f"📊 每种规模 {args.intervals} 个时段，5 分钟市场每个时段的时间预算为 300 s")
+    for n in args.orders:
+        orders = make_orders(n, args.intervals)
+        print(f"  {n:,} 张/时段")
+        for mode, rule in (("periodic", "uniform"), ("periodic", "pay_as_bid"), ("continuous", "uniform")):
+            if mode == "continuous" and n > args.continuous_max:
+                continue
+            start = time.perf_counter()
+            result = p2p.clear_double_auction(orders, mode=mode, rule=rule, price_buy=prices["buy"])
+            seconds = (time.perf_counter() - start) / args.intervals
+            internal = int(np.count_nonzero(result["ledger"]["type"] == p2p.LEDGER_INTERNAL)) // args.intervals
+            label = "连续竞价" if mode == "continuous" else f"集合竞价({rule})"
+            print(f"    {label:<22} {seconds * 1000:8.1f} ms/时段  {internal:>8,} 笔内部成交")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# P2P 撮合引擎基准：逐步循环（JS simulate() 的直接移植）对比 p2p.match_proportional 向量化版本
+import argparse
+import time
+
+import numpy as np
+
+import p2p
+
+
+def match_loop(pv, load, price_internal, price_buy, price_sell, start_balance=p2p.START_BAL):
+    """逐步、逐个买卖方的参考实现（与 web/app.js simulate() 的循环结构相同），只用于对照"""
+    n, steps = pv.shape
+    wallet = [float(start_balance)] * n
+    ledger = []
+    for t in range(steps):
+        net = [pv[i][t] - load[i][t] for i in range(n)]
+        sellers = [(i, e) for i, e in enumerate(net) if e > 0]
+        buyers = [(i, -e) for i, e in enumerate(net) if e < 0]
+        supply = sum(e for _, e in sellers)
+        demand = sum(e for _, e in buyers)
+        matched = min(supply, demand)
+        s_alloc = [[i, e * matched / supply if supply > 0 else 0] for i, e in sellers]
+        b_alloc = [[i, e * matched / demand if demand > 0 else 0] for i, e in buyers]
+        si = bi = 0
+        while si < len(s_alloc) and bi < len(b_alloc):
+            s, b = s_alloc[si], b_alloc[bi]
+            m = min(s[1], b[1])
+            if m <= p2p.MATCH_EPS:
+                if s[1] <= p2p.MATCH_EPS:
+                    si += 1
+                if b[1] <= p2p.MATCH_EPS:
+                    bi += 1
+                continue
+            amt = m * price_internal[t]
+            wallet[s[0]] += amt
+            wallet[b[0]] -= amt
+            ledger.append((t, b[0], s[0], m, amt))
+            s[1] -= m
+            b[1] -= m
+            if s[1] <= p2p.MATCH_EPS:
+                si += 1
+            if b[1] <= p2p.MATCH_EPS:
+                bi += 1
+        for i, e in sellers:
+            export_e = e - (e * matched / supply if supply > 0 else 0)
+            if export_e > 0:
+                wallet[i] += export_e * price_sell[t]
+        for i, e in buyers:
+            import_e = e - (e * matched / demand if demand > 0 else 0)
+            if import_e > 0:
+                wallet[i] -= import_e * price_buy[t]
+                ledger.append((t, i, p2p.GRID, import_e, import_e * price_buy[t]))
+    return wallet, ledger
+
+
+def make_inputs(prosumers, days, seed=0):
+    """随机生成 prosumer 的光伏容量、云量与日用电量，返回 float32 的 (N, steps) 输入与电价（逐天生成以控制内存）"""
+    rng = np.random.default_rng(seed)
+    kwp = rng.uniform(0, 6, prosumers)
+    cloud = rng.uniform(0.05, 0.3, prosumers)
+    load_day = p2p.demand_series(rng.uniform(5, 40, prosumers)).astype(np.float32)
+    pv = np.empty((prosumers, days * p2p.T), dtype=np.float32)
+    load = np.empty_like(pv)
+    for d in range(days):
+        day = slice(d * p2p.T, (d + 1) * p2p.T)
+        pv[:, day] = p2p.pv_profiles(kwp, cloud, rng=rng)
+        load[:, day] = load_day
+    return pv, load, p2p.external_prices(days * p2p.T)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="P2P 按比例撮合引擎基准")
+    parser.add_argument("--prosumers", type=int, nargs="+", default=[100, 1000, 3000])
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--loop-days", type=int, default=2, help="循环参考实现只跑这么多天（再按比例外推）")
+    parser.add_argument("--ledger", action="store_true", help="向量化版本同时生成逐笔账本")
+    args = parser.parse_args()
+
+    for n in args.prosumers:
+        pv, load, prices = make_inputs(n, args.days)
+        start = time.perf_counter()
+        result = p2p.match_proportional(pv, load, prices["mid"], prices["buy"], prices["sell"], ledger=args.ledger)
+        vec_seconds = time.perf_counter() - start
+
+        loop_steps = args.loop_days * p2p.T
+        pv_l = pv[:, :loop_steps].astype(float)
+        load_l = load[:, :loop_steps].astype(float)
+        start = time.perf_counter()
+        wallet, _ = match_loop(pv_l, load_l, prices["mid"], prices["buy"], prices["sell"])
+        loop_seconds = (time.perf_counter() - start) * args.days / args.loop_days
+
+        check = p2p.match_proportional(pv_l, load_l, prices["mid"][:loop_steps], prices["buy"][:loop_steps],
+                                       prices["sell"][:loop_steps], ledger=False)
+        diff = np.abs(check["wallet_end"] - np.array(wallet)).max()
+        rows = f"，账本 {len(result['ledger']['time']):,} 条" if args.ledger else ""
+        print(f"📊 {n} 个 prosumer × {args.days} 天（{pv.shape[1]:,} 步）{rows}")
+        print(f"  向量化: {vec_seconds:8.2f} s   循环(外推): {loop_seconds:10.1f} s   "
+              f"加速 {loop_seconds / vec_seconds:,.0f}x   钱包最大偏差 {diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,8 +7,1681 @@ def calculate_average(numbers):
         total += num
     return total / len(numbers)
 
-# 测试：当传入空列表时不会报错
-print(calculate_average([]))
 
+# ----------------------------------------------------------------------
+# P2P 按比例撮合引擎（web/app.js simulate() 的向量化版本）
+# ----------------------------------------------------------------------
+# 所有输入都是 (prosumer × 步长) 的数组，按时间分块一次处理一整块步长，
+# 不在 Python 层逐步、逐个买卖方循环；结果与浏览器中的 JS 参考实现一致。
 
+import csv
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # 没有 pyarrow 时场景结果写成 CSV
+    pa = None
+    pq = None
+
+# MILP 求解后端均为可选依赖：highspy / scipy（开源 HiGHS）、gurobipy（需要 license）
+try:
+    import scipy.sparse as sp
+    from scipy.optimize import Bounds, LinearConstraint, milp
+except ImportError:
+    sp = None
+    milp = None
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+try:
+    import gurobipy as gp
+except ImportError:
+    gp = None
+
+T = 288  # 24h / 5min
+DT_H = 5 / 60  # 每个步长的小时数
+NAMES = ["P1", "P2", "P3", "P4"]
+START_BAL = 100  # 初始钱包余额（SLR）
+DEFAULT_DEMANDS = [20, 18, 12, 8]  # 默认日用电量（kWh）
+PV_CAP = [3.0, 2.0, 4.0, 1.0]  # 光伏峰值容量（kW）
+
+# 与 JS 中 rem <= 1e-12 的判断一致：更小的配对视为浮点误差
+MATCH_EPS = 1e-12
+
+# 账本 type 列的编码
+LEDGER_INTERNAL = 0
+LEDGER_IMPORT = 1
+GRID = -1  # 账本中卖方为电网时的编号
+
+USER_FIELDS = (
+    "pv", "load", "internal_buy", "internal_sell", "external_import", "external_export",
+    "pay_internal", "earn_internal", "pay_external", "earn_external",
+)
+
+
+def time_labels(steps=T):
+    """每个步长的 HH:MM 标签（超过一天时按天循环）"""
+    return [f"{(t % T) * 5 // 60:02d}:{(t % T) * 5 % 60:02d}" for t in range(steps)]
+
+
+def base_load_shape(steps=T):
+    """单位面积的日负荷曲线：早高峰 + 更高的晚高峰"""
+    t = np.arange(T)
+    shape = np.zeros(T)
+    for center, width, amp in ((7 * 12, 18, 1.0), (20 * 12, 30, 2.0)):
+        x = t - center
+        shape += amp * np.exp(-(x * x) / (2 * width * width))
+    # 顺序累加（与 JS reduce 相同），两边的曲线在浮点舍入误差内相等
+    area = np.cumsum(shape * DT_H)[-1]
+    shape = shape / area if area > 0 else shape
+    return np.resize(shape, steps)
+
+
+def pv_profiles(kwp, cloud, steps=T, rng=None, noise=None):
+    """
+    中午为峰值的钟形光伏曲线，带每个用户独立的云量扰动
+
+    Args:
+        kwp: 各用户光伏峰值容量（kW），长度 N
+        cloud: 各用户云量扰动幅度，长度 N
+        steps: 步长数
+        rng: numpy 随机数生成器（noise 为空时使用）
+        noise: (N, steps) 的 [0, 1) 随机数，给定时不再随机采样（用于复现）
+
+    Returns:
+        (N, steps) 每步发电量（kWh）
+    """
+    kwp = np.asarray(kwp, dtype=float)[:, None]
+    cloud = np.asarray(cloud, dtype=float)[:, None]
+    if noise is None:
+        rng = rng if rng is not None else np.random.default_rng()
+        noise = rng.random((kwp.shape[0], steps))
+    t = np.arange(steps) % T
+    sun = np.maximum(0, np.exp(-((t - 12 * 12) ** 2) / (2 * 38 ** 2)) - 0.08)
+    kw = np.maximum(0, kwp * sun * (1 + (noise * 2 - 1) * cloud))
+    return kw * DT_H
+
+
+def external_prices(steps=T):
+    """分时电价（SLR/kWh）：buy 为从电网购电价，sell 为上网电价，mid 为内部结算价"""
+    hour = (np.arange(steps) % T) * 5 // 60
+    buy = np.where((hour >= 17) & (hour <= 21), 0.28, np.where((hour >= 10) & (hour <= 16), 0.18, 0.12))
+    sell = np.minimum(0.10, 0.6 * buy)
+    return {"buy": buy, "sell": sell, "mid": 0.5 * (buy + sell)}
+
+
+def demand_series(total_kwh, steps=T):
+    """由每个用户的日用电量生成 (N, steps) 负荷序列"""
+    return np.asarray(total_kwh, dtype=float)[:, None] * base_load_shape(steps)
+
+
+def _pair_trades(s_share, b_share, t0):
+    """
+    一个时间块内的买卖方配对（等价于 JS 的两指针循环）
+
+    每个步长内把卖方、买方的分配量按用户顺序各自累加成区间，
+    两组区间端点合并排序后，相邻端点之间的每一段恰好属于一个卖方和一个买方。
+    """
+    st, si = np.nonzero(s_share.T > 0)
+    bt, bi = np.nonzero(b_share.T > 0)
+    if len(st) == 0 or len(bt) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty, np.zeros(0)
+
+    s_end = np.cumsum(s_share, axis=0)[si, st]
+    b_end = np.cumsum(b_share, axis=0)[bi, bt]
+    steps = np.concatenate([st, bt])
+    ends = np.concatenate([s_end, b_end])
+    is_seller = np.concatenate([np.ones(len(st), dtype=bool), np.zeros(len(bt), dtype=bool)])
+
+    order = np.lexsort((ends, steps))
+    steps, ends, is_seller = steps[order], ends[order], is_seller[order]
+
+    # 每段起点：同一步长内的上一个端点，步长的第一段从0开始
+    starts = np.empty_like(ends)
+    starts[0] = 0.0
+    starts[1:] = ends[:-1]
+    starts[1:][steps[1:] != steps[:-1]] = 0.0
+    energy = ends - starts
+
+    # 该段之前已经走完的卖方/买方个数，就是当前卖方/买方的全局序号
+    s_idx = np.cumsum(is_seller) - is_seller
+    b_idx = np.cumsum(~is_seller) - ~is_seller
+    valid = (energy > MATCH_EPS) & (s_idx < len(st)) & (b_idx < len(bt))
+    s_idx, b_idx = s_idx[valid], b_idx[valid]
+    steps, energy = steps[valid], energy[valid]
+    # 步长末尾两侧端点的舍入误差会产生跨步长的碎段，丢弃
+    same_step = (st[s_idx] == steps) & (bt[b_idx] == steps)
+    return (steps[same_step] + t0, bi[b_idx[same_step]], si[s_idx[same_step]], energy[same_step])
+
+
+def match_proportional(pv, load, price_internal, price_buy, price_sell, start_balance=START_BAL,
+                       ledger=True, chunk_steps=None):
+    """
+    按比例撮合：每个步长内卖方余电与买方缺电按比例匹配，剩余部分与电网交易
+
+    Args:
+        pv: (N, steps) 每步光伏发电量（kWh）
+        load: (N, steps) 每步负荷（kWh）
+        price_internal: (steps,) 内部结算价
+        price_buy: (steps,) 电网购电价
+        price_sell: (steps,) 上网电价
+        start_balance: 初始钱包余额（标量或长度 N）
+        ledger: 是否生成逐笔账本（大规模仿真时可关闭以节省内存）
+        chunk_steps: 每次处理的步长数，控制临时数组大小（默认每块约五十万个元素，留在缓存里更快）
+
+    Returns:
+        结果字典：社区逐步序列、用户汇总、钱包余额，以及列式账本
+        （time、type、buyer、seller、energy、price、amount 各为一个数组，seller 为 GRID 表示电网）
+    """
+    # 输入可以是 float32 等紧凑类型，按块转换成 float64 计算，避免整体复制
+    pv = np.asarray(pv)
+    load = np.asarray(load)
+    price_internal = np.asarray(price_internal, dtype=float)
+    price_buy = np.asarray(price_buy, dtype=float)
+    price_sell = np.asarray(price_sell, dtype=float)
+    n, steps = pv.shape
+    if chunk_steps is None:
+        chunk_steps = max(1, 500_000 // n)
+
+    internal_energy = np.zeros(steps)
+    ext_buy_energy = np.zeros(steps)
+    ext_sell_energy = np.zeros(steps)
+    user = {field: np.zeros(n) for field in USER_FIELDS}
+    trades = []
+    imports = []
+
+    for t0 in range(0, steps, chunk_steps):
+        t1 = min(steps, t0 + chunk_steps)
+        lam = price_internal[t0:t1]
+        buy = price_buy[t0:t1]
+        sell = price_sell[t0:t1]
+        pv_c = pv[:, t0:t1].astype(float)
+        load_c = load[:, t0:t1].astype(float)
+        net = pv_c - load_c
+        s_e = np.where(net > 0, net, 0.0)
+        b_e = np.where(net < 0, -net, 0.0)
+        # 沿用户轴逐行累加，求和顺序与 JS 的 reduce 一致
+        supply = s_e.sum(axis=0)
+        demand = b_e.sum(axis=0)
+        matched = np.minimum(supply, demand)
+        internal_energy[t0:t1] = matched
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            s_share = np.where(supply > 0, s_e * matched / supply, 0.0)
+            b_share = np.where(demand > 0, b_e * matched / demand, 0.0)
+        export_e = np.where(s_e > 0, s_e - s_share, 0.0)
+        export_e = np.where(export_e > 0, export_e, 0.0)
+        import_e = np.where(b_e > 0, b_e - b_share, 0.0)
+        import_e = np.where(import_e > 0, import_e, 0.0)
+        ext_sell_energy[t0:t1] = export_e.sum(axis=0)
+        ext_buy_energy[t0:t1] = import_e.sum(axis=0)
+
+        user["pv"] += pv_c.sum(axis=1)
+        user["load"] += load_c.sum(axis=1)
+        user["internal_sell"] += s_share.sum(axis=1)
+        user["internal_buy"] += b_share.sum(axis=1)
+        user["earn_internal"] += s_share @ lam
+        user["pay_internal"] += b_share @ lam
+        user["external_export"] += export_e.sum(axis=1)
+        user["external_import"] += import_e.sum(axis=1)
+        user["earn_external"] += export_e @ sell
+        user["pay_external"] += import_e @ buy
+
+        if ledger:
+            trades.append(_pair_trades(s_share, b_share, t0))
+            it, ii = np.nonzero(import_e.T > 0)
+            imports.append((it + t0, ii, import_e[ii, it]))
+
+    internal_amount = internal_energy * price_internal
+    external_amount = ext_buy_energy * price_buy - ext_sell_energy * price_sell
+    wallet_start = np.broadcast_to(np.asarray(start_balance, dtype=float), (n,)).copy()
+    wallet_end = (wallet_start + user["earn_internal"] + user["earn_external"]
+                  - user["pay_internal"] - user["pay_external"])
+
+    result = {
+        "internal_energy": internal_energy,
+        "ext_buy_energy": ext_buy_energy,
+        "ext_sell_energy": ext_sell_energy,
+        "internal_amount": internal_amount,
+        "external_amount": external_amount,
+        "wallet_start": wallet_start,
+        "wallet_end": wallet_end,
+        "user": user,
+        "community": {
+            "internal_kWh": float(internal_energy.sum()),
+            "import_kWh": float(ext_buy_energy.sum()),
+            "export_kWh": float(ext_sell_energy.sum()),
+            "internal_amount": float(internal_amount.sum()),
+            "external_amount": float(external_amount.sum()),
+        },
+    }
+    if ledger:
+        result["ledger"] = _build_ledger(trades, imports, price_internal, price_buy)
+    return result
+
+
+def _build_ledger(trades, imports, price_internal, price_buy):
+    """合并各时间块的内部配对与外购记录，排成与 JS 相同的顺序（每步先内部交易、后外购）"""
+    t_int = np.concatenate([tr[0] for tr in trades])
+    t_imp = np.concatenate([im[0] for im in imports])
+    time = np.concatenate([t_int, t_imp])
+    kind = np.concatenate([np.full(len(t_int), LEDGER_INTERNAL, dtype=np.int8),
+                           np.full(len(t_imp), LEDGER_IMPORT, dtype=np.int8)])
+    buyer = np.concatenate([np.concatenate([tr[1] for tr in trades]),
+                            np.concatenate([im[1] for im in imports])])
+    seller = np.concatenate([np.concatenate([tr[2] for tr in trades]), np.full(len(t_imp), GRID)])
+    energy = np.concatenate([np.concatenate([tr[3] for tr in trades]),
+                             np.concatenate([im[2] for im in imports])])
+    price = np.where(kind == LEDGER_INTERNAL, price_internal[time], price_buy[time])
+
+    order = np.argsort(time * 2 + kind, kind="stable")
+    ledger = {
+        "time": time[order],
+        "type": kind[order],
+        "buyer": buyer[order],
+        "seller": seller[order],
+        "energy": energy[order],
+        "price": price[order],
+    }
+    ledger["amount"] = ledger["energy"] * ledger["price"]
+    return ledger
+
+
+def ledger_records(ledger, names=NAMES):
+    """把列式账本转换成 web/app.js 的账本条目格式（{time,label,type,buyer,seller,energy,price,amount}）"""
+    labels = time_labels(int(ledger["time"].max()) + 1 if len(ledger["time"]) else 0)
+    kinds = {LEDGER_INTERNAL: "internal", LEDGER_IMPORT: "import"}
+    return [
+        {
+            "time": int(t), "label": labels[t], "type": kinds[int(k)], "buyer": names[b],
+            "seller": "GRID" if s == GRID else names[s], "energy": float(e), "price": float(p), "amount": float(a),
+        }
+        for t, k, b, s, e, p, a in zip(ledger["time"], ledger["type"], ledger["buyer"], ledger["seller"],
+                                       ledger["energy"], ledger["price"], ledger["amount"])
+    ]
+
+
+def simulate(day_demands_kwh=DEFAULT_DEMANDS, pv_cap=PV_CAP, rng=None, noise=None, ledger=True, topology=None):
+    """
+    与 web/app.js simulate() 相同的一天仿真：默认4个 prosumer，内部按买卖中间价结算
+
+    Args:
+        day_demands_kwh: 各用户日用电量（kWh）
+        pv_cap: 各用户光伏峰值容量（kW）
+        rng: 光伏云量扰动的随机数生成器
+        noise: (N, T) 的 [0, 1) 随机数，给定时复现指定的光伏曲线
+        ledger: 是否生成逐笔账本
+        topology: 馈线拓扑（FeederTopology），给出时按网络撮合（match_network），否则按比例撮合
+
+    Returns:
+        match_proportional（或 match_network）的结果，另含 labels、prices、pv、load
+    """
+    n = len(day_demands_kwh)
+    prices = external_prices(T)
+    pv = pv_profiles(pv_cap, 0.08 + 0.03 * np.arange(n), T, rng=rng, noise=noise)
+    load = demand_series(day_demands_kwh, T)
+    if topology is not None:
+        result = match_network(pv, load, prices["mid"], prices["buy"], prices["sell"], topology, ledger=ledger)
+    else:
+        result = match_proportional(pv, load, prices["mid"], prices["buy"], prices["sell"], ledger=ledger)
+    result.update({"labels": time_labels(T), "prices": prices, "pv": pv, "load": load})
+    return result
+
+
+# ----------------------------------------------------------------------
+# 双边拍卖订单簿
+# ----------------------------------------------------------------------
+# 内部市场的另一种撮合方式：prosumer 以限价单报出买卖意愿，按价格优先、时间优先成交。
+# 订单为列式数组（time、side、owner、price、quantity，可选 seq 表示到达顺序），
+# 每个时段（time 相同的订单）单独组成一本订单簿：
+# - 定期集合竞价（periodic）：买单按价格降序、卖单按价格升序排好后各自累加成区间，
+#   与 _pair_trades 相同地合并两组区间端点得到逐段配对，买价不低于卖价的前缀即为成交部分；
+#   成交价为统一价（uniform，边际买卖价之间按 k 取值）或按买方报价（pay_as_bid）。
+# - 连续竞价（continuous）：按到达顺序逐单撮合，买卖两侧各一个堆，成交价为挂单方价格。
+# 两种方式都输出与 match_proportional 相同的列式账本。
+
+BID = 0  # 订单 side 列：买单
+ASK = 1  # 订单 side 列：卖单
+AUCTION_RULES = ("uniform", "pay_as_bid")
+
+
+def net_orders(pv, load, bid_price, ask_price):
+    """
+    由每户的净负荷生成限价单：缺电报买单、余电报卖单，每户每个时段最多一张
+
+    Args:
+        pv: (N, steps) 光伏发电量（kWh）
+        load: (N, steps) 负荷（kWh）
+        bid_price: 买单限价，可广播到 (N, steps)（例如略低于外购电价）
+        ask_price: 卖单限价，可广播到 (N, steps)（例如略高于上网电价）
+
+    Returns:
+        列式订单 {'time', 'side', 'owner', 'price', 'quantity', 'seq'}，同一时段按用户编号到达
+    """
+    net = np.asarray(pv, dtype=float) - np.asarray(load, dtype=float)
+    n, steps = net.shape
+    bid_price = np.broadcast_to(np.asarray(bid_price, dtype=float), (n, steps))
+    ask_price = np.broadcast_to(np.asarray(ask_price, dtype=float), (n, steps))
+    t, i = np.nonzero(net.T != 0)
+    q = net[i, t]
+    side = np.where(q < 0, BID, ASK).astype(np.int8)
+    return {
+        "time": t,
+        "side": side,
+        "owner": i,
+        "price": np.where(side == BID, bid_price[i, t], ask_price[i, t]),
+        "quantity": np.abs(q),
+        "seq": i.copy(),
+    }
+
+
+def _clear_call(bid_price, bid_qty, ask_price, ask_qty, rule, k):
+    """
+    一个时段的集合竞价（买单已按价格降序、卖单已按价格升序排列，同价按到达顺序）
+
+    Returns:
+        (买单下标, 卖单下标, 成交量, 成交价) 各一个数组，以及统一出清价（无成交时为 nan）
+    """
+    b_end = np.cumsum(bid_qty)
+    a_end = np.cumsum(ask_qty)
+    ends = np.concatenate([b_end, a_end])
+    is_bid = np.concatenate([np.ones(len(b_end), dtype=bool), np.zeros(len(a_end), dtype=bool)])
+    order = np.argsort(ends, kind="stable")
+    ends, is_bid = ends[order], is_bid[order]
+
+    energy = np.diff(ends, prepend=0.0)
+    b_idx = np.cumsum(is_bid) - is_bid
+    a_idx = np.cumsum(~is_bid) - ~is_bid
+    valid = (energy > MATCH_EPS) & (b_idx < len(b_end)) & (a_idx < len(a_end))
+    b_idx, a_idx, energy = b_idx[valid], a_idx[valid], energy[valid]
+
+    # 买价随成交量递减、卖价递增，可成交的段是一个前缀
+    crossed = np.logical_and.accumulate(bid_price[b_idx] >= ask_price[a_idx])
+    b_idx, a_idx, energy = b_idx[crossed], a_idx[crossed], energy[crossed]
+    if len(energy) == 0:
+        return b_idx, a_idx, energy, np.zeros(0), np.nan
+
+    marginal_bid = bid_price[b_idx[-1]]
+    marginal_ask = ask_price[a_idx[-1]]
+    clearing = marginal_ask + k * (marginal_bid - marginal_ask)
+    if rule == "uniform":
+        price = np.full(len(energy), clearing)
+    else:
+        price = bid_price[b_idx]
+    return b_idx, a_idx, energy, price, clearing
+
+
+class OrderBook:
+    """
+    单个时段的限价订单簿（连续竞价）
+
+    买卖两侧各一个堆：买单按 (-价格, 到达序号)、卖单按 (价格, 到达序号) 排序，
+    新订单先与对侧最优挂单撮合（成交价为挂单价），剩余部分挂入本侧。
+    """
+
+    def __init__(self):
+        self._bids = []  # [-价格, 序号, 用户, 剩余量, 订单下标]
+        self._asks = []  # [价格, 序号, 用户, 剩余量, 订单下标]
+        self._seq = itertools.count()
+        self.buyer, self.seller, self.energy, self.price = [], [], [], []
+        self.filled = {}  # 订单下标 -> 成交量
+
+    def best_bid(self):
+        return -self._bids[0][0] if self._bids else None
+
+    def best_ask(self):
+        return self._asks[0][0] if self._asks else None
+
+    def submit(self, owner, side, price, quantity, seq=None, order_id=None):
+        """
+        提交限价单
+
+        Args:
+            owner: 用户编号
+            side: BID 或 ASK
+            price: 限价
+            quantity: 数量（kWh）
+            seq: 到达序号（时间优先），默认按提交顺序
+            order_id: 订单标识（用于 filled 统计），默认与 seq 相同
+
+        Returns:
+            本次提交立即成交的数量
+        """
+        seq = next(self._seq) if seq is None else seq
+        order_id = seq if order_id is None else order_id
+        book, own = (self._asks, self._bids) if side == BID else (self._bids, self._asks)
+        remaining = float(quantity)
+        while remaining > MATCH_EPS and book:
+            top = book[0]
+            resting_price = -top[0] if side == ASK else top[0]
+            if (side == BID and resting_price > price) or (side == ASK and resting_price < price):
+                break
+            m = min(remaining, top[3])
+            if side == BID:
+                self.buyer.append(owner)
+                self.seller.append(top[2])
+            else:
+                self.buyer.append(top[2])
+                self.seller.append(owner)
+            self.energy.append(m)
+            self.price.append(resting_price)
+            self.filled[top[4]] = self.filled.get(top[4], 0.0) + m
+            remaining -= m
+            top[3] -= m
+            if top[3] <= MATCH_EPS:
+                heapq.heappop(book)
+        done = float(quantity) - remaining
+        if done > 0:
+            self.filled[order_id] = self.filled.get(order_id, 0.0) + done
+        if remaining > MATCH_EPS:
+            heapq.heappush(own, [-price if side == BID else price, seq, owner, remaining, order_id])
+        return done
+
+
+def _clear_continuous(owner, side, price, qty, seq):
+    """一个时段的连续竞价（订单已按到达顺序排列），返回 (买方, 卖方, 成交量, 成交价, 各订单成交量)"""
+    book = OrderBook()
+    for j in range(len(qty)):
+        book.submit(int(owner[j]), side[j], float(price[j]), float(qty[j]), seq=int(seq[j]), order_id=j)
+    filled = np.zeros(len(qty))
+    if book.filled:
+        filled[np.fromiter(book.filled.keys(), dtype=np.int64)] = np.fromiter(book.filled.values(), dtype=float)
+    return (np.asarray(book.buyer, dtype=np.int64), np.asarray(book.seller, dtype=np.int64),
+            np.asarray(book.energy, dtype=float), np.asarray(book.price, dtype=float), filled)
+
+
+def clear_double_auction(orders, mode="periodic", rule="uniform", k=0.5, price_buy=None, price_sell=None,
+                         steps=None):
+    """
+    双边拍卖撮合：每个时段一本订单簿，价格优先、时间优先
+
+    Args:
+        orders: 列式订单 {'time', 'side', 'owner', 'price', 'quantity'}，可选 'seq'（到达顺序，默认为数组顺序）
+        mode: 'periodic'（每个时段一次集合竞价，向量化）或 'continuous'（按到达顺序连续撮合）
+        rule: 集合竞价的成交价规则：'uniform'（统一出清价）或 'pay_as_bid'（按买方报价）；连续竞价始终按挂单价
+        k: 统一价在边际卖价（0）与边际买价（1）之间的位置
+        price_buy: (steps,) 外购电价；给出时未成交的买单按此价从电网购电并写入账本
+        price_sell: (steps,) 上网电价；给出时未成交的卖单按此价上网（与 match_proportional 一样不写入账本）
+        steps: 时段数，默认 max(time) + 1
+
+    Returns:
+        结果字典：
+        - ledger：与 match_proportional 相同的列式账本（每个时段先内部成交、后外购）
+        - filled：与输入订单对齐的成交量
+        - volume、clearing_price：(steps,) 内部成交量与统一出清价（无成交或连续竞价时为最后成交价，nan 表示无成交）
+        - import_energy、export_energy：(steps,) 未成交部分与电网的交易量
+    """
+    if mode not in ("periodic", "continuous"):
+        raise ValueError(f"未知的撮合方式: {mode}")
+    if rule not in AUCTION_RULES:
+        raise ValueError(f"未知的成交价规则: {rule}")
+    time_ = np.asarray(orders["time"], dtype=np.int64)
+    side = np.asarray(orders["side"], dtype=np.int8)
+    owner = np.asarray(orders["owner"], dtype=np.int64)
+    price = np.asarray(orders["price"], dtype=float)
+    qty = np.asarray(orders["quantity"], dtype=float)
+    seq = np.asarray(orders["seq"], dtype=np.int64) if "seq" in orders else np.arange(len(qty))
+    if steps is None:
+        steps = int(time_.max()) + 1 if len(time_) else 0
+
+    is_bid = side == BID
+    # 按 (时段, 买卖方向, 价格优先, 到达顺序) 排好，每个时段的买单、卖单各是一段连续下标
+    order = np.lexsort((seq, np.where(is_bid, -price, price), side, time_))
+    if mode == "continuous":
+        order = np.lexsort((seq, time_))
+    t_sorted = time_[order]
+    bounds = np.flatnonzero(np.diff(t_sorted)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(order)]])
+
+    filled = np.zeros(len(qty))
+    volume = np.zeros(steps)
+    clearing_price = np.full(steps, np.nan)
+    trades = []
+    for lo, hi in zip(starts, ends):
+        if lo == hi:
+            continue
+        idx = order[lo:hi]
+        t = int(t_sorted[lo])
+        if mode == "continuous":
+            buyer, seller, energy, p, f = _clear_continuous(owner[idx], side[idx], price[idx], qty[idx], seq[idx])
+            filled[idx] = f
+            if len(p):
+                clearing_price[t] = p[-1]
+        else:
+            n_bid = int(np.count_nonzero(is_bid[idx]))
+            bids, asks = idx[:n_bid], idx[n_bid:]
+            b, a, energy, p, clearing_price[t] = _clear_call(price[bids], qty[bids], price[asks], qty[asks], rule, k)
+            filled[bids] = np.bincount(b, energy, minlength=len(bids))
+            filled[asks] = np.bincount(a, energy, minlength=len(asks))
+            buyer, seller = owner[bids][b], owner[asks][a]
+        volume[t] = energy.sum()
+        trades.append((np.full(len(energy), t, dtype=np.int64), buyer, seller, energy, p))
+
+    residual = np.maximum(qty - filled, 0.0)
+    residual[residual <= MATCH_EPS] = 0.0
+    import_energy = np.bincount(time_[is_bid], residual[is_bid], minlength=steps)
+    export_energy = np.bincount(time_[~is_bid], residual[~is_bid], minlength=steps)
+
+    columns = [np.concatenate([tr[c] for tr in trades]) if trades else np.zeros(0) for c in range(5)]
+    t_int, buyer, seller, energy, p = columns
+    kind = np.full(len(t_int), LEDGER_INTERNAL, dtype=np.int8)
+    if price_buy is not None:
+        imp = np.flatnonzero(is_bid & (residual > 0))
+        t_int = np.concatenate([t_int, time_[imp]])
+        kind = np.concatenate([kind, np.full(len(imp), LEDGER_IMPORT, dtype=np.int8)])
+        buyer = np.concatenate([buyer, owner[imp]])
+        seller = np.concatenate([seller, np.full(len(imp), GRID)])
+        energy = np.concatenate([energy, residual[imp]])
+        p = np.concatenate([p, np.asarray(price_buy, dtype=float)[time_[imp]]])
+
+    ledger_order = np.argsort(t_int * 2 + kind, kind="stable")
+    ledger = {
+        "time": t_int.astype(np.int64)[ledger_order],
+        "type": kind[ledger_order],
+        "buyer": buyer.astype(np.int64)[ledger_order],
+        "seller": seller.astype(np.int64)[ledger_order],
+        "energy": energy[ledger_order],
+        "price": p[ledger_order],
+    }
+    ledger["amount"] = ledger["energy"] * ledger["price"]
+    result = {
+        "ledger": ledger,
+        "filled": filled,
+        "volume": volume,
+        "clearing_price": clearing_price,
+        "import_energy": import_energy,
+        "export_energy": export_energy,
+    }
+    if price_sell is not None:
+        result["export_amount"] = export_energy * np.asarray(price_sell, dtype=float)
+    return result
+
+
+# ----------------------------------------------------------------------
+# 电池与情景批量仿真
+# ----------------------------------------------------------------------
+
+# 与 README 中的 prosumer 电池参数一致
+BATT_ETA = 0.95
+SOC_MIN = 0.1
+SOC_MAX = 0.9
+SOC0 = 0.5
+BATT_C_RATE = 0.5  # 充放电功率上限 = 容量 × C 率（kW）
+
+# 情景参数的默认值：不给出的参数保持基准输入不变
+SCENARIO_DEFAULTS = {
+    "pv_scale": 1.0,  # 光伏规模倍数
+    "battery_kwh": 0.0,  # 每户电池容量（kWh）
+    "buy_cap": None,  # 外购电价上限（SLR/kWh）
+    "sell_cap": None,  # 上网电价上限（SLR/kWh）
+    "cloud": 0.0,  # 云量扰动幅度
+    "seed": 0,  # 云量扰动的随机种子
+}
+
+
+def battery_dispatch(pv, load, ecap, pmax=None, eta=BATT_ETA, soc_min=SOC_MIN, soc_max=SOC_MAX, soc0=SOC0):
+    """
+    自发自用优先的电池调度：每个步长先用余电充电、再用电池补缺电，所有用户同时向量化计算
+
+    Args:
+        pv: (N, steps) 光伏发电量（kWh）
+        load: (N, steps) 负荷（kWh）
+        ecap: 每户电池容量（kWh），标量或长度 N
+        pmax: 每户充放电功率上限（kW），默认 容量 × BATT_C_RATE
+        eta: 单向充/放电效率
+        soc_min: SOC 下限
+        soc_max: SOC 上限
+        soc0: 初始 SOC
+
+    Returns:
+        (charge, discharge, soc)：均为 (N, steps)，soc 为每步结束时的电量（kWh）
+    """
+    n, steps = pv.shape
+    ecap = np.broadcast_to(np.asarray(ecap, dtype=float), (n,))
+    pmax = ecap * BATT_C_RATE if pmax is None else np.broadcast_to(np.asarray(pmax, dtype=float), (n,))
+    step_max = pmax * DT_H
+    charge = np.zeros((n, steps))
+    discharge = np.zeros((n, steps))
+    soc = np.zeros((n, steps))
+    e = ecap * soc0
+    for t in range(steps):
+        net = pv[:, t] - load[:, t]
+        c = np.minimum(np.minimum(np.maximum(net, 0.0), step_max), np.maximum(ecap * soc_max - e, 0.0) / eta)
+        d = np.minimum(np.minimum(np.maximum(-net, 0.0), step_max), np.maximum(e - ecap * soc_min, 0.0) * eta)
+        e = e + c * eta - d / eta
+        charge[:, t] = c
+        discharge[:, t] = d
+        soc[:, t] = e
+    return charge, discharge, soc
+
+
+def load_inputs(path=None, days=1):
+    """
+    读取情景仿真的基准输入
+
+    Args:
+        path: .npz 文件（pv、load 数组，可选 buy、sell、mid 电价）；为空时使用前端演示的 4 户无云基准
+        days: 使用默认基准时的天数
+
+    Returns:
+        {'pv', 'load', 'buy', 'sell', 'mid'}
+    """
+    if path is None:
+        steps = days * T
+        n = len(DEFAULT_DEMANDS)
+        pv = pv_profiles(PV_CAP, np.zeros(n), steps, noise=np.full((n, steps), 0.5))
+        data = {"pv": pv, "load": demand_series(DEFAULT_DEMANDS, steps)}
+        data.update(external_prices(steps))
+        return data
+
+    with np.load(path) as f:
+        data = {key: f[key] for key in f.files}
+    steps = data["pv"].shape[1]
+    for key, value in external_prices(steps).items():
+        data.setdefault(key, value)
+    return data
+
+
+def save_inputs(path, pv, load, prices=None):
+    """把基准输入保存为 load_inputs 可读取的 .npz 文件"""
+    np.savez(path, pv=pv, load=load, **(prices or {}))
+
+
+def scenario_grid(**axes):
+    """
+    参数网格：scenario_grid(pv_scale=[1, 1.5], battery_kwh=[0, 5]) 生成全部组合
+
+    Returns:
+        情景参数字典列表
+    """
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(axes[name] for name in names))]
+
+
+def scenario_sampler(n, ranges, seed=0):
+    """
+    随机采样情景：ranges 为 参数 -> (下限, 上限)（均匀分布）或候选值列表
+
+    Args:
+        n: 情景数量
+        ranges: 参数取值范围
+        seed: 随机种子
+
+    Returns:
+        情景参数字典列表（每个情景带独立的云量种子）
+    """
+    rng = np.random.default_rng(seed)
+    scenarios = []
+    for _ in range(n):
+        scenario = {"seed": int(rng.integers(2 ** 31))}
+        for name, spec in ranges.items():
+            if isinstance(spec, tuple):
+                scenario[name] = float(rng.uniform(*spec))
+            else:
+                scenario[name] = spec[int(rng.integers(len(spec)))]
+        scenarios.append(scenario)
+    return scenarios
+
+
+def scenario_kpis(data, scenario):
+    """
+    运行单个情景并计算 KPI
+
+    Args:
+        data: load_inputs 的基准输入
+        scenario: 情景参数（缺省值见 SCENARIO_DEFAULTS）
+
+    Returns:
+        KPI 字典：自给率、P2P 占比、社区对外总成本等
+    """
+    params = dict(SCENARIO_DEFAULTS, **scenario)
+    pv = data["pv"] * params["pv_scale"]
+    load = data["load"]
+    if params["cloud"] > 0:
+        rng = np.random.default_rng(params["seed"])
+        pv = np.maximum(0.0, pv * (1 + (rng.random(pv.shape) * 2 - 1) * params["cloud"]))
+    buy = data["buy"] if params["buy_cap"] is None else np.minimum(data["buy"], params["buy_cap"])
+    sell = data["sell"] if params["sell_cap"] is None else np.minimum(data["sell"], params["sell_cap"])
+    mid = 0.5 * (buy + sell)
+
+    throughput = 0.0
+    pv_in, load_in = pv, load
+    if params["battery_kwh"] > 0:
+        charge, discharge, _ = battery_dispatch(pv, load, params["battery_kwh"])
+        pv_in, load_in = pv - charge, load - discharge
+        throughput = float(charge.sum() + discharge.sum())
+
+    r = match_proportional(pv_in, load_in, mid, buy, sell, ledger=False)
+    c = r["community"]
+    total_load = float(load.sum())
+    return {
+        "self_sufficiency": 1.0 - c["import_kWh"] / total_load if total_load > 0 else 0.0,
+        "p2p_share": c["internal_kWh"] / total_load if total_load > 0 else 0.0,
+        "total_cost": c["external_amount"],
+        "internal_kWh": c["internal_kWh"],
+        "import_kWh": c["import_kWh"],
+        "export_kWh": c["export_kWh"],
+        "pv_kWh": float(pv.sum()),
+        "load_kWh": total_load,
+        "battery_throughput_kWh": throughput,
+    }
+
+
+# 每个工作进程只读取一次基准输入，之后的情景都复用
+_WORKER_DATA = None
+
+
+def _init_worker(input_path, days):
+    global _WORKER_DATA
+    _WORKER_DATA = load_inputs(input_path, days)
+
+
+def _run_scenario(index, scenario):
+    start = time.perf_counter()
+    kpis = scenario_kpis(_WORKER_DATA, scenario)
+    kpis["seconds"] = time.perf_counter() - start
+    return index, scenario, kpis
+
+
+def _param_value(value):
+    # 参数列统一为 float64，缺省（None）写成 NaN，保证各批次的列类型一致（整数与小数混合的网格也能写入）
+    return float("nan") if value is None else float(value)
+
+
+class _ResultWriter:
+    """
+    逐批写入情景结果
+
+    有 pyarrow 时 path 为 Parquet 数据集目录，每批写一个完整的 part 文件（先写隐藏的临时文件再改名），
+    运行中途被中断时已写完的批次仍然可读；否则写 CSV（每批后 flush）。
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+        self.use_parquet = pq is not None and not path.endswith(".csv")
+        if not self.use_parquet and not path.endswith(".csv"):
+            self.path = os.path.splitext(path)[0] + ".csv"
+            print(f"⚠️  未安装 pyarrow，结果改写为 CSV: {self.path}")
+        self._parts = 0
+        self._file = None
+        if self.use_parquet:
+            # 固定的表结构：情景编号为整数，参数和 KPI 全部为 float64
+            self.schema = pa.schema([(name, pa.int64() if name == "scenario_id" else pa.float64())
+                                     for name in columns])
+            os.makedirs(self.path, exist_ok=True)
+            for name in os.listdir(self.path):
+                if name.startswith("part-") and name.endswith(".parquet"):
+                    os.remove(os.path.join(self.path, name))
+
+    def write(self, rows):
+        if not rows:
+            return
+        if self.use_parquet:
+            table = pa.Table.from_pylist(rows, schema=self.schema)
+            name = f"part-{self._parts:05d}.parquet"
+            tmp = os.path.join(self.path, f".{name}.tmp")
+            pq.write_table(table, tmp)
+            os.replace(tmp, os.path.join(self.path, name))
+            self._parts += 1
+        else:
+            if self._file is None:
+                self._file = open(self.path, "w", newline="")
+                self._csv = csv.DictWriter(self._file, fieldnames=self.columns)
+                self._csv.writeheader()
+            self._csv.writerows(rows)
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def run_scenarios(scenarios, out_path="scenario_kpis.parquet", input_path=None, days=1, workers=None,
+                  flush_every=32, max_pending=None):
+    """
+    用进程池并行运行一批情景，情景完成后即写入结果文件
+
+    Args:
+        scenarios: 情景参数字典列表（scenario_grid / scenario_sampler 的结果）
+        out_path: 结果路径（Parquet 数据集目录，每批一个 part 文件；以 .csv 结尾或未安装 pyarrow 时写 CSV 文件）
+        input_path: 基准输入 .npz 文件，为空时使用默认基准
+        days: 使用默认基准时的天数
+        workers: 进程数，默认 CPU 核数
+        flush_every: 每累计这么多个完成的情景写一次（Parquet 时即一个 part 文件）
+        max_pending: 同时提交的情景数上限，默认 4 × 进程数
+
+    Returns:
+        完成的情景数
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    param_names = sorted({name for scenario in scenarios for name in scenario} | set(SCENARIO_DEFAULTS))
+    kpi_names = ["self_sufficiency", "p2p_share", "total_cost", "internal_kWh", "import_kWh", "export_kWh",
+                 "pv_kWh", "load_kWh", "battery_throughput_kWh", "seconds"]
+    writer = _ResultWriter(out_path, ["scenario_id"] + param_names + kpi_names)
+
+    done = 0
+    buffer = []
+    todo = iter(enumerate(scenarios))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(input_path, days)) as pool:
+        pending = set()
+        try:
+            while True:
+                for index, scenario in itertools.islice(todo, max_pending - len(pending)):
+                    pending.add(pool.submit(_run_scenario, index, scenario))
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    index, scenario, kpis = future.result()
+                    row = {"scenario_id": index}
+                    row.update({name: _param_value(scenario.get(name, SCENARIO_DEFAULTS.get(name)))
+                                for name in param_names})
+                    row.update(kpis)
+                    buffer.append(row)
+                    done += 1
+                if len(buffer) >= flush_every:
+                    writer.write(buffer)
+                    buffer = []
+            writer.write(buffer)
+        finally:
+            writer.close()
+    print(f"✅ {done} 个情景完成，结果已写入 {writer.path}")
+    return done
+
+
+# ----------------------------------------------------------------------
+# 滚动时域 MILP 调度
+# ----------------------------------------------------------------------
+# 整段（一天/一个月）的单体模型规模随 步长 × prosumer 增长，求解时间超线性；
+# 这里按重叠窗口依次求解：每个窗口只提交前 commit 步，SOC 结转到下一窗口，
+# 下一窗口以上一窗口在重叠部分的解作为初始解（warm start）。
+
+LINE_ETA = 0.97  # P2P 线损后的传输效率
+PROSUMER_ECAP = [10, 6, 0, 5]  # 每户电池容量（kWh），N > 4 时循环使用
+PROSUMER_PMAX = [5, 3, 0, 3]  # 每户充放电功率上限（kW）
+VPP_ECAP = 50.0  # VPP 社区电池容量（kWh）
+VPP_PMAX = 10.0  # VPP 充放电功率上限（kW）
+CYCLE_COST = 1e-4  # 充放电的微小成本，避免无意义的往返充放
+
+
+class _Layout:
+    """变量编号分配：每个变量块对应一段连续列号"""
+
+    def __init__(self):
+        self.size = 0
+        self.blocks = {}
+
+    def add(self, name, shape):
+        idx = np.arange(self.size, self.size + int(np.prod(shape))).reshape(shape)
+        self.size += idx.size
+        self.blocks[name] = idx
+        return idx
+
+
+class _Rows:
+    """按块累积约束行（COO 三元组 + 行上下界）"""
+
+    def __init__(self):
+        self.count = 0
+        self.rows, self.cols, self.vals = [], [], []
+        self.lo, self.hi = [], []
+
+    def add(self, terms, lo, hi):
+        """terms 为 [(系数, 列号数组)]，每个列号数组的形状就是这一块的行形状"""
+        shape = np.shape(terms[0][1])
+        n = int(np.prod(shape))
+        row_ids = np.arange(self.count, self.count + n).reshape(shape)
+        for coef, cols in terms:
+            coef = np.broadcast_to(coef, shape)
+            self.rows.append(row_ids.ravel())
+            self.cols.append(np.asarray(cols).ravel())
+            self.vals.append(np.asarray(coef, dtype=float).ravel())
+        self.lo.append(np.broadcast_to(np.asarray(lo, dtype=float), shape).ravel())
+        self.hi.append(np.broadcast_to(np.asarray(hi, dtype=float), shape).ravel())
+        self.count += n
+
+
+def _build_window(pv, load, buy, sell, ecap, pmax, soc_start, vpp_soc_start, vpp_ecap=VPP_ECAP,
+                  vpp_pmax=VPP_PMAX, eta=BATT_ETA, line_eta=LINE_ETA, soc_terminal=None):
+    """
+    构建一个窗口的 MILP：prosumer 能量平衡、P2P 交易池平衡、电池 SOC 递推与充放互斥
+
+    Returns:
+        模型字典（c、A、row_lo、row_hi、lb、ub、integrality）与变量布局
+    """
+    n, w = pv.shape
+    layout = _Layout()
+    ch = layout.add("ch", (n, w))
+    dis = layout.add("dis", (n, w))
+    soc = layout.add("soc", (n, w))
+    mode = layout.add("mode", (n, w))  # 1 = 充电，0 = 放电
+    gin = layout.add("gin", (n, w))  # 从交易池买入
+    gout = layout.add("gout", (n, w))  # 卖给交易池
+    vch = layout.add("vch", (w,))
+    vdis = layout.add("vdis", (w,))
+    vsoc = layout.add("vsoc", (w,))
+    vmode = layout.add("vmode", (w,))
+    imp = layout.add("imp", (w,))
+    exp = layout.add("exp", (w,))
+
+    lb = np.zeros(layout.size)
+    ub = np.full(layout.size, np.inf)
+    step_max = (pmax * DT_H)[:, None]
+    ub[ch] = np.broadcast_to(step_max, (n, w))
+    ub[dis] = ub[ch]
+    lb[soc] = np.broadcast_to((ecap * SOC_MIN)[:, None], (n, w))
+    ub[soc] = np.broadcast_to((ecap * SOC_MAX)[:, None], (n, w))
+    ub[mode] = 1
+    ub[vch] = ub[vdis] = vpp_pmax * DT_H
+    lb[vsoc] = vpp_ecap * SOC_MIN
+    ub[vsoc] = vpp_ecap * SOC_MAX
+    ub[vmode] = 1
+    if soc_terminal is not None:
+        lb[soc[:, -1]] = np.maximum(lb[soc[:, -1]], ecap * soc_terminal)
+        lb[vsoc[-1]] = max(lb[vsoc[-1]], vpp_ecap * soc_terminal)
+
+    integrality = np.zeros(layout.size, dtype=np.int8)
+    integrality[mode] = 1
+    integrality[vmode] = 1
+
+    c = np.zeros(layout.size)
+    c[imp] = buy
+    c[exp] = -sell
+    for block in (ch, dis, vch, vdis):
+        c[block] = CYCLE_COST
+
+    rows = _Rows()
+    # prosumer 能量平衡：pv + 放电 + 买入 = 负荷 + 充电 + 卖出
+    net_load = load - pv
+    rows.add([(1, dis), (1, gin), (-1, ch), (-1, gout)], net_load, net_load)
+    # 交易池平衡：卖出（扣线损）+ VPP放电 + 外购 = 买入 + VPP充电 + 上网
+    rows.add([(1, vdis), (1, imp), (-1, vch), (-1, exp)]
+             + [(line_eta, gout[i]) for i in range(n)] + [(-1, gin[i]) for i in range(n)], 0, 0)
+    # SOC 递推：soc[t] = soc[t-1] + eta*ch - dis/eta，第一步接上一窗口的 SOC
+    first = np.zeros((n, w))
+    first[:, 0] = soc_start
+    prev = np.concatenate([soc[:, :1], soc[:, :-1]], axis=1)
+    prev_coef = np.ones((n, w))
+    prev_coef[:, 0] = 0
+    rows.add([(1, soc), (-prev_coef, prev), (-eta, ch), (1 / eta, dis)], first, first)
+    vfirst = np.zeros(w)
+    vfirst[0] = vpp_soc_start
+    vprev = np.concatenate([vsoc[:1], vsoc[:-1]])
+    vprev_coef = np.ones(w)
+    vprev_coef[0] = 0
+    rows.add([(1, vsoc), (-vprev_coef, vprev), (-eta, vch), (1 / eta, vdis)], vfirst, vfirst)
+    # 充放电互斥：ch <= P*mode，dis <= P*(1 - mode)
+    big = np.broadcast_to(step_max, (n, w))
+    rows.add([(1, ch), (-big, mode)], -np.inf, 0)
+    rows.add([(1, dis), (big, mode)], -np.inf, big)
+    rows.add([(1, vch), (-vpp_pmax * DT_H, vmode)], -np.inf, 0)
+    rows.add([(1, vdis), (vpp_pmax * DT_H, vmode)], -np.inf, vpp_pmax * DT_H)
+
+    A = sp.coo_matrix(
+        (np.concatenate(rows.vals), (np.concatenate(rows.rows), np.concatenate(rows.cols))),
+        shape=(rows.count, layout.size),
+    ).tocsc()
+    model = {
+        "c": c, "A": A, "row_lo": np.concatenate(rows.lo), "row_hi": np.concatenate(rows.hi),
+        "lb": lb, "ub": ub, "integrality": integrality,
+    }
+    return model, layout
+
+
+class HighsBackend:
+    """开源 HiGHS 求解器（highspy），支持部分初始解：HiGHS 固定给出的变量后自行补全其余变量"""
+
+    name = "highs"
+
+    def __init__(self, time_limit=None, mip_gap=1e-4):
+        if highspy is None:
+            raise ImportError("HiGHS 后端需要安装 highspy：pip install highspy")
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+
+    def solve(self, model, x0=None):
+        """
+        求解一个模型
+
+        Args:
+            model: _build_window 生成的模型字典
+            x0: 初始解，NaN 表示该变量不给初值
+
+        Returns:
+            (解向量, 目标函数值)
+        """
+        h = highspy.Highs()
+        h.setOptionValue("output_flag", False)
+        h.setOptionValue("mip_rel_gap", self.mip_gap)
+        if self.time_limit is not None:
+            h.setOptionValue("time_limit", float(self.time_limit))
+
+        A = model["A"]
+        lp = highspy.HighsLp()
+        lp.num_col_, lp.num_row_ = A.shape[1], A.shape[0]
+        lp.col_cost_ = model["c"]
+        lp.col_lower_ = model["lb"]
+        lp.col_upper_ = model["ub"]
+        lp.row_lower_ = model["row_lo"]
+        lp.row_upper_ = model["row_hi"]
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = A.indptr
+        lp.a_matrix_.index_ = A.indices
+        lp.a_matrix_.value_ = A.data
+        lp.integrality_ = [highspy.HighsVarType.kInteger if v else highspy.HighsVarType.kContinuous
+                           for v in model["integrality"]]
+        h.passModel(lp)
+        if x0 is not None:
+            given = np.flatnonzero(~np.isnan(x0))
+            h.setSolution(len(given), given.astype(np.int32), x0[given])
+
+        h.run()
+        status = h.getModelStatus()
+        has_solution = h.getInfo().primal_solution_status == 2
+        if status != highspy.HighsModelStatus.kOptimal and not has_solution:
+            raise RuntimeError(f"HiGHS 求解失败: {h.modelStatusToString(status)}")
+        return np.array(h.getSolution().col_value), h.getInfo().objective_function_value
+
+
+class ScipyBackend:
+    """scipy.optimize.milp（内部同样是 HiGHS），不支持初始解"""
+
+    name = "scipy"
+
+    def __init__(self, time_limit=None, mip_gap=1e-4):
+        if milp is None:
+            raise ImportError("scipy 后端需要安装 scipy>=1.9")
+        self.options = {"disp": False, "mip_rel_gap": mip_gap}
+        if time_limit is not None:
+            self.options["time_limit"] = time_limit
+
+    def solve(self, model, x0=None):
+        res = milp(
+            model["c"],
+            constraints=LinearConstraint(model["A"], model["row_lo"], model["row_hi"]),
+            bounds=Bounds(model["lb"], model["ub"]),
+            integrality=model["integrality"],
+            options=self.options,
+        )
+        if res.x is None:
+            raise RuntimeError(f"scipy milp 求解失败: {res.message}")
+        return res.x, res.fun
+
+
+class GurobiBackend:
+    """Gurobi（需要 gurobipy 与 license），初始解写入变量的 Start 属性"""
+
+    name = "gurobi"
+
+    def __init__(self, time_limit=None, mip_gap=1e-4):
+        if gp is None:
+            raise ImportError("Gurobi 后端需要安装 gurobipy 并配置 license")
+        self.time_limit = time_limit
+        self.mip_gap = mip_gap
+
+    def solve(self, model, x0=None):
+        m = gp.Model()
+        m.Params.OutputFlag = 0
+        m.Params.MIPGap = self.mip_gap
+        if self.time_limit is not None:
+            m.Params.TimeLimit = self.time_limit
+        vtype = np.where(model["integrality"] == 1, gp.GRB.INTEGER, gp.GRB.CONTINUOUS)
+        x = m.addMVar(len(model["c"]), lb=model["lb"], ub=model["ub"], vtype=vtype)
+        A = model["A"].tocsr()
+        lo, hi = model["row_lo"], model["row_hi"]
+        eq = lo == hi
+        upper = ~eq & np.isfinite(hi)
+        lower = ~eq & np.isfinite(lo)
+        for mask, sense, rhs in ((eq, "=", lo), (upper, "<", hi), (lower, ">", lo)):
+            if mask.any():
+                m.addMConstr(A[mask], x, sense, rhs[mask])
+        m.setObjective(model["c"] @ x, gp.GRB.MINIMIZE)
+        if x0 is not None:
+            # Gurobi 用 GRB.UNDEFINED 表示该变量不给初值
+            x.Start = np.where(np.isnan(x0), gp.GRB.UNDEFINED, x0)
+        m.optimize()
+        if m.SolCount == 0:
+            raise RuntimeError(f"Gurobi 求解失败，状态码 {m.Status}")
+        return x.X, m.ObjVal
+
+
+SOLVER_BACKENDS = {
+    "highs": HighsBackend,
+    "scipy": ScipyBackend,
+    "gurobi": GurobiBackend,
+}
+
+
+def get_solver(solver=None, **options):
+    """
+    取得求解后端
+
+    Args:
+        solver: 后端名称（highs / scipy / gurobi）或已创建的后端对象；为空时优先 highspy，其次 scipy
+        options: 传给后端的参数（time_limit、mip_gap）
+
+    Returns:
+        具有 solve(model, x0) 方法的后端对象
+    """
+    if solver is None:
+        solver = "highs" if highspy is not None else "scipy"
+    if isinstance(solver, str):
+        if solver not in SOLVER_BACKENDS:
+            raise ValueError(f"未知的求解后端: {solver}（可选 {', '.join(SOLVER_BACKENDS)}）")
+        return SOLVER_BACKENDS[solver](**options)
+    return solver
+
+
+def _warm_start(prev_x, prev_layout, shift, layout):
+    """把上一窗口的解平移 shift 步作为本窗口的初始解：只给出充放电模式（二进制变量），其余由求解器补全"""
+    x0 = np.full(layout.size, np.nan)
+    for name in ("mode", "vmode"):
+        old = prev_x[prev_layout.blocks[name]]
+        new = layout.blocks[name]
+        overlap = min(old.shape[-1] - shift, new.shape[-1])
+        if overlap > 0:
+            x0[new[..., :overlap]] = np.round(old[..., shift:shift + overlap])
+    return x0
+
+
+def rolling_horizon_dispatch(pv, load, buy, sell, window=96, commit=48, solver=None, ecap=None, pmax=None,
+                             soc0=SOC0, vpp_ecap=VPP_ECAP, vpp_pmax=VPP_PMAX, soc_terminal=SOC0,
+                             warm_start=True, verbose=False, **solver_options):
+    """
+    滚动时域求解 5 分钟 MILP 调度
+
+    Args:
+        pv: (N, steps) 光伏发电量（kWh）
+        load: (N, steps) 负荷（kWh）
+        buy: (steps,) 外购电价
+        sell: (steps,) 上网电价
+        window: 每个窗口的步长数（含前瞻部分）
+        commit: 每个窗口提交的步长数，window - commit 为与下一窗口的重叠；
+                window >= steps 时退化为整段单体求解
+        solver: 求解后端名称或对象（见 get_solver）
+        ecap: 每户电池容量（kWh），默认 PROSUMER_ECAP
+        pmax: 每户充放电功率上限（kW），默认 PROSUMER_PMAX
+        soc0: 初始 SOC
+        vpp_ecap: VPP 电池容量（kWh）
+        vpp_pmax: VPP 充放电功率上限（kW）
+        soc_terminal: 每个窗口末端的最低 SOC（比例），默认不低于初始 SOC，
+                      避免每个窗口都把电池放空；为 None 时不约束
+        warm_start: 是否用上一窗口的解作为初始解
+        verbose: 是否打印每个窗口的求解信息
+        solver_options: 传给求解后端的参数（time_limit、mip_gap）
+
+    Returns:
+        结果字典：各调度变量的 (N, steps) / (steps,) 数组、cost（对外总成本），
+        以及 windows（每个窗口的求解耗时、目标值、规模）
+    """
+    if sp is None:
+        raise ImportError("构建 MILP 需要 scipy")
+    pv = np.asarray(pv, dtype=float)
+    load = np.asarray(load, dtype=float)
+    buy = np.asarray(buy, dtype=float)
+    sell = np.asarray(sell, dtype=float)
+    n, steps = pv.shape
+    if window < 1 or commit < 1:
+        raise ValueError("window 和 commit 至少为 1")
+    if commit > window:
+        raise ValueError("commit 不能大于 window")
+    ecap = np.resize(np.asarray(PROSUMER_ECAP if ecap is None else ecap, dtype=float), n)
+    pmax = np.resize(np.asarray(PROSUMER_PMAX if pmax is None else pmax, dtype=float), n)
+    backend = get_solver(solver, **solver_options)
+
+    out = {name: np.zeros((n, steps)) for name in ("ch", "dis", "soc", "gin", "gout")}
+    out.update({name: np.zeros(steps) for name in ("vch", "vdis", "vsoc", "imp", "exp")})
+    soc_state = ecap * soc0
+    vsoc_state = vpp_ecap * soc0
+    windows = []
+    prev = None
+
+    start = 0
+    while start < steps:
+        end = min(start + window, steps)
+        keep = end - start if end == steps else commit
+        model, layout = _build_window(
+            pv[:, start:end], load[:, start:end], buy[start:end], sell[start:end], ecap, pmax,
+            soc_state, vsoc_state, vpp_ecap=vpp_ecap, vpp_pmax=vpp_pmax, soc_terminal=soc_terminal,
+        )
+        x0 = _warm_start(prev[0], prev[1], commit, layout) if (warm_start and prev is not None) else None
+
+        t0 = time.perf_counter()
+        x, objective = backend.solve(model, x0)
+        seconds = time.perf_counter() - t0
+
+        for name, arr in out.items():
+            arr[..., start:start + keep] = x[layout.blocks[name][..., :keep]]
+        soc_state = x[layout.blocks["soc"][:, keep - 1]]
+        vsoc_state = float(x[layout.blocks["vsoc"][keep - 1]])
+        windows.append({
+            "start": start, "steps": end - start, "committed": keep, "seconds": seconds,
+            "objective": objective, "variables": layout.size, "constraints": model["A"].shape[0],
+        })
+        if verbose:
+            print(f"窗口 {start:>6}-{end:<6} 变量 {layout.size:>7} 求解 {seconds:6.2f} s 目标 {objective:10.4f}")
+        prev = (x, layout)
+        start += keep
+
+    out["cost"] = float(buy @ out["imp"] - sell @ out["exp"])
+    out["windows"] = windows
+    return out
+
+
+# ----------------------------------------------------------------------
+# 考虑馈线拓扑与线损的网络撮合
+# ----------------------------------------------------------------------
+# match_proportional 允许任意买卖方配对、线损按统一的 LINE_ETA 计；这里按辐射状馈线的树形结构撮合：
+# 从叶子向根逐个节点处理，子树内的余电与缺电在最近的公共祖先节点就地匹配（路径最短、线损最小），
+# 剩余部分沿上游线路继续向上，受线路容量限制，超出部分留给电网。
+# 数量以“折算到根节点”的单位保存（余电乘以、缺电除以根节点到所在节点的传输效率），
+# 上移时不需要逐条线路缩放；各节点的待匹配队列按小并大合并，每个时段的耗时与 prosumer 数近似线性。
+# 拓扑的预处理（定向、效率、LCA 倍增表）每个馈线只做一次，按内容哈希缓存，所有时段共用。
+
+_TOPOLOGIES = {}
+
+
+def _line_parameters(m, capacity=None, loss=None):
+    """各线路的容量与线损率（标量广播到 m 条线路，None 取默认值）"""
+    capacity = np.full(m, np.inf) if capacity is None else np.broadcast_to(np.asarray(capacity, dtype=float), (m,))
+    loss = np.full(m, 1 - LINE_ETA) if loss is None else np.broadcast_to(np.asarray(loss, dtype=float), (m,))
+    return capacity, loss
+
+
+class FeederTopology:
+    """
+    辐射状馈线拓扑（预处理结果）
+
+    节点编号为 0..n_nodes-1，root 为变电站（与电网相连）；每条线路给出两端节点、容量与线损率。
+    eff[v] 为根节点到 v 的传输效率（沿途各线路 1 - 线损率 之积），任意两户之间的路径效率为
+    eff[a] * eff[b] / eff[lca(a, b)]²，由倍增表 O(log n) 查询，不需要 n × n 的矩阵。
+    """
+
+    def __init__(self, line_from, line_to, prosumer_node, capacity=None, loss=None, root=0):
+        """
+        Args:
+            line_from: 各线路一端的节点编号
+            line_to: 各线路另一端的节点编号
+            prosumer_node: 各 prosumer 所接的节点编号，长度 N
+            capacity: 各线路容量（kW），None 或 inf 表示不限
+            loss: 各线路线损率，默认每条线路 1 - LINE_ETA
+            root: 变电站节点
+        """
+        line_from = np.asarray(line_from, dtype=np.int64)
+        line_to = np.asarray(line_to, dtype=np.int64)
+        m = len(line_from)
+        n_nodes = int(max(line_from.max(initial=root), line_to.max(initial=root), root)) + 1
+        if m != n_nodes - 1:
+            raise ValueError("馈线必须是辐射状（树形）：线路数应为节点数减一")
+        capacity, loss = _line_parameters(m, capacity, loss)
+
+        # 邻接表（CSR）：按端点排序的线路编号
+        ends = np.concatenate([line_from, line_to])
+        others = np.concatenate([line_to, line_from])
+        line_ids = np.concatenate([np.arange(m), np.arange(m)])
+        by_node = np.argsort(ends, kind="stable")
+        indptr = np.searchsorted(ends[by_node], np.arange(n_nodes + 1))
+        neighbor, neighbor_line = others[by_node], line_ids[by_node]
+
+        # 从根节点广度优先定向：parent、所连上游线路、深度、根到节点的效率
+        parent = np.full(n_nodes, -1, dtype=np.int64)
+        up_line = np.full(n_nodes, -1, dtype=np.int64)
+        depth = np.zeros(n_nodes, dtype=np.int64)
+        eff = np.ones(n_nodes)
+        visited = np.zeros(n_nodes, dtype=bool)
+        visited[root] = True
+        bfs = [root]
+        for v in bfs:
+            for k in range(indptr[v], indptr[v + 1]):
+                c = neighbor[k]
+                if not visited[c]:
+                    visited[c] = True
+                    parent[c], up_line[c], depth[c] = v, neighbor_line[k], depth[v] + 1
+                    eff[c] = eff[v] * (1 - loss[neighbor_line[k]])
+                    bfs.append(c)
+        if len(bfs) != n_nodes:
+            raise ValueError("馈线必须是连通的辐射状网络")
+
+        self.n_nodes = n_nodes
+        self.root = root
+        self.parent = parent
+        self.up_line = up_line
+        self.depth = depth
+        self.eff = eff
+        self.line_from, self.line_to = line_from, line_to
+        self.capacity = capacity
+        self.loss = loss
+        self.prosumer_node = np.asarray(prosumer_node, dtype=np.int64)
+        # 每个节点上游线路每步可传输的电量（kWh），根节点不限
+        self.step_capacity = np.where(up_line >= 0, capacity[np.maximum(up_line, 0)] * DT_H, np.inf)
+        # 叶子优先的处理顺序，以及每个节点下挂的 prosumer
+        self.order = bfs[::-1]
+        members = [[] for _ in range(n_nodes)]
+        for i, v in enumerate(self.prosumer_node.tolist()):
+            members[v].append(i)
+        self.members = members
+
+        # LCA 倍增表：ancestors[k][v] 为 v 向上 2^k 层的祖先（根的祖先是自己）
+        levels = max(1, int(depth.max()).bit_length())
+        ancestors = [np.where(parent >= 0, parent, np.arange(n_nodes))]
+        for _ in range(1, levels):
+            ancestors.append(ancestors[-1][ancestors[-1]])
+        self.ancestors = ancestors
+
+    def lca(self, a, b):
+        """两组节点的最近公共祖先（向量化）"""
+        a = np.array(a, dtype=np.int64, copy=True)
+        b = np.array(b, dtype=np.int64, copy=True)
+        swap = self.depth[a] < self.depth[b]
+        a[swap], b[swap] = b[swap], a[swap]
+        diff = self.depth[a] - self.depth[b]
+        for k, up in enumerate(self.ancestors):
+            lift = (diff >> k) & 1 == 1
+            a[lift] = up[a[lift]]
+        for up in reversed(self.ancestors):
+            move = up[a] != up[b]
+            a[move], b[move] = up[a[move]], up[b[move]]
+        return np.where(a == b, a, self.ancestors[0][a])
+
+    def path_efficiency(self, seller, buyer):
+        """卖方到买方（prosumer 编号）的传输效率"""
+        a, b = self.prosumer_node[seller], self.prosumer_node[buyer]
+        top = self.lca(a, b)
+        return self.eff[a] * self.eff[b] / self.eff[top] ** 2
+
+    def loss_matrix(self, prosumers=None):
+        """prosumer 两两之间的线损率矩阵（n × n，仅用于小规模查看）"""
+        idx = np.arange(len(self.prosumer_node)) if prosumers is None else np.asarray(prosumers)
+        s, b = np.meshgrid(idx, idx, indexing="ij")
+        return 1 - self.path_efficiency(s.ravel(), b.ravel()).reshape(s.shape)
+
+
+def feeder_topology(line_from, line_to, prosumer_node, capacity=None, loss=None, root=0):
+    """与 FeederTopology 参数相同，相同内容的馈线只预处理一次（进程内缓存）"""
+    line_from = np.asarray(line_from, dtype=np.int64)
+    # 按广播后的线路参数生成缓存键：标量与等值数组得到同一个拓扑
+    capacity, loss = _line_parameters(len(line_from), capacity, loss)
+    arrays = [line_from, np.asarray(line_to, dtype=np.int64), np.asarray(prosumer_node, dtype=np.int64),
+              np.ascontiguousarray(capacity), np.ascontiguousarray(loss)]
+    key = (root, *(a.tobytes() for a in arrays))
+    topology = _TOPOLOGIES.get(key)
+    if topology is None:
+        topology = _TOPOLOGIES[key] = FeederTopology(line_from, line_to, prosumer_node, capacity, loss, root)
+    return topology
+
+
+def radial_feeder(n, branching=4, capacity=None, loss=None):
+    """
+    生成一个 n 户的演示馈线：变电站为节点 0，每户一个节点，按广度优先每个节点挂 branching 个下游节点
+
+    Returns:
+        FeederTopology（prosumer i 接在节点 i + 1）
+    """
+    child = np.arange(1, n + 1)
+    return feeder_topology(child, (child - 1) // branching, child, capacity=capacity, loss=loss)
+
+
+def _merge(into, items):
+    """小并大合并两个 [队列, 合计] 累加器"""
+    if into is None:
+        return items
+    if len(into[0]) < len(items[0]):
+        into, items = items, into
+    into[0].extend(items[0])
+    into[1] += items[1]
+    return into
+
+
+def _match_network_step(topo, supply, demand, min_eff):
+    """
+    一个时段的自下而上撮合
+
+    Args:
+        topo: FeederTopology
+        supply: 各户余电（kWh）
+        demand: 各户缺电（kWh）
+        min_eff: 成交所需的最低路径效率；队首的余电/缺电到当前节点的效率已低于它时退出撮合，
+                 队首配对的路径效率低于它时退出其中效率较低的一方（退出的部分留给电网）
+
+    Returns:
+        (买方, 卖方, 在配对节点处的电量, 配对节点) 四个列表
+    """
+    eff = topo.eff
+    node_eff = eff[topo.prosumer_node]
+    own_eff = node_eff.tolist()
+    parent = topo.parent
+    cap = topo.step_capacity
+    sup = [None] * topo.n_nodes
+    dem = [None] * topo.n_nodes
+    buyers, sellers, matched, nodes = [], [], [], []
+    supply_root = (supply * node_eff).tolist()
+    demand_root = (demand / node_eff).tolist()
+    for v in topo.order:
+        s_acc, d_acc = sup[v], dem[v]
+        for i in topo.members[v]:
+            if supply_root[i] > MATCH_EPS:
+                s_acc = _merge(s_acc, [deque([[i, supply_root[i]]]), supply_root[i]])
+            elif demand_root[i] > MATCH_EPS:
+                d_acc = _merge(d_acc, [deque([[i, demand_root[i]]]), demand_root[i]])
+        ev = eff[v]
+        # 在节点 v 就地匹配：余电折算为 u / ev，缺电折算为 w * ev
+        if s_acc is not None and d_acc is not None:
+            s_items, d_items = s_acc[0], d_acc[0]
+            while s_items and d_items:
+                si, di = s_items[0], d_items[0]
+                s_eff = own_eff[si[0]] / ev
+                d_eff = own_eff[di[0]] / ev
+                if s_eff * d_eff < min_eff:
+                    if s_eff <= d_eff:
+                        s_acc[1] -= si[1]
+                        s_items.popleft()
+                    else:
+                        d_acc[1] -= di[1]
+                        d_items.popleft()
+                    continue
+                m = min(si[1] / ev, di[1] * ev)
+                sellers.append(si[0])
+                buyers.append(di[0])
+                matched.append(m)
+                nodes.append(v)
+                si[1] -= m * ev
+                di[1] -= m / ev
+                s_acc[1] -= m * ev
+                d_acc[1] -= m / ev
+                if si[1] <= MATCH_EPS:
+                    s_items.popleft()
+                if di[1] <= MATCH_EPS:
+                    d_items.popleft()
+            if not s_items:
+                s_acc = None
+            if not d_items:
+                d_acc = None
+        p = parent[v]
+        if p < 0:
+            break
+        # 剩余部分经上游线路送往父节点，超出线路容量的部分从队尾退回（留给电网）
+        if s_acc is not None:
+            _curtail(s_acc, cap[v] * ev)  # 送端（节点 v）电量上限，折算到根节点单位
+            sup[p] = _merge(sup[p], s_acc) if s_acc[0] else sup[p]
+        if d_acc is not None:
+            _curtail(d_acc, cap[v] / eff[p])  # 送端（父节点）电量上限，折算到根节点单位
+            dem[p] = _merge(dem[p], d_acc) if d_acc[0] else dem[p]
+    return buyers, sellers, matched, nodes
+
+
+def _curtail(acc, limit):
+    """把累加器的合计削减到 limit 以内（从队尾开始）"""
+    items = acc[0]
+    while acc[1] > limit + MATCH_EPS and items:
+        excess = acc[1] - limit
+        if items[-1][1] <= excess:
+            acc[1] -= items.pop()[1]
+        else:
+            items[-1][1] -= excess
+            acc[1] = limit
+
+
+def match_network(pv, load, price_internal, price_buy, price_sell, topology, start_balance=START_BAL, ledger=True,
+                  min_efficiency=None):
+    """
+    网络撮合：按馈线拓扑就近匹配，计入沿途线损并遵守线路容量
+
+    双方按买方收到的电量以内部价结算，卖方多送出的部分即线损（由卖方承担）；
+    路径效率低于 min_efficiency 的配对不成交。未匹配的缺电从电网购入、余电上网
+    （与 match_proportional 相同，电网交易不计线损与容量）。
+
+    Args:
+        pv: (N, steps) 每步光伏发电量（kWh）
+        load: (N, steps) 每步负荷（kWh）
+        price_internal: (steps,) 内部结算价
+        price_buy: (steps,) 电网购电价
+        price_sell: (steps,) 上网电价
+        topology: FeederTopology（见 feeder_topology / radial_feeder）
+        start_balance: 初始钱包余额（标量或长度 N）
+        ledger: 是否生成逐笔账本
+        min_efficiency: 成交所需的最低路径效率（标量或 (steps,)），默认 上网电价 / 内部价，
+                        即卖方扣除线损后的收入不低于直接上网
+
+    Returns:
+        与 match_proportional 相同的结果字典，另含 loss_energy（每步线损）、line_flow（各节点上游线路每步的 P2P 潮流，
+        正为向上送电）和 congested（各节点上游线路达到容量的步数）；账本中内部交易的电量为买方收到的电量
+    """
+    pv = np.asarray(pv, dtype=float)
+    load = np.asarray(load, dtype=float)
+    price_internal = np.asarray(price_internal, dtype=float)
+    price_buy = np.asarray(price_buy, dtype=float)
+    price_sell = np.asarray(price_sell, dtype=float)
+    n, steps = pv.shape
+    if len(topology.prosumer_node) != n:
+        raise ValueError("馈线拓扑的 prosumer 数与输入不一致")
+    net = pv - load
+    supply = np.maximum(net, 0.0)
+    demand = np.maximum(-net, 0.0)
+    node_eff = topology.eff[topology.prosumer_node]
+    if min_efficiency is None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            min_efficiency = np.where(price_internal > 0, price_sell / price_internal, np.inf)
+    min_efficiency = np.broadcast_to(np.asarray(min_efficiency, dtype=float), (steps,))
+
+    # 各节点子树向上送出 / 从上游收到的成交电量（根节点单位），之后按子树累加得到线路潮流
+    n_nodes = topology.n_nodes
+    flow_up = np.zeros((n_nodes, steps))
+    flow_down = np.zeros((n_nodes, steps))
+    sent = np.zeros((n, steps))
+    received = np.zeros((n, steps))
+    earn_internal = np.zeros(n)
+    trades = []
+    for t in range(steps):
+        buyers, sellers, matched, nodes = _match_network_step(topology, supply[:, t], demand[:, t],
+                                                              float(min_efficiency[t]))
+        b = np.asarray(buyers, dtype=np.int64)
+        s = np.asarray(sellers, dtype=np.int64)
+        x = np.asarray(nodes, dtype=np.int64)
+        at_node = topology.eff[x]
+        m = np.asarray(matched, dtype=float)
+        flow_up[:, t] = (np.bincount(topology.prosumer_node[s], m * at_node, minlength=n_nodes)
+                         - np.bincount(x, m * at_node, minlength=n_nodes))
+        flow_down[:, t] = (np.bincount(topology.prosumer_node[b], m / at_node, minlength=n_nodes)
+                           - np.bincount(x, m / at_node, minlength=n_nodes))
+        delivered = m * node_eff[b] / at_node
+        energy_sent = m * at_node / node_eff[s]
+        received[:, t] = np.bincount(b, delivered, minlength=n)
+        sent[:, t] = np.bincount(s, energy_sent, minlength=n)
+        earn_internal += np.bincount(s, delivered, minlength=n) * price_internal[t]
+        if ledger:
+            trades.append((np.full(len(b), t, dtype=np.int64), b, s, delivered))
+
+    for v in topology.order:
+        p = topology.parent[v]
+        if p >= 0:
+            flow_up[p] += flow_up[v]
+            flow_down[p] += flow_down[v]
+    # 上送潮流按送端（节点 v）计，下送潮流按送端（父节点）计
+    parent_eff = topology.eff[np.maximum(topology.parent, 0)]
+    line_flow = flow_up / topology.eff[:, None] - flow_down * parent_eff[:, None]
+    line_flow[topology.root] = 0.0
+    line_flow[np.abs(line_flow) <= MATCH_EPS] = 0.0
+
+    import_e = np.maximum(demand - received, 0.0)
+    export_e = np.maximum(supply - sent, 0.0)
+    import_e[import_e <= MATCH_EPS] = 0.0
+    export_e[export_e <= MATCH_EPS] = 0.0
+    internal_energy = received.sum(axis=0)
+    loss_energy = sent.sum(axis=0) - internal_energy
+    ext_buy_energy = import_e.sum(axis=0)
+    ext_sell_energy = export_e.sum(axis=0)
+
+    # 交易双方按买方收到的电量结算，卖方多送出的部分为线损
+    user = {
+        "pv": pv.sum(axis=1),
+        "load": load.sum(axis=1),
+        "internal_buy": received.sum(axis=1),
+        "internal_sell": sent.sum(axis=1),
+        "external_import": import_e.sum(axis=1),
+        "external_export": export_e.sum(axis=1),
+        "pay_internal": received @ price_internal,
+        "earn_internal": earn_internal,
+        "pay_external": import_e @ price_buy,
+        "earn_external": export_e @ price_sell,
+    }
+    internal_amount = internal_energy * price_internal
+    external_amount = ext_buy_energy * price_buy - ext_sell_energy * price_sell
+    wallet_start = np.broadcast_to(np.asarray(start_balance, dtype=float), (n,)).copy()
+    wallet_end = (wallet_start + user["earn_internal"] + user["earn_external"]
+                  - user["pay_internal"] - user["pay_external"])
+
+    saturated = (line_flow != 0) & (np.abs(line_flow) >= topology.step_capacity[:, None] * (1 - 1e-9))
+    result = {
+        "internal_energy": internal_energy,
+        "loss_energy": loss_energy,
+        "ext_buy_energy": ext_buy_energy,
+        "ext_sell_energy": ext_sell_energy,
+        "internal_amount": internal_amount,
+        "external_amount": external_amount,
+        "wallet_start": wallet_start,
+        "wallet_end": wallet_end,
+        "user": user,
+        "line_flow": line_flow,
+        "congested": saturated.sum(axis=1),
+        "community": {
+            "internal_kWh": float(internal_energy.sum()),
+            "loss_kWh": float(loss_energy.sum()),
+            "import_kWh": float(ext_buy_energy.sum()),
+            "export_kWh": float(ext_sell_energy.sum()),
+            "internal_amount": float(internal_amount.sum()),
+            "external_amount": float(external_amount.sum()),
+        },
+    }
+    if ledger:
+        it, ii = np.nonzero(import_e.T > 0)
+        result["ledger"] = _build_ledger(trades, [(it, ii, import_e[ii, it])],
+                                         price_internal, price_buy)
+    return result
+
+
+if __name__ == "__main__":
+    # 测试：当传入空列表时不会报错
+    print(calculate_average([]))
+
+    r = simulate(rng=np.random.default_rng(0))
+    c = r["community"]
+    print(f"内部撮合 {c['internal_kWh']:.2f} kWh，外购 {c['import_kWh']:.2f} kWh，上网 {c['export_kWh']:.2f} kWh")
+    for name, start, end in zip(NAMES, r["wallet_start"], r["wallet_end"]):
+        print(f"{name}: {start:.2f} → {end:.2f} SLR")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vectorized remove_white_bg against the original per-pixel loop.
+
+Usage:
+  python3 tools/benchmark_convert_logo.py [--sizes 512 1024 3840] [--loop-max 1024]
+
+A synthetic logo (white background, coloured shapes, anti-aliased edges, a partly
+transparent corner) is generated for each size. The original loop is only timed up
+to --loop-max pixels per side; above that its time is extrapolated from the largest
+measured size (it is linear in the pixel count).
+"""
+from __future__ import annotations
+import argparse
+import time
+
+import numpy as np
+from PIL import Image, ImageChops, ImageDraw, ImageFilter
+
+from convert_logo_to_transparent import background_mask, remove_white_bg, to_rgba
+
+
+def synthetic_logo(size: int) -> Image.Image:
+    im = Image.new("RGBA", (size, size), (255, 255, 255, 255))
+    draw = ImageDraw.Draw(im)
+    s = size / 100
+    draw.ellipse([20 * s, 20 * s, 80 * s, 80 * s], fill=(242, 169, 0, 255))
+    draw.rectangle([35 * s, 45 * s, 65 * s, 55 * s], fill=(30, 60, 120, 255))
+    draw.text((5 * s, 88 * s), "SolarCoin", fill=(250, 230, 230, 255))
+    draw.ellipse([70 * s, 5 * s, 95 * s, 30 * s], fill=(255, 235, 235, 255))  # pale pink: white-ish but saturated
+    im = im.filter(ImageFilter.GaussianBlur(radius=max(1, size // 400)))
+    alpha = np.asarray(im.getchannel("A")).copy()
+    alpha[: size // 10, : size // 10] = 0
+    alpha[size // 10: size // 5, : size // 10] = 128
+    im.putalpha(Image.fromarray(alpha))
+    return im
+
+
+def background_mask_loop(im: Image.Image, white_th: int = 245) -> Image.Image:
+    """The original mask construction: a Python loop over every pixel."""
+    im = to_rgba(im)
+    px = im.load()
+    w, h = im.size
+    mask = Image.new("L", (w, h), 0)
+    mp = mask.load()
+    for y in range(h):
+        for x in range(w):
+            r, g, b, a = px[x, y]
+            if a == 0:
+                continue
+            if r >= white_th and g >= white_th and b >= white_th:
+                mp[x, y] = 255
+    return mask
+
+
+def remove_white_bg_loop(im: Image.Image, white_th: int = 245, feather: int = 2) -> Image.Image:
+    """The original implementation with the alpha fixed to min(original, inv)."""
+    im = to_rgba(im)
+    mask = background_mask_loop(im, white_th)
+    if feather > 0:
+        mask = mask.filter(ImageFilter.GaussianBlur(radius=feather))
+    inv = Image.eval(mask, lambda v: 255 - v)
+    out = im.copy()
+    out.putalpha(ImageChops.darker(im.getchannel("A"), inv))
+    return out
+
+
+def timed(fn, *args, repeat: int = 1, **kwargs):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[512, 1024, 2048, 3840])
+    parser.add_argument("--loop-max", type=int, default=1024)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'mask loop':>10} {'mask vec':>9} {'speedup':>8} {'total loop':>11} {'total vec':>10}"
+          f" {'speedup':>8}  check")
+    per_pixel = None
+    for size in args.sizes:
+        im = synthetic_logo(size)
+        _, m_fast = timed(background_mask, im, repeat=3)
+        fast, t_fast = timed(remove_white_bg, im, repeat=3)
+        if size <= args.loop_max:
+            _, m_slow = timed(background_mask_loop, im)
+            slow, t_slow = timed(remove_white_bg_loop, im)
+            per_pixel = (m_slow / size ** 2, t_slow / size ** 2)
+            # With white_th=245 every near-white pixel has saturation <= 10/255, so the
+            # saturation test changes nothing and the outputs must match exactly.
+            same = ImageChops.difference(fast, slow).getbbox() is None
+            check = "identical" if same else "DIFFERENT"
+        else:
+            m_slow, t_slow = (p * size ** 2 for p in per_pixel) if per_pixel else (float("nan"),) * 2
+            check = "loop extrapolated"
+        print(f"{size:>6} {m_slow:10.3f} {m_fast:9.4f} {m_slow / m_fast:7.0f}x {t_slow:11.3f} {t_fast:10.4f}"
+              f" {t_slow / t_fast:7.0f}x  {check}")
+    print("(the Gaussian feather is the same PIL call in both versions and dominates the vectorized total)")
+
+    im = synthetic_logo(512)
+    loose = int((np.asarray(background_mask(im, white_th=200, max_sat=1.0)) > 0).sum())
+    strict = int((np.asarray(background_mask(im, white_th=200)) > 0).sum())
+    print(f"white_th=200: {loose} background pixels without the saturation test, {strict} with it")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -5,17 +5,33 @@ dark theme used by the web UI. Keeps the original colors and softly feathers edg
 
 Usage:
   python3 tools/convert_logo_to_transparent.py <input_image> [output_png] [--white-th 245] [--feather 2]
+                                               [--max-sat 0.1]
+  python3 tools/convert_logo_to_transparent.py <input_dir|"glob/**/*.png"> [output_dir] [--jobs N] [--force]
+                                               [--white-th 245] [--feather 2] [--max-sat 0.1]
 
 Notes:
   - A pixel is regarded as background if all RGB channels are >= white_th and its
-    saturation is low. Those pixels will have alpha set to 0 with a soft feather.
+    saturation (max-min)/max is <= max_sat. Those pixels will have alpha set to 0
+    with a soft feather; the original alpha is kept everywhere else.
   - If output path is omitted, defaults to web/logo.png
+  - Batch mode (a directory or a glob pattern as input) converts every image in one
+    process with a pool of N workers (default: CPU count) and writes PNGs under
+    output_dir (default: <input_dir>/transparent), keeping the relative layout.
+    A content-hash cache (.convert_cache.json in output_dir) skips inputs whose bytes
+    and settings are unchanged since the last run; --force converts everything.
 """
 from __future__ import annotations
+import glob
+import hashlib
+import json
+import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Tuple
 
+import numpy as np
 from PIL import Image, ImageFilter, ImageChops
 
 
@@ -27,61 +43,184 @@ def to_rgba(im: Image.Image) -> Image.Image:
     return im.convert("RGBA")
 
 
-def remove_white_bg(im: Image.Image, white_th: int = 245, feather: int = 2) -> Image.Image:
+def background_mask(im: Image.Image, white_th: int = 245, max_sat: float = 0.1) -> Image.Image:
+    """Binary "L" mask (255 = background) of near-white, low-saturation, non-transparent pixels."""
+    # One contiguous array per band is much faster to combine than strided views into RGBA
+    r, g, b, a = (np.asarray(band) for band in to_rgba(im).split())
+    lo = np.minimum(np.minimum(r, g), b)
+    hi = np.maximum(np.maximum(r, g), b)
+    # HSV saturation (hi - lo) / hi, written without the division
+    low_sat = (hi - lo) <= max_sat * hi.astype(np.float32)
+    mask = (a != 0) & (lo >= white_th) & low_sat
+    return Image.fromarray(mask.astype(np.uint8) * 255)
+
+
+def remove_white_bg(im: Image.Image, white_th: int = 245, feather: int = 2, max_sat: float = 0.1) -> Image.Image:
     im = to_rgba(im)
-    px = im.load()
-    w, h = im.size
-
-    # Build an initial binary mask for near-white pixels
-    mask = Image.new("L", (w, h), 0)
-    mp = mask.load()
-    for y in range(h):
-        for x in range(w):
-            r, g, b, a = px[x, y]
-            if a == 0:
-                continue
-            if r >= white_th and g >= white_th and b >= white_th:
-                mp[x, y] = 255
+    mask = background_mask(im, white_th, max_sat)
 
     # Feather edges to avoid harsh cut
     if feather > 0:
         mask = mask.filter(ImageFilter.GaussianBlur(radius=feather))
 
     # Invert mask -> keep foreground alpha, zero out background
-    inv = Image.eval(mask, lambda v: 255 - v)
+    inv = ImageChops.invert(mask)
     # Combine original alpha with inverted mask (min)
-    alpha = Image.new("L", (w, h), 255)
-    alpha = ImageChops.lighter(alpha, inv)
+    alpha = ImageChops.darker(im.getchannel("A"), inv)
 
     out = im.copy()
     out.putalpha(alpha)
     return out
 
 
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tif", ".tiff"}
+CACHE_NAME = ".convert_cache.json"
+
+
+def convert_file(src: Path, dst: Path, white_th: int = 245, feather: int = 2, max_sat: float = 0.1) -> float:
+    """Convert one image file to a transparent PNG; returns the elapsed seconds."""
+    start = time.perf_counter()
+    with Image.open(src) as im:
+        out = remove_white_bg(im, white_th=white_th, feather=feather, max_sat=max_sat)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    out.save(dst, format='PNG')
+    return time.perf_counter() - start
+
+
+def find_inputs(pattern: str) -> Tuple[Path, list[Path]]:
+    """Resolve a directory or glob pattern to (base_dir, image files)."""
+    if Path(pattern).is_dir():
+        base = Path(pattern)
+        files = [p for p in base.rglob("*") if p.is_file()]
+    else:
+        # The base is the leading part of the pattern without wildcards
+        parts = []
+        for part in Path(pattern).parts:
+            if glob.has_magic(part):
+                break
+            parts.append(part)
+        base = Path(*parts) if parts else Path(".")
+        files = [Path(p) for p in glob.glob(pattern, recursive=True) if Path(p).is_file()]
+    return base, sorted(p for p in files if p.suffix.lower() in IMAGE_SUFFIXES)
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _convert_job(job: Tuple[str, str, int, int, float]) -> Tuple[str, float, str | None]:
+    src, dst, white_th, feather, max_sat = job
+    try:
+        return src, convert_file(Path(src), Path(dst), white_th, feather, max_sat), None
+    except Exception as e:  # report and keep going with the rest of the batch
+        return src, 0.0, f"{type(e).__name__}: {e}"
+
+
+def convert_batch(pattern: str, out_dir: Path | None = None, white_th: int = 245, feather: int = 2,
+                  max_sat: float = 0.1, jobs: int | None = None, force: bool = False) -> dict:
+    """
+    Convert every image matched by a directory or glob pattern in one process.
+
+    Unchanged inputs (same content hash and settings, output still present) are skipped.
+    Returns a summary dict: converted, skipped, failed, seconds and per-file timings.
+    """
+    start = time.perf_counter()
+    base, files = find_inputs(pattern)
+    out_dir = out_dir or base / "transparent"
+    # Never feed outputs back in: skip out_dir and any other output tree (marked by its cache file)
+    output_dirs = {out_dir.resolve()} | {c.parent.resolve() for c in base.rglob(CACHE_NAME)}
+    files = [p for p in files if output_dirs.isdisjoint(p.resolve().parents)]
+    cache_path = out_dir / CACHE_NAME
+    try:
+        cache = json.loads(cache_path.read_text())
+    except (OSError, ValueError):
+        cache = {}
+    settings = [white_th, feather, max_sat]
+
+    todo, digests, skipped = [], {}, []
+    for src in files:
+        rel = src.relative_to(base) if base in src.parents else Path(src.name)
+        dst = (out_dir / rel).with_suffix(".png")
+        digest = file_digest(src)
+        entry = cache.get(str(rel))
+        if (not force and entry and entry["sha256"] == digest and entry["settings"] == settings
+                and dst.exists()):
+            skipped.append(str(src))
+            print(f"[SKIP] {src} (unchanged)")
+            continue
+        digests[str(src)] = (str(rel), digest, str(dst))
+        todo.append((str(src), str(dst), white_th, feather, max_sat))
+
+    timings, failed = {}, {}
+    if todo:
+        workers = min(jobs or os.cpu_count() or 1, len(todo))
+        # With one worker there is nothing to gain from starting a pool
+        if workers == 1:
+            results = map(_convert_job, todo)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            results = pool.map(_convert_job, todo, chunksize=max(1, len(todo) // (workers * 4)))
+        for src, seconds, error in results:
+            rel, digest, dst = digests[src]
+            if error is not None:
+                failed[src] = error
+                print(f"[ERR] {src}: {error}")
+                continue
+            timings[src] = seconds
+            cache[rel] = {"sha256": digest, "settings": settings, "output": dst}
+            print(f"[WRITE] {dst} ({seconds * 1000:.0f} ms)")
+        if workers > 1:
+            pool.shutdown()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache, indent=2, sort_keys=True))
+
+    seconds = time.perf_counter() - start
+    print(f"[DONE] {len(timings)} converted, {len(skipped)} unchanged, {len(failed)} failed "
+          f"in {seconds:.2f}s" + (f" (slowest {max(timings.values()) * 1000:.0f} ms)" if timings else ""))
+    return {"converted": timings, "skipped": skipped, "failed": failed, "seconds": seconds}
+
+
 def main(argv: list[str]) -> int:
     if len(argv) < 2:
         print(__doc__)
         return 2
+    batch = Path(argv[1]).is_dir() or glob.has_magic(argv[1])
     src = Path(argv[1])
-    dst = Path(argv[2]) if len(argv) >= 3 and not argv[2].startswith('--') else Path('web/logo.png')
+    dst = Path(argv[2]) if len(argv) >= 3 and not argv[2].startswith('--') else None
     white_th = 245
     feather = 2
+    max_sat = 0.1
+    jobs = None
+    force = False
     # Parse optional flags
     for i, a in enumerate(argv[2:], start=2):
         if a == '--white-th' and i + 1 < len(argv):
             white_th = int(argv[i + 1])
         if a == '--feather' and i + 1 < len(argv):
             feather = int(argv[i + 1])
+        if a == '--max-sat' and i + 1 < len(argv):
+            max_sat = float(argv[i + 1])
+        if a == '--jobs' and i + 1 < len(argv):
+            jobs = int(argv[i + 1])
+        if a == '--force':
+            force = True
+
+    if batch:
+        summary = convert_batch(argv[1], dst, white_th=white_th, feather=feather, max_sat=max_sat,
+                                jobs=jobs, force=force)
+        return 1 if summary["failed"] else 0
 
     if not src.exists():
         print(f"[ERR] Input not found: {src}")
         return 1
 
-    im = Image.open(src)
-    out = remove_white_bg(im, white_th=white_th, feather=feather)
-    dst.parent.mkdir(parents=True, exist_ok=True)
-    out.save(dst, format='PNG')
-    print(f"[WRITE] {dst}")
+    dst = dst or Path('web/logo.png')
+    seconds = convert_file(src, dst, white_th=white_th, feather=feather, max_sat=max_sat)
+    print(f"[WRITE] {dst} ({seconds * 1000:.0f} ms)")
     return 0
 
 
@@ -0,0 +1,241 @@
+"""
+AEMO 数据的增量汇总
+
+每个 区域/月份 分区写入时顺便计算一份可合并的部分汇总（按 区域 × 小时 × 星期 分组的
+count / sum / sumsq / min / max，以及各价格区间的计数），保存在数据集的 _aggregates 目录下。
+新增或修订一个月只重算这个月；跨月、跨年的按小时曲线、价格区间统计直接合并部分汇总得到，
+不再扫描原始数据。
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+# 价格区间：与原来 categorize_price 的判断一致（<50、<100、<200、其余）
+PRICE_BAND_EDGES = np.array([50.0, 100.0, 200.0])
+PRICE_BAND_LABELS = ['低价格 (<50)', '中等价格 (50-100)', '高价格 (100-200)', '极高价格 (>200)']
+BAND_COLUMNS = [f"band_{i}" for i in range(len(PRICE_BAND_LABELS))]
+
+GROUP_KEYS = ["region", "hour", "dow"]
+VALUE_COLUMNS = {"RRP": "rrp", "TOTALDEMAND": "demand"}
+SUM_COLUMNS = ["count", "rrp_count", "rrp_sum", "rrp_sumsq",
+               "demand_count", "demand_sum", "demand_sumsq"] + BAND_COLUMNS
+MIN_COLUMNS = ["rrp_min", "demand_min", "ts_min"]
+MAX_COLUMNS = ["rrp_max", "demand_max", "ts_max"]
+
+
+def price_band_codes(rrp):
+    """价格区间编号（0~3），向量化分箱；NaN 与原逻辑一样归入最高区间"""
+    return np.searchsorted(PRICE_BAND_EDGES, np.asarray(rrp, dtype=float), side="right")
+
+
+def categorize_prices(rrp):
+    """价格区间分类（pandas Categorical），代替逐行 apply(categorize_price)"""
+    return pd.Categorical.from_codes(price_band_codes(rrp), categories=PRICE_BAND_LABELS)
+
+
+def month_aggregates(df):
+    """
+    计算一批数据（通常是一个区域一个月）的部分汇总
+
+    Args:
+        df: 含 SETTLEMENTDATE、REGION、RRP、TOTALDEMAND 列的 DataFrame
+
+    Returns:
+        按 region × hour × dow 分组的部分汇总 DataFrame
+    """
+    if df.empty:
+        return pd.DataFrame(columns=GROUP_KEYS + SUM_COLUMNS + MIN_COLUMNS + MAX_COLUMNS)
+
+    ts = df["SETTLEMENTDATE"]
+    regions = pd.Categorical(df["REGION"].astype(str))
+    key = (regions.codes.astype(np.int64) * 24 + ts.dt.hour.to_numpy()) * 7 + ts.dt.dayofweek.to_numpy()
+    groups = pd.RangeIndex(len(regions.categories) * 24 * 7)
+    n = len(groups)
+
+    out = pd.DataFrame({
+        "region": np.repeat(np.asarray(regions.categories), 24 * 7),
+        "hour": np.tile(np.repeat(np.arange(24), 7), len(regions.categories)),
+        "dow": np.tile(np.arange(7), 24 * len(regions.categories)),
+    })
+    out["count"] = np.bincount(key, minlength=n)
+    grouped = pd.DataFrame({"key": key, "ts": ts.to_numpy()})
+    for column, prefix in VALUE_COLUMNS.items():
+        # float32 存储的数值先还原为两位小数的 float64，与报表、原始 CSV 的统计口径一致
+        values = df[column].to_numpy(dtype=np.float64).round(2)
+        valid = ~np.isnan(values)
+        out[f"{prefix}_count"] = np.bincount(key[valid], minlength=n)
+        out[f"{prefix}_sum"] = np.bincount(key[valid], weights=values[valid], minlength=n)
+        out[f"{prefix}_sumsq"] = np.bincount(key[valid], weights=values[valid] ** 2, minlength=n)
+        grouped[prefix] = values
+    bands = price_band_codes(df["RRP"].to_numpy(dtype=np.float64).round(2))
+    band_counts = np.bincount(key * len(BAND_COLUMNS) + bands, minlength=n * len(BAND_COLUMNS))
+    out[BAND_COLUMNS] = band_counts.reshape(n, len(BAND_COLUMNS))
+
+    extremes = grouped.groupby("key").agg(
+        rrp_min=("rrp", "min"), rrp_max=("rrp", "max"),
+        demand_min=("demand", "min"), demand_max=("demand", "max"),
+        ts_min=("ts", "min"), ts_max=("ts", "max"),
+    )
+    out = out.join(extremes.reindex(groups))
+    return out[out["count"] > 0].reset_index(drop=True)
+
+
+def merge_aggregates(parts, by=GROUP_KEYS):
+    """
+    合并多份部分汇总
+
+    Args:
+        parts: 部分汇总 DataFrame 列表
+        by: 合并后的分组键（GROUP_KEYS 的子集，例如 ['region', 'hour']）
+
+    Returns:
+        合并后的汇总 DataFrame
+    """
+    parts = [p for p in parts if not p.empty]
+    if not parts:
+        return pd.DataFrame(columns=list(by) + SUM_COLUMNS + MIN_COLUMNS + MAX_COLUMNS)
+    combined = pd.concat(parts, ignore_index=True)
+    spec = {c: "sum" for c in SUM_COLUMNS}
+    spec.update({c: "min" for c in MIN_COLUMNS})
+    spec.update({c: "max" for c in MAX_COLUMNS})
+    if not by:
+        return combined.groupby(np.zeros(len(combined), dtype=int)).agg(spec).reset_index(drop=True)
+    return combined.groupby(list(by), sort=True).agg(spec).reset_index()
+
+
+def finalize(merged):
+    """由 count / sum / sumsq 计算均值与样本标准差（ddof=1，与 pandas 的 std 一致）"""
+    out = merged.copy()
+    for prefix in VALUE_COLUMNS.values():
+        # 只统计非缺失值（例如 MMS 调度价格表没有需求列）
+        count = out[f"{prefix}_count"].astype(float)
+        mean = out[f"{prefix}_sum"].astype(float) / count
+        var = (out[f"{prefix}_sumsq"].astype(float) - count * mean ** 2) / (count - 1)
+        out[f"{prefix}_mean"] = mean.where(count > 0)
+        out[f"{prefix}_std"] = np.sqrt(np.maximum(var, 0.0)).where(count > 1)
+    return out
+
+
+class AggregateStore:
+    """按 区域/年/月 保存的部分汇总（与数据分区一一对应）"""
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, region, year, month):
+        return os.path.join(self.root, f"{region}_{year}{month:02d}.parquet")
+
+    def update_month(self, region, year, month, df):
+        """重算并替换某区域某月的部分汇总"""
+        return self.save_month(region, year, month, month_aggregates(df))
+
+    def save_month(self, region, year, month, partial):
+        """保存（替换）某区域某月已算好的部分汇总"""
+        path = self.path(region, year, month)
+        tmp = path + ".tmp"
+        partial.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return partial
+
+    def has_month(self, region, year, month):
+        return os.path.exists(self.path(region, year, month))
+
+    def load(self, regions=None, start=None, end=None):
+        """
+        读取部分汇总
+
+        Args:
+            regions: 区域列表，None 表示全部
+            start: 起始月份 (year, month)，含
+            end: 结束月份 (year, month)，含
+
+        Returns:
+            部分汇总 DataFrame 列表
+        """
+        parts = []
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith(".parquet"):
+                continue
+            region, period = name[:-len(".parquet")].rsplit("_", 1)
+            ym = (int(period[:4]), int(period[4:]))
+            if regions and region not in regions:
+                continue
+            if (start and ym < tuple(start)) or (end and ym > tuple(end)):
+                continue
+            parts.append(pd.read_parquet(os.path.join(self.root, name)))
+        return parts
+
+    def profile(self, regions=None, start=None, end=None, by=("region", "hour")):
+        """
+        合并得到按小时（或 小时 × 星期）的价格/需求统计
+
+        Args:
+            regions: 区域列表
+            start: 起始月份 (year, month)
+            end: 结束月份 (year, month)
+            by: 分组键，例如 ('region', 'hour')、('region', 'hour', 'dow')、('hour',)
+
+        Returns:
+            含 count、rrp_mean/std/min/max、demand_mean/std/min/max 的 DataFrame
+        """
+        return finalize(merge_aggregates(self.load(regions, start, end), by))
+
+    def price_bands(self, regions=None, start=None, end=None, by=("region",)):
+        """各价格区间的数据点数量"""
+        merged = merge_aggregates(self.load(regions, start, end), by)
+        out = merged[list(by) + BAND_COLUMNS].rename(columns=dict(zip(BAND_COLUMNS, PRICE_BAND_LABELS)))
+        return out
+
+
+def report_tables(partial):
+    """
+    由一份（或合并后的）部分汇总生成 Excel 报表的统计摘要、按小时统计、价格分类统计三张表
+
+    Args:
+        partial: 单个区域的部分汇总（month_aggregates 或 AggregateStore.load 的结果）
+
+    Returns:
+        (summary_df, hourly_stats, price_category_stats)
+    """
+    total = finalize(merge_aggregates([partial], by=()))
+    t = total.iloc[0]
+    summary_df = pd.DataFrame({
+        '统计项目': [
+            '数据点总数',
+            '时间范围',
+            '平均价格 (澳元/MWh)',
+            '最高价格 (澳元/MWh)',
+            '最低价格 (澳元/MWh)',
+            '价格标准差',
+            '平均需求 (MW)',
+            '最高需求 (MW)',
+            '最低需求 (MW)'
+        ],
+        '数值': [
+            int(t['count']),
+            f"{pd.Timestamp(t['ts_min'])} 到 {pd.Timestamp(t['ts_max'])}",
+            round(float(t['rrp_mean']), 2),
+            round(float(t['rrp_max']), 2),
+            round(float(t['rrp_min']), 2),
+            round(float(t['rrp_std']), 2),
+            round(float(t['demand_mean']), 2),
+            round(float(t['demand_max']), 2),
+            round(float(t['demand_min']), 2)
+        ]
+    })
+
+    hourly = finalize(merge_aggregates([partial], by=("hour",))).set_index("hour")
+    hourly_stats = hourly[["rrp_mean", "rrp_max", "rrp_min", "rrp_std",
+                           "demand_mean", "demand_max", "demand_min"]].astype(float).round(2)
+    hourly_stats.index.name = 'HOUR'
+    hourly_stats.columns = ['平均价格', '最高价格', '最低价格', '价格标准差',
+                            '平均需求', '最高需求', '最低需求']
+
+    counts = merge_aggregates([partial], by=())[BAND_COLUMNS].iloc[0].astype(int)
+    price_category_stats = pd.DataFrame({'价格分类': PRICE_BAND_LABELS, '数据点数量': counts.to_numpy()})
+    price_category_stats = price_category_stats[price_category_stats['数据点数量'] > 0]
+    price_category_stats = price_category_stats.sort_values('数据点数量', ascending=False, kind='stable')
+    return summary_df, hourly_stats, price_category_stats.reset_index(drop=True)
@@ -0,0 +1,334 @@
+"""
+AEMO 价格/需求数据批量下载
+
+按 区域 × 月份 并发下载 PRICE_AND_DEMAND 月度文件：
+- 所有线程共享一个 requests.Session（keep-alive 连接池）
+- 按主机做令牌桶限速，代替原来每次随机 sleep 1~3 秒
+- 记录每个文件的 ETag / Last-Modified，再次运行时发条件请求，未变化的月份只花一次 304
+- 响应体流式写入临时文件后原子替换，中途失败不会留下半个文件
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_URL = "https://aemo.com.au/aemo/data/nem/priceanddemand"
+HOME_URL = "https://aemo.com.au/"
+REGIONS = ["QLD1", "NSW1", "VIC1", "SA1", "TAS1"]
+
+# 设置请求头，模拟浏览器访问
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+    'Referer': 'https://aemo.com.au/'
+}
+
+CACHE_FILE = "_http_cache.json"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def month_filename(region, year, month):
+    """AEMO 月度价格/需求文件名"""
+    return f"PRICE_AND_DEMAND_{year}{month:02d}_{region}.csv"
+
+
+def month_range(start, end=None):
+    """
+    月份区间（含两端）
+
+    Args:
+        start: 'YYYY-MM' 或 (year, month)
+        end: 'YYYY-MM' 或 (year, month)，默认当前月
+
+    Returns:
+        [(year, month), ...]
+    """
+    def parse(value):
+        if isinstance(value, str):
+            year, month = value.split("-")
+            return int(year), int(month)
+        return tuple(value)
+
+    now = datetime.now()
+    y, m = parse(start)
+    end_y, end_m = parse(end) if end is not None else (now.year, now.month)
+    months = []
+    while (y, m) <= (end_y, end_m):
+        months.append((y, m))
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return months
+
+
+class RateLimiter:
+    """令牌桶限速：平均每秒 rate 个请求，允许 burst 个突发"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """取得一个令牌，必要时等待"""
+        if not self.rate:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class AEMOFetcher:
+    """AEMO 月度数据并发下载器"""
+
+    def __init__(self, data_dir=None, base_url=BASE_URL, home_url=HOME_URL, max_workers=8,
+                 rate_per_host=4.0, burst=4, timeout=30, retries=3):
+        """
+        Args:
+            data_dir: 原始 CSV 保存目录，默认脚本目录下的 aemo_raw
+            base_url: 数据文件目录地址
+            home_url: 建立会话时先访问的主页（为空则跳过）
+            max_workers: 并发下载线程数（同时也是连接池大小）
+            rate_per_host: 每个主机每秒最多请求数（0 表示不限速）
+            burst: 限速令牌桶容量
+            timeout: 单个请求超时（秒）
+            retries: 429/5xx/网络错误时的重试次数
+        """
+        self.data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "aemo_raw")
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.base_url = base_url.rstrip("/")
+        self.home_url = home_url
+        self.max_workers = max_workers
+        self.rate_per_host = rate_per_host
+        self.burst = burst
+        self.timeout = timeout
+        self.retries = retries
+
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._warmed_up = False
+        self._cache_path = os.path.join(self.data_dir, CACHE_FILE)
+        self._cache = self._load_cache()
+
+    def _load_cache(self):
+        try:
+            with open(self._cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self):
+        tmp = self._cache_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._cache, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self._cache_path)
+
+    def _limiter(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = RateLimiter(self.rate_per_host, self.burst)
+            return self._limiters[host]
+
+    def warm_up(self):
+        """首先访问主页，建立会话（只做一次）"""
+        with self._lock:
+            if self._warmed_up or not self.home_url:
+                return
+            self._warmed_up = True
+        try:
+            self._limiter(self.home_url).acquire()
+            self.session.get(self.home_url, timeout=10)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  访问主页失败（继续下载）: {e}")
+
+    def path_for(self, region, year, month):
+        """某区域某月原始 CSV 的本地路径"""
+        return os.path.join(self.data_dir, month_filename(region, year, month))
+
+    def _request(self, url, headers):
+        """带限速与重试的流式 GET，返回未读取正文的响应"""
+        delay = 1.0
+        for attempt in range(self.retries + 1):
+            self._limiter(url).acquire()
+            try:
+                response = self.session.get(url, headers=headers, timeout=self.timeout, stream=True)
+            except requests.exceptions.RequestException:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS or attempt == self.retries:
+                    return response
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+            time.sleep(delay)
+            delay *= 2
+
+    def download(self, url, path):
+        """
+        条件请求下载任意一个文件（流式写入临时文件后原子替换）
+
+        Args:
+            url: 文件地址
+            path: 本地保存路径（文件名同时作为 ETag 缓存的键）
+
+        Returns:
+            结果字典：status 为 downloaded / not_modified / missing / error，另含路径、字节数、耗时；
+            收到HTTP响应时 status_code 为响应状态码
+        """
+        key = os.path.basename(path)
+        result = {"url": url, "path": path, "bytes": 0}
+        start = time.perf_counter()
+
+        headers = {}
+        with self._lock:
+            meta = self._cache.get(key) if os.path.exists(path) else None
+        if meta:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        try:
+            response = self._request(url, headers)
+            with response:
+                result["status_code"] = response.status_code
+                if response.status_code == 304:
+                    result["status"] = "not_modified"
+                elif response.status_code == 404:
+                    result["status"] = "missing"
+                else:
+                    response.raise_for_status()
+                    tmp = path + ".part"
+                    try:
+                        with open(tmp, "wb") as f:
+                            for chunk in response.iter_content(chunk_size=1 << 16):
+                                f.write(chunk)
+                                result["bytes"] += len(chunk)
+                        os.replace(tmp, path)
+                    except BaseException:
+                        # 中途断开：删掉半个文件，也不记录 ETag，下次重新完整下载
+                        if os.path.exists(tmp):
+                            os.remove(tmp)
+                        raise
+                    with self._lock:
+                        self._cache[key] = {
+                            "etag": response.headers.get("ETag"),
+                            "last_modified": response.headers.get("Last-Modified"),
+                            "bytes": result["bytes"],
+                            "fetched_at": datetime.now().isoformat(timespec="seconds"),
+                        }
+                        self._save_cache()
+                    result["status"] = "downloaded"
+        except requests.exceptions.RequestException as e:
+            result["status"] = "error"
+            result["error"] = str(e)
+        result["seconds"] = time.perf_counter() - start
+        return result
+
+    def fetch_month(self, region, year, month):
+        """
+        下载（或确认未变化）一个区域一个月的文件
+
+        Returns:
+            结果字典：status 为 downloaded / not_modified / missing / error，另含路径、字节数、耗时
+        """
+        url = f"{self.base_url}/{month_filename(region, year, month)}"
+        result = {"region": region, "year": year, "month": month}
+        result.update(self.download(url, self.path_for(region, year, month)))
+        return result
+
+    def fetch(self, regions=REGIONS, start=None, end=None, months=None):
+        """
+        并发下载多个区域、多个月份
+
+        Args:
+            regions: 区域列表
+            start: 起始月份 'YYYY-MM'（与 months 二选一）
+            end: 结束月份 'YYYY-MM'，默认当前月
+            months: 直接给出的 [(year, month)] 列表
+
+        Returns:
+            每个 区域 × 月份 的结果字典列表
+        """
+        months = months if months is not None else month_range(start, end)
+        self.warm_up()
+        tasks = [(region, y, m) for y, m in months for region in regions]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(lambda task: self.fetch_month(*task), tasks))
+
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def summarize(results, seconds=None):
+    """打印下载结果汇总"""
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    total_bytes = sum(r["bytes"] for r in results)
+    line = "，".join(f"{status} {n}" for status, n in sorted(counts.items()))
+    print(f"📊 共 {len(results)} 个文件：{line}，下载 {total_bytes / 1e6:.1f} MB"
+          + (f"，耗时 {seconds:.2f} s" if seconds is not None else ""))
+    for r in results:
+        if r["status"] == "error":
+            print(f"❌ {r['region']} {r['year']}-{r['month']:02d}: {r['error']}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="批量下载 AEMO 各区域月度价格/需求数据")
+    parser.add_argument("--regions", nargs="+", default=REGIONS)
+    parser.add_argument("--start", required=True, help="起始月份 YYYY-MM")
+    parser.add_argument("--end", default=None, help="结束月份 YYYY-MM，默认当前月")
+    parser.add_argument("--out", default=None, help="保存目录，默认脚本目录下的 aemo_raw")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0, help="每个主机每秒最多请求数")
+    parser.add_argument("--base-url", default=BASE_URL, help="数据目录地址（可指向本地替身服务器）")
+    args = parser.parse_args()
+
+    print(f"🚀 开始下载 {len(args.regions)} 个区域 {args.start} ~ {args.end or '当前月'} 的数据...")
+    start = time.perf_counter()
+    home_url = HOME_URL if args.base_url == BASE_URL else None
+    with AEMOFetcher(args.out, base_url=args.base_url, home_url=home_url, max_workers=args.workers,
+                     rate_per_host=args.rate) as fetcher:
+        results = fetcher.fetch(args.regions, args.start, args.end)
+    summarize(results, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+本地 AEMO 价格/需求数据替身服务器
+
+按 AEMO 网站的路径规则（/aemo/data/nem/priceanddemand/PRICE_AND_DEMAND_YYYYMM_REGION.csv）
+返回按区域、月份确定性生成的 5 分钟数据，支持 ETag / Last-Modified 条件请求（未变化时返回 304），
+用于在没有外网的环境里测试批量下载、增量更新与实时跟随。
+"""
+
+import hashlib
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+DATA_PATH = "/aemo/data/nem/priceanddemand"
+REGIONS = ["QLD1", "NSW1", "VIC1", "SA1", "TAS1"]
+FILE_RE = re.compile(r"PRICE_AND_DEMAND_(\d{4})(\d{2})_([A-Z]+1)\.csv$")
+
+# 各区域的需求基准（MW），让生成的数据量级接近真实
+BASE_DEMAND = {"QLD1": 6500, "NSW1": 8000, "VIC1": 5000, "SA1": 1400, "TAS1": 1100}
+
+
+def generate_month_csv(region, year, month, revision=0, until=None):
+    """
+    生成一个月的 5 分钟价格/需求 CSV（与 AEMO 文件格式一致）
+
+    Args:
+        region: 区域代码
+        year: 年
+        month: 月
+        revision: 数据修订号（改变后内容不同，用于模拟 AEMO 更新文件）
+        until: 只生成到该时刻（含）为止的数据，用于模拟当月文件逐步追加
+
+    Returns:
+        CSV 字节串
+    """
+    start = datetime(year, month, 1) + timedelta(minutes=5)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    steps = int((end - start).total_seconds() // 300) + 1
+    # 先生成整月再截断，逐步发布时已发布的时段内容保持不变
+    published = steps if until is None else max(0, min(steps, int((until - start).total_seconds() // 300) + 1))
+    seed = int(hashlib.sha256(f"{region}-{year}-{month}-{revision}".encode()).hexdigest()[:8], 16)
+    rng = np.random.default_rng(seed)
+
+    minutes = np.arange(steps) * 5 + 5
+    hour = (minutes / 60) % 24
+    daily = np.sin((hour - 6) / 24 * 2 * np.pi)
+    demand = BASE_DEMAND.get(region, 3000) * (1 + 0.18 * daily + 0.03 * rng.standard_normal(steps))
+    rrp = 80 + 60 * daily + 25 * rng.standard_normal(steps)
+    spikes = rng.random(steps) < 0.01
+    rrp[spikes] *= rng.uniform(3, 15, spikes.sum())
+
+    lines = ["REGION,SETTLEMENTDATE,TOTALDEMAND,RRP,PERIODTYPE"]
+    for i in range(published):
+        ts = (start + timedelta(minutes=5 * i)).strftime("%Y/%m/%d %H:%M:%S")
+        lines.append(f"{region},{ts},{demand[i]:.2f},{rrp[i]:.2f},TRADE")
+    return ("\n".join(lines) + "\n").encode()
+
+
+class AEMOFixtureServer:
+    """
+    AEMO 数据替身服务器（后台线程运行）
+
+    - 每个文件的内容由 (区域, 月份, 修订号) 决定，ETag 为内容哈希
+    - latency: 每个请求的模拟延迟（秒）
+    - request_log: 记录 (路径, 状态码)，便于检查 304 命中情况
+    - fail(): 让某个文件返回错误状态码或被截断的正文，用于测试失败处理
+    """
+
+    def __init__(self, port=0, latency=0.0, available_until=None):
+        """
+        Args:
+            port: 监听端口，0 表示自动分配
+            latency: 每个请求的模拟延迟（秒）
+            available_until: 数据只发布到该月份 (year, month)，之后的月份返回 404；默认当前月
+        """
+        self.latency = latency
+        now = datetime.now()
+        self.available_until = available_until or (now.year, now.month)
+        self.revisions = {}
+        self.live_until = {}
+        self.faults = {}
+        self.request_log = []
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """替身服务器根地址"""
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def base_url(self):
+        """数据文件目录地址（对应 AEMO 的 priceanddemand 目录）"""
+        return self.url + DATA_PATH
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def revise(self, region, year, month):
+        """模拟 AEMO 修订某个月的文件：内容、ETag、Last-Modified 都会变化"""
+        with self._lock:
+            key = (region, year, month)
+            self.revisions[key] = self.revisions.get(key, 0) + 1
+            self._cache.pop(key, None)
+
+    def fail(self, region, year, month, status=None, truncate=False):
+        """
+        模拟下载故障
+
+        Args:
+            status: 返回该状态码（如 403）
+            truncate: 声明完整长度但只发送一半正文后断开连接
+            两者都不给时清除该文件的故障
+        """
+        with self._lock:
+            key = (region, year, month)
+            if status is None and not truncate:
+                self.faults.pop(key, None)
+            else:
+                self.faults[key] = (status, truncate)
+
+    def publish_until(self, region, until):
+        """
+        模拟当月文件逐步发布：该区域当月文件只包含到 until 为止的时段
+
+        时段按结束时刻标记，下个月 00:00 这一时段属于本月文件；更早月份的文件视为已发布完整。
+        """
+        first = until - timedelta(minutes=5)
+        with self._lock:
+            key = (region, first.year, first.month)
+            for earlier in [k for k in self.live_until if k[0] == region and k < key]:
+                del self.live_until[earlier]
+                self._cache.pop(earlier, None)
+            self.live_until[key] = until
+            self._cache.pop(key, None)
+
+    def replay(self, clock, regions=("QLD1",), delay=5.0):
+        """
+        按给定时钟逐个发布 5 分钟时段（后台线程），用于回放测试实时跟随
+
+        Args:
+            clock: 提供 now() 与 wall_seconds() 的时钟（如 aemo_live.ReplayClock）
+            regions: 回放的区域
+            delay: 时段结束后多少（模拟）秒出现在文件里，模拟 AEMO 的发布延迟
+
+        Returns:
+            停止回放用的 threading.Event
+        """
+        stop = threading.Event()
+
+        def run():
+            published = None
+            while not stop.is_set():
+                ts = clock.now() - timedelta(seconds=delay)
+                until = ts.replace(minute=ts.minute - ts.minute % 5, second=0, microsecond=0)
+                if until != published:
+                    first = until - timedelta(minutes=5)
+                    self.available_until = (first.year, first.month)
+                    for region in regions:
+                        self.publish_until(region, until)
+                    published = until
+                stop.wait(clock.wall_seconds(1.0))
+
+        threading.Thread(target=run, daemon=True).start()
+        return stop
+
+    def count(self, status=None):
+        """统计请求数（可按状态码过滤）"""
+        with self._lock:
+            return sum(1 for _, code in self.request_log if status is None or code == status)
+
+    def _file(self, region, year, month):
+        key = (region, year, month)
+        with self._lock:
+            if key not in self._cache:
+                body = generate_month_csv(region, year, month, self.revisions.get(key, 0), self.live_until.get(key))
+                modified = datetime.now(timezone.utc).replace(microsecond=0)
+                etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+                self._cache[key] = (body, etag, modified)
+            return self._cache[key]
+
+    def _handler_class(self):
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _reply(self, code, body=b"", headers=None):
+                with fixture._lock:
+                    fixture.request_log.append((self.path, code))
+                self.send_response(code)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body and self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def do_HEAD(self):
+                self.do_GET()
+
+            def do_GET(self):
+                if fixture.latency:
+                    time.sleep(fixture.latency)
+                if self.path in ("/", ""):
+                    self._reply(200, b"<html>AEMO fixture</html>", {"Content-Type": "text/html"})
+                    return
+                match = FILE_RE.search(self.path)
+                if not self.path.startswith(DATA_PATH) or not match:
+                    self._reply(404, b"not found")
+                    return
+                year, month, region = int(match.group(1)), int(match.group(2)), match.group(3)
+                if region not in REGIONS or (year, month) > fixture.available_until:
+                    self._reply(404, b"not found")
+                    return
+
+                with fixture._lock:
+                    status, truncate = fixture.faults.get((region, year, month), (None, False))
+                if status is not None:
+                    self._reply(status, b"error")
+                    return
+
+                body, etag, modified = fixture._file(region, year, month)
+                if truncate:
+                    with fixture._lock:
+                        fixture.request_log.append((self.path, 200))
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("Connection", "close")
+                    self.end_headers()
+                    self.wfile.write(body[:len(body) // 2])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                headers = {"ETag": etag, "Last-Modified": format_datetime(modified, usegmt=True)}
+                if_none_match = self.headers.get("If-None-Match")
+                if_modified_since = self.headers.get("If-Modified-Since")
+                if if_none_match is not None:
+                    if etag in [tag.strip() for tag in if_none_match.split(",")]:
+                        self._reply(304, headers=headers)
+                        return
+                elif if_modified_since is not None:
+                    try:
+                        if modified <= parsedate_to_datetime(if_modified_since):
+                            self._reply(304, headers=headers)
+                            return
+                    except (TypeError, ValueError):
+                        pass
+                headers["Content-Type"] = "text/csv"
+                self._reply(200, body, headers)
+
+        return Handler
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="本地 AEMO 数据替身服务器")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="每个请求的模拟延迟（秒）")
+    args = parser.parse_args()
+
+    with AEMOFixtureServer(port=args.port, latency=args.latency) as server:
+        print(f"🚀 AEMO 替身服务器已启动: {server.base_url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            print("\n已停止")
+
+
+if __name__ == "__main__":
+    main()
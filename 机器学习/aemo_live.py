@@ -0,0 +1,247 @@
+"""
+AEMO 5 分钟实时价格跟随
+
+长期运行：在每个 5 分钟调度时段结束后（加上发布延迟）轮询当月文件，
+用条件请求（ETag / Last-Modified）避免重复下载未变化的数据；
+只把新出现的时段发布到进程内队列 / 回调，供 P2P 结算引擎在数据发布后数秒内取得最新电价。
+可配合 aemo_fixture_server.AEMOFixtureServer.replay() 与 ReplayClock 在本地加速回放测试。
+"""
+
+import os
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+from aemo_fetcher import BASE_URL, HOME_URL, AEMOFetcher, month_range
+from aemo_store import read_aemo_csv
+
+# NEM 使用澳大利亚东部标准时间（UTC+10，不实行夏令时）
+NEM_TZ = timezone(timedelta(hours=10))
+INTERVAL = timedelta(minutes=5)
+
+
+def interval_floor(ts):
+    """ts 所在的最近一个 5 分钟边界（不晚于 ts）"""
+    return ts.replace(minute=ts.minute - ts.minute % 5, second=0, microsecond=0)
+
+
+class SystemClock:
+    """真实时钟（NEM 时间，不带时区信息，与 AEMO 文件中的时间一致）"""
+
+    def now(self):
+        return datetime.now(NEM_TZ).replace(tzinfo=None)
+
+    def wall_seconds(self, seconds):
+        """模拟时间的秒数对应的实际等待秒数"""
+        return seconds
+
+
+class ReplayClock:
+    """加速回放时钟：从 start 开始，以 speed 倍速前进"""
+
+    def __init__(self, start, speed=60.0):
+        self.start = start
+        self.speed = speed
+        self._t0 = datetime.now().timestamp()
+
+    def now(self):
+        return self.start + timedelta(seconds=(datetime.now().timestamp() - self._t0) * self.speed)
+
+    def wall_seconds(self, seconds):
+        return seconds / self.speed
+
+
+class LiveFollower:
+    """
+    跟随某区域当月价格/需求文件，发布新出现的 5 分钟时段
+
+    每条发布的记录为字典：region、interval_end、rrp（澳元/MWh）、price_kwh（澳元/kWh）、
+    demand（MW）、received_at（收到时刻）、delay_s（距时段结束的秒数）。
+    """
+
+    def __init__(self, region="QLD1", callback=None, out_queue=None, base_url=BASE_URL, home_url=HOME_URL,
+                 data_dir=None, clock=None, publish_delay=10.0, retry_every=5.0, give_up_after=240.0,
+                 backfill=False):
+        """
+        Args:
+            region: 区域代码
+            callback: 每个新时段调用一次 callback(record)
+            out_queue: 发布队列，默认新建一个 queue.Queue（见 self.queue）
+            base_url: 数据文件目录地址（可指向本地替身服务器）
+            home_url: 建立会话时先访问的主页（为空则跳过）
+            data_dir: 当月文件的本地保存目录，默认脚本目录下的 aemo_live
+            clock: 时钟，默认 SystemClock；回放测试用 ReplayClock
+            publish_delay: 时段结束后等待多少秒再开始轮询
+            retry_every: 时段还没出现时的重试间隔（秒）
+            give_up_after: 时段结束后超过多少秒仍未出现就等下一个时段
+            backfill: 首次轮询时是否发布文件中已有的全部时段（默认只发布最新一个）
+        """
+        data_dir = data_dir or os.path.join(os.path.dirname(os.path.abspath(__file__)), "aemo_live")
+        self.fetcher = AEMOFetcher(data_dir, base_url=base_url, home_url=home_url, max_workers=1,
+                                   rate_per_host=1.0, burst=2)
+        self.region = region
+        self.callback = callback
+        self.queue = out_queue if out_queue is not None else queue.Queue()
+        self.clock = clock or SystemClock()
+        self.publish_delay = publish_delay
+        self.retry_every = retry_every
+        self.give_up_after = give_up_after
+        self.backfill = backfill
+        self.last_interval = None
+        self.stats = {"polls": 0, "downloaded": 0, "not_modified": 0, "missing": 0, "error": 0, "published": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _wait(self, seconds):
+        """按时钟等待（可被 stop() 打断），返回是否已停止"""
+        return self._stop.wait(max(0.0, self.clock.wall_seconds(seconds)))
+
+    def poll(self):
+        """
+        对最新时段所在的月度文件发一次条件请求，发布其中的新时段
+
+        Returns:
+            本次发布的记录列表
+        """
+        # 时段按结束时刻标记：下个月 00:00 这一时段在本月文件里
+        month_of = interval_floor(self.clock.now()) - INTERVAL
+        months = [(month_of.year, month_of.month)]
+        if self.last_interval is not None:
+            # 下一个待发布时段所在的文件（跨月时 00:00 可能晚于下个月的首次轮询才出现）
+            months = month_range((self.last_interval.year, self.last_interval.month), months[0]) or months
+
+        frames = []
+        for year, month in months:
+            result = self.fetcher.fetch_month(self.region, year, month)
+            self.stats["polls"] += 1
+            self.stats[result["status"]] += 1
+            if result["status"] in ("missing", "error"):
+                continue
+            if result["status"] == "not_modified" and self.last_interval is not None:
+                continue
+            frames.append(read_aemo_csv(result["path"]))
+        if not frames:
+            return []
+
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        if self.last_interval is not None:
+            df = df[df["SETTLEMENTDATE"] > self.last_interval]
+        elif not self.backfill:
+            df = df.tail(1)
+        if df.empty:
+            return []
+
+        received_at = self.clock.now()
+        records = []
+        for ts, rrp, demand in zip(df["SETTLEMENTDATE"], df["RRP"], df["TOTALDEMAND"]):
+            ts = ts.to_pydatetime()
+            record = {
+                "region": self.region,
+                "interval_end": ts,
+                "rrp": round(float(rrp), 2),
+                "price_kwh": round(float(rrp), 2) / 1000,
+                "demand": round(float(demand), 2),
+                "received_at": received_at,
+                "delay_s": (received_at - ts).total_seconds(),
+            }
+            self.queue.put(record)
+            if self.callback is not None:
+                self.callback(record)
+            records.append(record)
+        self.last_interval = records[-1]["interval_end"]
+        self.stats["published"] += len(records)
+        return records
+
+    def follow_interval(self, target):
+        """时段 target 结束后反复轮询，直到它出现、超时或被停止"""
+        if self._wait((target + timedelta(seconds=self.publish_delay) - self.clock.now()).total_seconds()):
+            return
+        deadline = target + timedelta(seconds=self.give_up_after)
+        while True:
+            self.poll()
+            if self.last_interval is not None and self.last_interval >= target:
+                return
+            if self.clock.now() >= deadline or self._wait(self.retry_every):
+                return
+
+    def run(self, intervals=None):
+        """
+        前台运行：对齐到每个 5 分钟边界轮询
+
+        Args:
+            intervals: 跟随的时段数，None 表示一直运行到 stop()
+        """
+        self.fetcher.warm_up()
+        # 启动时先取一次当前数据
+        self.poll()
+        count = 0
+        while not self._stop.is_set() and (intervals is None or count < intervals):
+            self.follow_interval(interval_floor(self.clock.now()) + INTERVAL)
+            count += 1
+
+    def start(self, intervals=None):
+        """后台线程运行"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self.run, args=(intervals,), daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """停止跟随并关闭连接池"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.fetcher.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="跟随 AEMO 5 分钟实时价格")
+    parser.add_argument("--region", default="QLD1")
+    parser.add_argument("--intervals", type=int, default=None, help="跟随的时段数，默认一直运行")
+    parser.add_argument("--replay", default=None, metavar="YYYY-MM-DDTHH:MM",
+                        help="不连外网，从该时刻开始用本地替身服务器加速回放")
+    parser.add_argument("--speed", type=float, default=60.0, help="回放倍速")
+    args = parser.parse_args()
+
+    def show(record):
+        print(f"⚡ {record['region']} {record['interval_end']:%Y-%m-%d %H:%M}  "
+              f"{record['rrp']:>8.2f} 澳元/MWh（{record['price_kwh']:.4f} 澳元/kWh）  "
+              f"需求 {record['demand']:.0f} MW  发布后 {record['delay_s']:.0f} s 收到")
+
+    if args.replay is None:
+        with LiveFollower(args.region, callback=show) as follower:
+            try:
+                follower.run(args.intervals)
+            except KeyboardInterrupt:
+                pass
+        return
+
+    import tempfile
+    from aemo_fixture_server import AEMOFixtureServer
+
+    clock = ReplayClock(datetime.fromisoformat(args.replay), args.speed)
+    with AEMOFixtureServer() as server, tempfile.TemporaryDirectory() as data_dir:
+        stop_replay = server.replay(clock, [args.region])
+        with LiveFollower(args.region, callback=show, base_url=server.base_url, home_url=None,
+                          data_dir=data_dir, clock=clock) as follower:
+            try:
+                follower.run(args.intervals)
+            except KeyboardInterrupt:
+                pass
+            stop_replay.set()
+            print(f"📊 {follower.stats}，服务器 304 次数 {server.count(304)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,454 @@
+"""
+AEMO 价格/需求本地列式数据集
+
+按 region=…/year=…/month=… 分区保存为 Parquet（hive 目录结构），列类型固定：
+SETTLEMENTDATE 为 datetime64，RRP/TOTALDEMAND 为 float32，REGION/PERIODTYPE 为字典编码（分类）。
+新下载的月份直接写入对应分区（重复写入同一月份会整体替换），
+按时间窗口读取时先按分区裁剪、再用行组统计下推过滤，不需要读全量数据。
+每次写入分区的同时更新该分区的增量汇总（见 aemo_aggregates），报表与多年的按小时统计直接读汇总。
+Excel 报表改为按需从数据集生成。
+"""
+
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from aemo_aggregates import (AggregateStore, categorize_prices, merge_aggregates, month_aggregates,
+                             report_tables)
+
+SCHEMA = pa.schema([
+    ("SETTLEMENTDATE", pa.timestamp("ns")),
+    ("REGION", pa.dictionary(pa.int8(), pa.string())),
+    ("TOTALDEMAND", pa.float32()),
+    ("RRP", pa.float32()),
+    ("PERIODTYPE", pa.dictionary(pa.int8(), pa.string())),
+])
+COLUMNS = [field.name for field in SCHEMA]
+PARTITIONING = ds.partitioning(
+    pa.schema([("region", pa.string()), ("year", pa.int16()), ("month", pa.int8())]), flavor="hive"
+)
+CSV_DTYPES = {"REGION": "category", "TOTALDEMAND": "float32", "RRP": "float32", "PERIODTYPE": "category"}
+
+# 一周的 5 分钟数据为一个行组，按时间窗口读取时可以跳过不相关的行组
+ROW_GROUP_SIZE = 7 * 288
+
+
+def default_store_dir():
+    """默认数据集目录：脚本目录下的 aemo_store"""
+    return os.path.join(os.path.dirname(os.path.abspath(__file__)), "aemo_store")
+
+
+def read_aemo_csv(path):
+    """按固定类型读取 AEMO 价格/需求 CSV"""
+    df = pd.read_csv(path, dtype=CSV_DTYPES)
+    df["SETTLEMENTDATE"] = pd.to_datetime(df["SETTLEMENTDATE"], format="%Y/%m/%d %H:%M:%S")
+    return df[COLUMNS]
+
+
+def to_table(df):
+    """DataFrame 转为固定 schema 的 Arrow 表"""
+    return pa.Table.from_pandas(df[COLUMNS], schema=SCHEMA, preserve_index=False)
+
+
+class AEMOStore:
+    """按 区域/年/月 分区的 Parquet 数据集"""
+
+    def __init__(self, root=None):
+        """
+        Args:
+            root: 数据集根目录，默认脚本目录下的 aemo_store
+        """
+        self.root = root or default_store_dir()
+        os.makedirs(self.root, exist_ok=True)
+        # 以下划线开头的目录不会被 pyarrow 当作数据文件扫描
+        self.aggregates = AggregateStore(os.path.join(self.root, "_aggregates"))
+
+    def partition_dir(self, region, year, month):
+        """分区目录"""
+        return os.path.join(self.root, f"region={region}", f"year={year}", f"month={month}")
+
+    def temp_path(self, region, year, month):
+        """
+        分区文件写入过程中的临时文件：放在 _tmp 目录（pyarrow 不扫描），
+        写入中途或被中断后读取数据集不会读到不完整的文件；与数据集同一文件系统，完成后原子改名
+        """
+        directory = os.path.join(self.root, "_tmp")
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(prefix=f"{region}-{year}-{month:02d}.", suffix=".parquet", dir=directory)
+        os.close(fd)
+        return path
+
+    def _commit(self, tmp, region, year, month):
+        """把写完的临时文件移动为分区文件（分区目录此时才创建）"""
+        directory = self.partition_dir(region, year, month)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "data.parquet")
+        os.replace(tmp, path)
+        return path
+
+    def write_month(self, region, year, month, data):
+        """
+        写入（替换）一个区域一个月的数据
+
+        Args:
+            region: 区域代码
+            year: 年
+            month: 月
+            data: DataFrame 或 Arrow 表（列见 COLUMNS）
+
+        Returns:
+            写入的行数
+        """
+        table = data if isinstance(data, pa.Table) else to_table(data)
+        table = table.sort_by("SETTLEMENTDATE")
+        tmp = self.temp_path(region, year, month)
+        pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+        self._commit(tmp, region, year, month)
+        # 只重算这个分区的部分汇总，其余月份的汇总不动
+        self.aggregates.update_month(region, year, month, table.to_pandas())
+        return table.num_rows
+
+    def rebuild_aggregates(self, missing_only=True):
+        """
+        为已有分区补算（或全部重算）部分汇总
+
+        Returns:
+            重算的分区数
+        """
+        count = 0
+        for region, year, month in self.months():
+            if missing_only and self.aggregates.has_month(region, year, month):
+                continue
+            path = os.path.join(self.partition_dir(region, year, month), "data.parquet")
+            self.aggregates.update_month(region, year, month, pq.read_table(path).to_pandas())
+            count += 1
+        return count
+
+    def partition_writer(self, region, year, month, columns=None):
+        """分块写入一个分区的写入器（见 PartitionWriter）"""
+        return PartitionWriter(self, region, year, month, columns)
+
+    def ingest_csv(self, path, region=None, year=None, month=None):
+        """
+        把一个月度 CSV 写入数据集（区域与月份默认从数据本身推断）
+
+        Returns:
+            写入的行数
+        """
+        df = read_aemo_csv(path)
+        if df.empty:
+            return 0
+        region = region or str(df["REGION"].iloc[0])
+        # 月度文件的最后一行是下个月 00:00，用第一个时段确定月份
+        first = df["SETTLEMENTDATE"].iloc[0]
+        year = year or first.year
+        month = month or first.month
+        return self.write_month(region, year, month, df)
+
+    def ingest_fetch_results(self, results):
+        """
+        把 AEMOFetcher.fetch() 的结果中新下载的文件写入数据集（未变化的月份跳过）
+
+        Returns:
+            写入的总行数
+        """
+        rows = 0
+        for r in results:
+            if r["status"] == "downloaded":
+                rows += self.ingest_csv(r["path"], r["region"], r["year"], r["month"])
+        return rows
+
+    def months(self, region=None):
+        """数据集中已有的 (区域, 年, 月) 列表（只算已写完 data.parquet 的分区）"""
+        found = []
+        for region_dir in sorted(os.listdir(self.root)):
+            if not region_dir.startswith("region="):
+                continue
+            name = region_dir.split("=", 1)[1]
+            if region is not None and name != region:
+                continue
+            for year_dir in sorted(os.listdir(os.path.join(self.root, region_dir))):
+                for month_dir in os.listdir(os.path.join(self.root, region_dir, year_dir)):
+                    if not os.path.isfile(os.path.join(self.root, region_dir, year_dir, month_dir, "data.parquet")):
+                        continue
+                    found.append((name, int(year_dir.split("=", 1)[1]), int(month_dir.split("=", 1)[1])))
+        return sorted(found)
+
+    def dataset(self):
+        """整个数据集的 pyarrow Dataset"""
+        return ds.dataset(self.root, format="parquet", partitioning=PARTITIONING)
+
+    @staticmethod
+    def _filter(regions, start, end):
+        expr = None
+
+        def add(e):
+            return e if expr is None else expr & e
+
+        if regions:
+            expr = add(ds.field("region").isin(list(regions)))
+        if start is not None:
+            start = pd.Timestamp(start)
+            # 分区裁剪：月度文件包含下个月 00:00 这一行，所以起始月份往前放宽一个月
+            first = start - pd.DateOffset(months=1)
+            expr = add((ds.field("year") > first.year)
+                       | ((ds.field("year") == first.year) & (ds.field("month") >= first.month)))
+            expr = add(ds.field("SETTLEMENTDATE") >= pa.scalar(start.to_pydatetime(), pa.timestamp("ns")))
+        if end is not None:
+            end = pd.Timestamp(end)
+            expr = add((ds.field("year") < end.year)
+                       | ((ds.field("year") == end.year) & (ds.field("month") <= end.month)))
+            expr = add(ds.field("SETTLEMENTDATE") < pa.scalar(end.to_pydatetime(), pa.timestamp("ns")))
+        return expr
+
+    def read_table(self, regions=None, start=None, end=None, columns=None):
+        """
+        按区域与时间窗口读取（分区裁剪 + 谓词下推）
+
+        Args:
+            regions: 区域列表，None 表示全部
+            start: 起始时刻（含）
+            end: 结束时刻（不含）
+            columns: 需要的列，默认 COLUMNS
+
+        Returns:
+            Arrow 表（按区域、时间排序）
+        """
+        if not self.months():
+            return SCHEMA.empty_table().select(list(columns or COLUMNS))
+        columns = list(columns or COLUMNS)
+        # 字典编码列不能直接排序，借用分区列 region 排序后再去掉
+        scan = columns + [name for name in ("region", "SETTLEMENTDATE") if name not in columns]
+        table = self.dataset().to_table(columns=scan, filter=self._filter(regions, start, end))
+        table = table.sort_by([("region", "ascending"), ("SETTLEMENTDATE", "ascending")])
+        return table.select(columns)
+
+    def read(self, regions=None, start=None, end=None, columns=None):
+        """同 read_table，返回 DataFrame（REGION/PERIODTYPE 为 category 类型）"""
+        return self.read_table(regions, start, end, columns).to_pandas()
+
+
+class PartitionWriter:
+    """
+    分块写入一个分区：每块直接追加为行组，内存中只保留当前块与累计的部分汇总；
+    close() 时原子替换分区文件并保存合并后的汇总（与 write_month 一样整体替换该月）。
+    给出 columns 时只更新这些列：分区已存在时按 (SETTLEMENTDATE, REGION) 与原有数据合并，
+    其余列保留原值（用于分别入库只含价格或只含需求的 MMS 表）。
+    要求各块按时间先后写入。
+    """
+
+    def __init__(self, store, region, year, month, columns=None):
+        """
+        Args:
+            store: AEMOStore
+            region: 区域代码
+            year: 年
+            month: 月
+            columns: 本次提供的数值列（如 ['RRP']），默认整体替换该月
+        """
+        self.store = store
+        self.region = region
+        self.year = year
+        self.month = month
+        self.columns = list(columns) if columns is not None else None
+        self._tmp = store.temp_path(region, year, month)
+        self._writer = pq.ParquetWriter(self._tmp, SCHEMA, compression="zstd")
+        self._partials = []
+        self.rows = 0
+
+    def write(self, data):
+        """追加一块数据（DataFrame 或 Arrow 表）"""
+        table = data if isinstance(data, pa.Table) else to_table(data)
+        if table.num_rows == 0:
+            return
+        self._writer.write_table(table, row_group_size=ROW_GROUP_SIZE)
+        # 部分汇总可合并：按块计算（每块最多 区域 × 168 行），关闭时合并成这个月的一份
+        self._partials.append(month_aggregates(table.select(COLUMNS).to_pandas()))
+        self.rows += table.num_rows
+
+    def close(self):
+        """结束写入：替换（或合并进）分区文件，保存部分汇总"""
+        self._writer.close()
+        existing = os.path.join(self.store.partition_dir(self.region, self.year, self.month), "data.parquet")
+        if self.columns is not None and os.path.isfile(existing):
+            df = self._merge(pq.read_table(existing).to_pandas())
+            pq.write_table(to_table(df), self._tmp, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+            self.path = self.store._commit(self._tmp, self.region, self.year, self.month)
+            # 合并后其他列也进入了这个月的数据，汇总按合并结果重算
+            self.store.aggregates.update_month(self.region, self.year, self.month, df)
+            return self.rows
+        self.path = self.store._commit(self._tmp, self.region, self.year, self.month)
+        self.store.aggregates.save_month(self.region, self.year, self.month, merge_aggregates(self._partials))
+        return self.rows
+
+    def _merge(self, old):
+        """把本次写入的列按 (SETTLEMENTDATE, REGION) 合并进原有数据（外连接，两边的时段都保留）"""
+        new = pq.read_table(self._tmp).to_pandas()
+        keys = ["SETTLEMENTDATE", "REGION"]
+        old = old.astype({"REGION": str, "PERIODTYPE": str})
+        new = new[keys + self.columns + ["PERIODTYPE"]].astype({"REGION": str, "PERIODTYPE": str})
+        df = old.merge(new, on=keys, how="outer", suffixes=("", "_new"))
+        for column in self.columns + ["PERIODTYPE"]:
+            df[column] = df[column].where(df[column + "_new"].isna(), df[column + "_new"])
+        return df[COLUMNS].sort_values("SETTLEMENTDATE", ignore_index=True)
+
+    def abort(self):
+        """放弃写入（保留原有分区）"""
+        self._writer.close()
+        os.remove(self._tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+# ----------------------------------------------------------------------
+# 按需生成的 Excel 报表（与原来 get_qld_data 输出的四个工作表相同）
+# ----------------------------------------------------------------------
+
+def categorize_price(price):
+    """单个价格的区间分类（批量分类用 aemo_aggregates.categorize_prices）"""
+    if price < 50:
+        return '低价格 (<50)'
+    elif price < 100:
+        return '中等价格 (50-100)'
+    elif price < 200:
+        return '高价格 (100-200)'
+    else:
+        return '极高价格 (>200)'
+
+
+def add_derived_columns(df):
+    """添加日期、小时、星期、价格变化、价格区间等派生列"""
+    df = df.copy()
+    df['DATE'] = df['SETTLEMENTDATE'].dt.date
+    df['TIME'] = df['SETTLEMENTDATE'].dt.time
+    df['HOUR'] = df['SETTLEMENTDATE'].dt.hour
+    df['DAY_OF_WEEK'] = df['SETTLEMENTDATE'].dt.day_name()
+
+    # 计算价格变化
+    df['PRICE_CHANGE'] = df['RRP'].diff()
+    df['PRICE_CHANGE_PCT'] = (df['RRP'].pct_change() * 100).round(2)
+
+    df['PRICE_CATEGORY'] = categorize_prices(df['RRP'])
+
+    # 重新排列列顺序
+    columns_order = [
+        'SETTLEMENTDATE', 'DATE', 'TIME', 'HOUR', 'DAY_OF_WEEK',
+        'REGION', 'TOTALDEMAND', 'RRP', 'PRICE_CATEGORY',
+        'PRICE_CHANGE', 'PRICE_CHANGE_PCT', 'PERIODTYPE'
+    ]
+    return df[columns_order]
+
+
+def write_excel_report(df, excel_filename, partial=None):
+    """
+    生成四个工作表的 Excel 报表：原始数据、统计摘要、按小时统计、价格分类统计
+
+    Args:
+        df: 单个区域的价格/需求数据（COLUMNS）
+        excel_filename: 输出路径
+        partial: 这批数据的部分汇总（数据集中已存有时直接传入，否则由 df 计算）
+    """
+    # AEMO 原始数据保留两位小数，转回 float64 时按两位小数取整，去掉 float32 的尾数噪声
+    df = df.astype({'RRP': 'float64', 'TOTALDEMAND': 'float64'}).round({'RRP': 2, 'TOTALDEMAND': 2})
+    df = add_derived_columns(df)
+
+    summary_df, hourly_stats, price_category_stats = report_tables(
+        partial if partial is not None else month_aggregates(df)
+    )
+
+    with pd.ExcelWriter(excel_filename, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='原始数据', index=False)
+        summary_df.to_excel(writer, sheet_name='统计摘要', index=False)
+        hourly_stats.to_excel(writer, sheet_name='按小时统计')
+        price_category_stats.to_excel(writer, sheet_name='价格分类统计', index=False)
+    return df
+
+
+def export_month_excel(store, region, year, month, excel_filename):
+    """
+    从数据集生成某区域某月的 Excel 报表
+
+    Returns:
+        报表使用的数据（含派生列）
+    """
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    # 与 AEMO 月度文件一致：从 00:05 到下个月 00:00
+    df = store.read([region], start + pd.Timedelta(minutes=5), end + pd.Timedelta(minutes=5))
+    if df.empty:
+        raise ValueError(f"数据集中没有 {region} {year}-{month:02d} 的数据")
+    partial = None
+    if store.aggregates.has_month(region, year, month):
+        partial = store.aggregates.load([region], (year, month), (year, month))[0]
+    return write_excel_report(df, excel_filename, partial)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="AEMO 价格/需求列式数据集")
+    parser.add_argument("--store", default=None, help="数据集目录，默认脚本目录下的 aemo_store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="把目录中的月度 CSV 写入数据集")
+    p_ingest.add_argument("raw_dir")
+    p_query = sub.add_parser("query", help="按时间窗口查询")
+    p_query.add_argument("--regions", nargs="+")
+    p_query.add_argument("--start")
+    p_query.add_argument("--end")
+    p_excel = sub.add_parser("excel", help="生成某区域某月的 Excel 报表")
+    p_excel.add_argument("region")
+    p_excel.add_argument("month", help="YYYY-MM")
+    p_excel.add_argument("--out", default=None)
+    p_profile = sub.add_parser("profile", help="由增量汇总输出按小时的价格/需求统计")
+    p_profile.add_argument("--regions", nargs="+")
+    p_profile.add_argument("--start", help="起始月份 YYYY-MM")
+    p_profile.add_argument("--end", help="结束月份 YYYY-MM")
+    p_profile.add_argument("--by-dow", action="store_true", help="再按星期分组")
+    sub.add_parser("rebuild", help="为缺少汇总的分区补算汇总")
+    args = parser.parse_args()
+
+    store = AEMOStore(args.store)
+    if args.command == "ingest":
+        start = time.perf_counter()
+        rows = 0
+        for name in sorted(os.listdir(args.raw_dir)):
+            if name.startswith("PRICE_AND_DEMAND_") and name.endswith(".csv"):
+                rows += store.ingest_csv(os.path.join(args.raw_dir, name))
+        print(f"✅ 写入 {rows} 行，耗时 {time.perf_counter() - start:.2f} s")
+    elif args.command == "query":
+        start = time.perf_counter()
+        df = store.read(args.regions, args.start, args.end)
+        print(df)
+        print(f"✅ {len(df)} 行，耗时 {time.perf_counter() - start:.3f} s")
+    elif args.command == "profile":
+        start = time.perf_counter()
+        month = lambda value: tuple(int(v) for v in value.split("-")) if value else None
+        by = ("region", "hour", "dow") if args.by_dow else ("region", "hour")
+        profile = store.aggregates.profile(args.regions, month(args.start), month(args.end), by=by)
+        print(profile[list(by) + ["count", "rrp_mean", "rrp_std", "rrp_min", "rrp_max",
+                                  "demand_mean", "demand_std"]].round(2).to_string(index=False))
+        print(f"✅ {len(profile)} 组，耗时 {time.perf_counter() - start:.3f} s")
+    elif args.command == "rebuild":
+        print(f"✅ 补算 {store.rebuild_aggregates()} 个分区的汇总")
+    else:
+        year, month = (int(v) for v in args.month.split("-"))
+        out = args.out or f"{args.region}_price_demand_{year}{month:02d}.xlsx"
+        export_month_excel(store, args.region, year, month, out)
+        print(f"✅ Excel文件已保存: {out}")
+
+
+if __name__ == "__main__":
+    main()
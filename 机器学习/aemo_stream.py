@@ -0,0 +1,248 @@
+"""
+AEMO 数据流式分块入库
+
+面向大文件（例如按月打包、解压后数 GB 的 MMS 调度数据 zip）：
+- HTTP 响应体由 AEMOFetcher 流式写入磁盘，不在内存里保留整个文件
+- 按固定行数分块解析（固定列类型），zip 文件直接从压缩包里流式读取
+- 每块计算派生列（跨块的价格变化按区域衔接），并直接写入数据集对应分区的行组
+峰值内存只与块大小有关，与文件大小无关；结束时输出吞吐量统计。
+"""
+
+import csv
+import io
+import os
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+from aemo_fetcher import AEMOFetcher
+from aemo_store import AEMOStore, COLUMNS, CSV_DTYPES, add_derived_columns
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CHUNK_ROWS = 100_000
+DATE_FORMAT = "%Y/%m/%d %H:%M:%S"
+
+# MMS 数据表（C/I/D 行格式）到数据集列的映射；缺少的列写为空值，
+# 分区已存在时只合并本表提供的列（先后入库 DISPATCH,REGIONSUM 与 DISPATCH,PRICE 得到完整的价格和需求）
+MMS_TABLES = {
+    "DISPATCH,PRICE": {"REGIONID": "REGION", "RRP": "RRP"},
+    "DISPATCH,REGIONSUM": {"REGIONID": "REGION", "TOTALDEMAND": "TOTALDEMAND"},
+    "TRADING,PRICE": {"REGIONID": "REGION", "RRP": "RRP"},
+}
+MMS_PERIODTYPE = {"DISPATCH": "DISPATCH", "TRADING": "TRADE"}
+
+
+def open_text(path):
+    """打开 CSV 文本流；zip 文件读取其中的第一个 CSV（流式解压）"""
+    if zipfile.is_zipfile(path):
+        archive = zipfile.ZipFile(path)
+        name = next(n for n in archive.namelist() if n.lower().endswith(".csv"))
+        return io.TextIOWrapper(archive.open(name), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def iter_price_demand_chunks(stream, chunksize=CHUNK_ROWS):
+    """按块读取 PRICE_AND_DEMAND 格式的 CSV"""
+    for chunk in pd.read_csv(stream, dtype=CSV_DTYPES, chunksize=chunksize):
+        chunk["SETTLEMENTDATE"] = pd.to_datetime(chunk["SETTLEMENTDATE"], format=DATE_FORMAT)
+        yield chunk[COLUMNS]
+
+
+def iter_mms_chunks(stream, table="DISPATCH,PRICE", chunksize=CHUNK_ROWS):
+    """
+    按块读取 MMS 格式文件中的一个数据表
+
+    MMS 文件的每一行以记录类型开头：C 为注释，I 为某个表的列名，D 为该表的数据行；
+    一个文件里可以有多个表，这里只收集目标表的 D 行，攒够 chunksize 行解析一次。
+
+    Args:
+        stream: 文本流
+        table: 表名，如 'DISPATCH,PRICE'
+        chunksize: 每块行数
+
+    Yields:
+        列为 COLUMNS 的 DataFrame
+    """
+    mapping = MMS_TABLES[table]
+    category, name = table.split(",")
+    columns = None
+    lines = []
+
+    def parse(lines):
+        df = pd.read_csv(io.StringIO("".join(lines)), header=None, names=columns,
+                         usecols=["SETTLEMENTDATE", "INTERVENTION", *mapping] if "INTERVENTION" in columns
+                         else ["SETTLEMENTDATE", *mapping],
+                         dtype={"REGIONID": "category", "RRP": "float32", "TOTALDEMAND": "float32"})
+        if "INTERVENTION" in df:
+            # 只保留非干预（市场）价格
+            df = df[df["INTERVENTION"] == 0].drop(columns="INTERVENTION")
+        df = df.rename(columns=mapping)
+        df["SETTLEMENTDATE"] = pd.to_datetime(df["SETTLEMENTDATE"], format=DATE_FORMAT)
+        for column in ("TOTALDEMAND", "RRP"):
+            if column not in df:
+                df[column] = np.float32(np.nan)
+        df["PERIODTYPE"] = pd.Categorical([MMS_PERIODTYPE.get(category, category)] * len(df))
+        return df[COLUMNS]
+
+    for line in stream:
+        record = line[:2]
+        if record == "D,":
+            if columns is not None and line.startswith(f"D,{category},{name},"):
+                lines.append(line)
+                if len(lines) >= chunksize:
+                    yield parse(lines)
+                    lines = []
+        elif record == "I,":
+            fields = next(csv.reader([line]))
+            if fields[1] == category and fields[2] == name:
+                columns = fields
+    if lines:
+        yield parse(lines)
+
+
+def derive_chunk(df, last_rows):
+    """
+    计算一块数据的派生列，价格变化与上一块衔接
+
+    Args:
+        df: 一块数据（COLUMNS）
+        last_rows: {区域: 上一块该区域的最后一行}，会被更新
+
+    Returns:
+        含派生列的 DataFrame（按区域分组，区域内保持时间顺序）
+    """
+    parts = []
+    for region, part in df.groupby("REGION", observed=True, sort=False):
+        previous = last_rows.get(region)
+        if previous is not None:
+            part = pd.concat([previous, part], ignore_index=True)
+        derived = add_derived_columns(part)
+        parts.append(derived.iloc[1:] if previous is not None else derived)
+        last_rows[region] = part.iloc[[-1]]
+    return pd.concat(parts, ignore_index=True) if parts else add_derived_columns(df)
+
+
+def peak_memory_mb():
+    """进程峰值常驻内存（MB），不支持时返回 None"""
+    try:
+        # Linux：VmHWM 只统计本进程（ru_maxrss 会继承 exec 之前父进程的值）
+        with open("/proc/self/status") as f:
+            return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+    except (OSError, StopIteration):
+        pass
+    if resource is None:
+        return None
+    # macOS 的 ru_maxrss 以字节为单位
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20)
+
+
+def stream_ingest(path, store=None, chunksize=CHUNK_ROWS, mms_table=None, derived_csv=None):
+    """
+    分块把一个（可压缩的）AEMO 文件写入数据集
+
+    每行按结算时刻前 5 分钟所在的月份分区（与月度文件一致：下个月 00:00 这一行归本月），
+    每个 区域 × 月份 用一个 PartitionWriter 追加行组。
+
+    Args:
+        path: 本地 CSV 或 zip 路径
+        store: AEMOStore，默认脚本目录下的数据集
+        chunksize: 每块行数，决定峰值内存
+        mms_table: MMS 表名（如 'DISPATCH,PRICE'）；为空表示 PRICE_AND_DEMAND 格式。
+            MMS 表只更新它提供的列，分区已存在时与原有数据合并
+        derived_csv: 若给出，把含派生列的数据逐块追加写入该 CSV
+
+    Returns:
+        统计字典：rows、chunks、bytes、seconds、rows_per_s、mb_per_s、peak_mb、partitions
+    """
+    store = store or AEMOStore()
+    start = time.perf_counter()
+    writers = {}
+    last_rows = {}
+    # MMS 表只提供部分数值列，写入时与分区已有的数据合并
+    columns = [c for c in MMS_TABLES[mms_table].values() if c != "REGION"] if mms_table else None
+    rows = chunks = 0
+    try:
+        with open_text(path) as stream:
+            chunk_iter = (iter_mms_chunks(stream, mms_table, chunksize) if mms_table
+                          else iter_price_demand_chunks(stream, chunksize))
+            for chunk in chunk_iter:
+                if derived_csv:
+                    derived = derive_chunk(chunk, last_rows)
+                    derived.to_csv(derived_csv, mode="a" if chunks else "w", header=not chunks, index=False)
+                period = (chunk["SETTLEMENTDATE"] - pd.Timedelta(minutes=5)).dt
+                keys = pd.DataFrame({"region": chunk["REGION"].astype(str).to_numpy(),
+                                     "year": period.year.to_numpy(), "month": period.month.to_numpy()})
+                for (region, year, month), index in keys.groupby(["region", "year", "month"]).indices.items():
+                    key = (region, int(year), int(month))
+                    if key not in writers:
+                        writers[key] = store.partition_writer(*key, columns=columns)
+                    writers[key].write(chunk.iloc[index])
+                rows += len(chunk)
+                chunks += 1
+    except BaseException:
+        for writer in writers.values():
+            writer.abort()
+        raise
+    for writer in writers.values():
+        writer.close()
+
+    seconds = time.perf_counter() - start
+    size = os.path.getsize(path)
+    return {
+        "rows": rows,
+        "chunks": chunks,
+        "bytes": size,
+        "seconds": seconds,
+        "rows_per_s": rows / seconds if seconds else float("inf"),
+        "mb_per_s": size / 1e6 / seconds if seconds else float("inf"),
+        "peak_mb": peak_memory_mb(),
+        "partitions": sorted(writers),
+    }
+
+
+def print_stats(stats):
+    """打印入库吞吐量统计"""
+    peak = f"，峰值内存 {stats['peak_mb']:.0f} MB" if stats["peak_mb"] is not None else ""
+    print(f"✅ {stats['rows']} 行 / {stats['chunks']} 块 / {len(stats['partitions'])} 个分区，"
+          f"耗时 {stats['seconds']:.2f} s（{stats['rows_per_s']:,.0f} 行/s，"
+          f"{stats['mb_per_s']:.1f} MB/s）{peak}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="流式分块把 AEMO 文件（CSV / zip / URL）写入本地数据集")
+    parser.add_argument("source", help="本地文件路径或下载地址")
+    parser.add_argument("--store", default=None, help="数据集目录，默认脚本目录下的 aemo_store")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS)
+    parser.add_argument("--mms-table", default=None, choices=sorted(MMS_TABLES),
+                        help="按 MMS 格式读取指定数据表")
+    parser.add_argument("--derived-csv", default=None, help="同时输出含派生列的 CSV")
+    parser.add_argument("--download-dir", default=None, help="下载保存目录，默认脚本目录下的 aemo_raw")
+    args = parser.parse_args()
+
+    path = args.source
+    if path.startswith(("http://", "https://")):
+        with AEMOFetcher(args.download_dir, home_url=None) as fetcher:
+            result = fetcher.download(path, os.path.join(fetcher.data_dir, os.path.basename(path)))
+        if result["status"] in ("missing", "error"):
+            print(f"❌ 下载失败: {result.get('error', '404')}")
+            return
+        print(f"⬇️  {result['status']}，{result['bytes'] / 1e6:.1f} MB，耗时 {result['seconds']:.2f} s")
+        if result["status"] == "not_modified":
+            print("文件未变化，跳过入库")
+            return
+        path = result["path"]
+
+    stats = stream_ingest(path, AEMOStore(args.store), args.chunksize, args.mms_table, args.derived_csv)
+    print_stats(stats)
+
+
+if __name__ == "__main__":
+    main()
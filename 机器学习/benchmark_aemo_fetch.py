@@ -0,0 +1,64 @@
+"""
+AEMO 批量下载基准（使用本地替身服务器，不访问外网）
+第一次全量下载，第二次全部应命中 304，修订两个文件后第三次只重新下载这两个。
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+
+from aemo_fetcher import REGIONS, AEMOFetcher, month_range, summarize
+from aemo_fixture_server import AEMOFixtureServer
+
+
+def run(fixture, data_dir, months, workers, rate):
+    start = time.perf_counter()
+    before = len(fixture.request_log)
+    with AEMOFetcher(data_dir, base_url=fixture.base_url, home_url=fixture.url + "/", max_workers=workers,
+                     rate_per_host=rate, burst=workers) as fetcher:
+        results = fetcher.fetch(REGIONS, months=months)
+    seconds = time.perf_counter() - start
+    summarize(results, seconds)
+    return results, len(fixture.request_log) - before
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AEMO 批量下载基准")
+    parser.add_argument("--start", default="2023-09")
+    parser.add_argument("--end", default="2025-08")
+    parser.add_argument("--latency", type=float, default=0.05, help="替身服务器每个请求的延迟（秒）")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=50.0, help="每秒最多请求数")
+    args = parser.parse_args()
+
+    months = month_range(args.start, args.end)
+    data_dir = tempfile.mkdtemp(prefix="aemo_raw_")
+    try:
+        with AEMOFixtureServer(latency=args.latency, available_until=months[-1]) as fixture:
+            print(f"\n① 首次下载（{len(REGIONS)} 个区域 × {len(months)} 个月）")
+            results, requests_made = run(fixture, data_dir, months, args.workers, args.rate)
+            assert all(r["status"] == "downloaded" for r in results)
+
+            print("\n② 再次运行（数据未变化）")
+            results, requests_made = run(fixture, data_dir, months, args.workers, args.rate)
+            assert all(r["status"] == "not_modified" for r in results)
+
+            (y1, m1), (y2, m2) = months[0], months[-1]
+            fixture.revise("QLD1", y1, m1)
+            fixture.revise("SA1", y2, m2)
+            print("\n③ 修订两个文件后运行")
+            results, requests_made = run(fixture, data_dir, months, args.workers, args.rate)
+            assert sorted((r["region"], r["year"], r["month"]) for r in results if r["status"] == "downloaded") \
+                == sorted([("QLD1", y1, m1), ("SA1", y2, m2)])
+
+            print("\n④ 单线程对照（清空本地缓存）")
+            shutil.rmtree(data_dir)
+            run(fixture, data_dir, months, 1, 0)
+            print(f"\n替身服务器共收到 {fixture.count()} 个请求，其中 304: {fixture.count(304)}")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+对比整文件读取与流式分块入库的耗时、峰值内存
+
+生成一个多区域、多年份的大 CSV（PRICE_AND_DEMAND 格式）和一个 MMS 格式的调度价格 zip，
+每种方式在独立子进程中运行，以便分别测得峰值内存（读取 /proc/self/status，需要 Linux）：
+- full: pd.read_csv 整个文件 + 全量派生列 + 逐月 write_month（原来的做法）
+- stream: aemo_stream.stream_ingest 分块写入（不同块大小）
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REGIONS = ["QLD1", "NSW1", "VIC1", "SA1", "TAS1"]
+
+
+def synthetic_frame(start, end, regions=REGIONS, seed=0):
+    """生成按时间、区域排序的 5 分钟价格/需求数据"""
+    rng = np.random.default_rng(seed)
+    times = pd.date_range(start, end, freq="5min")
+    n = len(times) * len(regions)
+    hour = np.repeat(times.hour.to_numpy() + times.minute.to_numpy() / 60, len(regions))
+    daily = np.sin((hour - 6) / 24 * 2 * np.pi)
+    return pd.DataFrame({
+        "SETTLEMENTDATE": np.repeat(times.strftime("%Y/%m/%d %H:%M:%S"), len(regions)),
+        "REGION": np.tile(regions, len(times)),
+        "TOTALDEMAND": (5000 * (1 + 0.18 * daily + 0.03 * rng.standard_normal(n))).round(2),
+        "RRP": (80 + 60 * daily + 25 * rng.standard_normal(n)).round(2),
+    })
+
+
+def write_price_demand_csv(path, df):
+    out = df[["REGION", "SETTLEMENTDATE", "TOTALDEMAND", "RRP"]].assign(PERIODTYPE="TRADE")
+    out.to_csv(path, index=False)
+
+
+def write_mms_zip(path, df):
+    """写成 MMS 调度价格表（C/I/D 行）并压缩"""
+    body = pd.DataFrame({
+        "I": "D", "c": "DISPATCH", "t": "PRICE", "v": 5,
+        "SETTLEMENTDATE": '"' + df["SETTLEMENTDATE"] + '"', "RUNNO": 1, "REGIONID": df["REGION"],
+        "DISPATCHINTERVAL": 1, "INTERVENTION": 0, "RRP": df["RRP"], "EEP": 0, "ROP": df["RRP"],
+        "APCFLAG": 0, "MARKETSUSPENDEDFLAG": 0, "LASTCHANGED": '"' + df["SETTLEMENTDATE"] + '"',
+    })
+    header = ("C,NEMP.WORLD,DVD_DISPATCHPRICE,AEMO,PUBLIC,2024/01/01,00:00:00,0,DVD,0\n"
+              "I,DISPATCH,PRICE,5,SETTLEMENTDATE,RUNNO,REGIONID,DISPATCHINTERVAL,INTERVENTION,RRP,EEP,ROP,"
+              "APCFLAG,MARKETSUSPENDEDFLAG,LASTCHANGED\n")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("PUBLIC_DVD_DISPATCHPRICE.CSV", "w") as f:
+            f.write(header.encode())
+            f.write(body.to_csv(index=False, header=False, quoting=3).encode())
+            f.write(b"C,\"END OF REPORT\"\n")
+
+
+WORKER = r"""
+import json, os, sys, time
+sys.path.insert(0, {here!r})
+import pandas as pd
+from aemo_store import AEMOStore, add_derived_columns, read_aemo_csv
+from aemo_stream import stream_ingest
+
+mode, path, store_dir, chunksize, table = sys.argv[1:6]
+store = AEMOStore(store_dir)
+start = time.perf_counter()
+if mode == "full":
+    df = read_aemo_csv(path)
+    add_derived_columns(df).to_csv(os.path.join(store_dir, "derived.csv"), index=False)
+    period = (df["SETTLEMENTDATE"] - pd.Timedelta(minutes=5)).dt
+    for (region, year, month), part in df.groupby([df["REGION"].astype(str), period.year, period.month]):
+        store.write_month(region, year, month, part)
+    rows = len(df)
+else:
+    rows = stream_ingest(path, store, int(chunksize), table or None, os.path.join(store_dir, "derived.csv"))["rows"]
+seconds = time.perf_counter() - start
+# VmHWM 是本进程的峰值常驻内存（ru_maxrss 在 Linux 上会继承父进程的值）
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+print(json.dumps({{"rows": rows, "seconds": seconds, "peak_mb": peak_kb / 1024}}))
+"""
+
+
+def run(mode, path, chunksize=0, table=""):
+    with tempfile.TemporaryDirectory() as store_dir:
+        out = subprocess.run([sys.executable, "-c", WORKER.format(here=HERE), mode, path, store_dir,
+                              str(chunksize), table], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[50_000, 200_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work:
+        df = synthetic_frame(datetime(2022, 1, 1, 0, 5), datetime(2022 + args.years, 1, 1))
+        csv_path = os.path.join(work, "PRICE_AND_DEMAND_ALL.csv")
+        zip_path = os.path.join(work, "PUBLIC_DVD_DISPATCHPRICE.zip")
+        write_price_demand_csv(csv_path, df)
+        write_mms_zip(zip_path, df)
+        del df
+        print(f"📦 CSV {os.path.getsize(csv_path) / 1e6:.0f} MB，"
+              f"MMS zip {os.path.getsize(zip_path) / 1e6:.0f} MB")
+
+        print(f"{'方式':<24}{'行数':>10}{'耗时(s)':>10}{'行/s':>12}{'峰值内存(MB)':>14}")
+        runs = [("full", csv_path, 0, "")]
+        runs += [("stream", csv_path, c, "") for c in args.chunks]
+        runs += [("stream", zip_path, c, "DISPATCH,PRICE") for c in args.chunks]
+        for mode, path, chunksize, table in runs:
+            r = run(mode, path, chunksize, table)
+            label = mode + (f" {chunksize // 1000}k" if chunksize else "") + (" (mms zip)" if table else "")
+            print(f"{label:<24}{r['rows']:>10}{r['seconds']:>10.2f}{r['rows'] / r['seconds']:>12,.0f}"
+                  f"{r['peak_mb']:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+AEMOFetcher 针对本地替身服务器（AEMOFixtureServer）的测试：条件请求、修订、404/403 与中途失败
+运行：python -m pytest 机器学习/test_aemo_fetcher.py
+"""
+
+import os
+
+import pytest
+
+from aemo_fetcher import CACHE_FILE, AEMOFetcher, month_filename
+from aemo_fixture_server import AEMOFixtureServer
+
+REGIONS = ["QLD1", "NSW1"]
+MONTHS = [(2024, 1), (2024, 2), (2024, 3)]
+
+
+@pytest.fixture
+def server():
+    with AEMOFixtureServer(available_until=(2024, 3)) as fixture:
+        yield fixture
+
+
+def make_fetcher(server, data_dir):
+    return AEMOFetcher(str(data_dir), base_url=server.base_url, home_url=None,
+                       max_workers=4, rate_per_host=0, retries=0)
+
+
+def statuses(results):
+    return {(r["region"], r["year"], r["month"]): r["status"] for r in results}
+
+
+def test_second_run_is_all_not_modified(server, tmp_path):
+    with make_fetcher(server, tmp_path) as fetcher:
+        first = fetcher.fetch(REGIONS, months=MONTHS)
+    assert set(statuses(first).values()) == {"downloaded"}
+    assert all(os.path.getsize(r["path"]) == r["bytes"] > 0 for r in first)
+
+    # 新的下载器（新进程）从缓存文件读取 ETag，第二次全部是 304
+    with make_fetcher(server, tmp_path) as fetcher:
+        second = fetcher.fetch(REGIONS, months=MONTHS)
+    assert set(statuses(second).values()) == {"not_modified"}
+    assert all(r["status_code"] == 304 and r["bytes"] == 0 for r in second)
+    assert server.count(304) == len(REGIONS) * len(MONTHS)
+
+
+def test_revised_month_is_downloaded_again(server, tmp_path):
+    with make_fetcher(server, tmp_path) as fetcher:
+        fetcher.fetch(REGIONS, months=MONTHS)
+        path = fetcher.path_for("QLD1", 2024, 2)
+        with open(path, "rb") as f:
+            before = f.read()
+
+        server.revise("QLD1", 2024, 2)
+        results = statuses(fetcher.fetch(REGIONS, months=MONTHS))
+
+    assert results.pop(("QLD1", 2024, 2)) == "downloaded"
+    assert set(results.values()) == {"not_modified"}
+    with open(path, "rb") as f:
+        assert f.read() != before
+
+
+def test_missing_month_maps_to_missing(server, tmp_path):
+    with make_fetcher(server, tmp_path) as fetcher:
+        result = fetcher.fetch_month("QLD1", 2024, 4)
+    assert result["status"] == "missing"
+    assert result["status_code"] == 404
+    assert not os.path.exists(fetcher.path_for("QLD1", 2024, 4))
+
+
+def test_forbidden_carries_status_code(server, tmp_path):
+    server.fail("QLD1", 2024, 1, status=403)
+    with make_fetcher(server, tmp_path) as fetcher:
+        result = fetcher.fetch_month("QLD1", 2024, 1)
+    assert result["status"] == "error"
+    assert result["status_code"] == 403
+    assert not os.path.exists(fetcher.path_for("QLD1", 2024, 1))
+
+
+def test_failed_download_leaves_nothing_behind(server, tmp_path):
+    server.fail("QLD1", 2024, 1, truncate=True)
+    with make_fetcher(server, tmp_path) as fetcher:
+        result = fetcher.fetch_month("QLD1", 2024, 1)
+        path = fetcher.path_for("QLD1", 2024, 1)
+    assert result["status"] == "error"
+    assert not os.path.exists(path)
+    assert not os.path.exists(path + ".part")
+    cache_path = os.path.join(str(tmp_path), CACHE_FILE)
+    assert not os.path.exists(cache_path) or month_filename("QLD1", 2024, 1) not in open(cache_path).read()
+
+    # 故障恢复后重新完整下载（没有残留的 ETag 导致误判为 304）
+    server.fail("QLD1", 2024, 1)
+    with make_fetcher(server, tmp_path) as fetcher:
+        result = fetcher.fetch_month("QLD1", 2024, 1)
+    assert result["status"] == "downloaded"
+    assert os.path.getsize(path) == result["bytes"]
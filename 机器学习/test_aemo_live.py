@@ -0,0 +1,108 @@
+"""
+LiveFollower 针对本地替身服务器的回放测试：只发布新时段、304 不发布、跨月不丢不重
+运行：python -m pytest 机器学习/test_aemo_live.py
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from aemo_fixture_server import AEMOFixtureServer
+from aemo_live import INTERVAL, LiveFollower, ReplayClock
+
+REGION = "QLD1"
+# 时段结束后多久轮询（模拟时间）
+POLL_AFTER = timedelta(seconds=30)
+
+
+@pytest.fixture
+def server():
+    with AEMOFixtureServer(available_until=(2024, 2)) as fixture:
+        yield fixture
+
+
+@pytest.fixture
+def follower(server, tmp_path):
+    follower = LiveFollower(REGION, base_url=server.base_url, home_url=None, data_dir=str(tmp_path))
+    # 测试里连续轮询，不需要限速
+    follower.fetcher.rate_per_host = 0
+    yield follower
+    follower.stop()
+
+
+def poll_at(follower, ts):
+    """把时钟拨到 ts 后轮询一次"""
+    follower.clock = ReplayClock(ts, speed=1.0)
+    return follower.poll()
+
+
+def published(follower):
+    """取出队列里已发布的全部时段"""
+    intervals = []
+    while not follower.queue.empty():
+        intervals.append(follower.queue.get_nowait()["interval_end"])
+    return intervals
+
+
+def steps(start, count):
+    return [start + INTERVAL * i for i in range(count)]
+
+
+def test_only_new_intervals_are_published_once_in_order(server, follower):
+    start = datetime(2024, 1, 10, 12, 0)
+    server.publish_until(REGION, start)
+    assert [r["interval_end"] for r in poll_at(follower, start + POLL_AFTER)] == [start]
+
+    # 一次轮询之间出现两个新时段：两个都发布，已发布的不再重复
+    later = steps(start, 3)
+    server.publish_until(REGION, later[-1])
+    records = poll_at(follower, later[-1] + POLL_AFTER)
+    assert [r["interval_end"] for r in records] == later[1:]
+    assert all(r["delay_s"] >= POLL_AFTER.total_seconds() for r in records)
+
+    assert published(follower) == later
+    assert follower.stats["published"] == 3
+
+
+def test_not_modified_poll_publishes_nothing(server, follower):
+    start = datetime(2024, 1, 10, 12, 0)
+    server.publish_until(REGION, start)
+    poll_at(follower, start + POLL_AFTER)
+    published(follower)
+
+    # 下一个时段还没发布：文件未变化，条件请求得到 304
+    assert poll_at(follower, start + INTERVAL + POLL_AFTER) == []
+    assert poll_at(follower, start + INTERVAL + 2 * POLL_AFTER) == []
+    assert published(follower) == []
+    assert follower.stats["not_modified"] == 2
+    assert server.count(304) == 2
+    assert follower.last_interval == start
+
+
+def test_month_rollover_neither_drops_nor_duplicates(server, follower):
+    # 1 月 31 日 23:45 至 2 月 1 日 00:15，每个时段轮询一次；00:00 这一时段在 1 月文件里
+    intervals = steps(datetime(2024, 1, 31, 23, 45), 7)
+    for ts in intervals:
+        server.publish_until(REGION, ts)
+        poll_at(follower, ts + POLL_AFTER)
+    assert published(follower) == intervals
+
+
+def test_month_rollover_with_late_midnight_interval(server, follower):
+    # 00:00 这一时段发布晚了，轮询时已经进入 2 月：仍须从 1 月文件补上
+    intervals = steps(datetime(2024, 1, 31, 23, 50), 4)
+    server.publish_until(REGION, intervals[0])
+    poll_at(follower, intervals[0] + POLL_AFTER)
+    server.publish_until(REGION, intervals[1])
+    poll_at(follower, intervals[1] + POLL_AFTER)
+    # 00:00 的轮询落空
+    assert poll_at(follower, intervals[2] + POLL_AFTER) == []
+
+    server.publish_until(REGION, intervals[3])
+    records = poll_at(follower, intervals[3] + POLL_AFTER)
+    assert [r["interval_end"] for r in records] == intervals[2:]
+    assert published(follower) == intervals
+
+    # 之后只轮询 2 月文件
+    assert poll_at(follower, intervals[3] + 2 * POLL_AFTER) == []
+    assert published(follower) == []